@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import orjson
+
+# Returned by ``get`` when the key is not cached. A cached ``None`` means the
+# document is known not to exist (negative caching).
+MISSING = object()
+
+
+class Cache:
+    """Async key/value cache with hit/miss counters."""
+
+    def __init__(self, ttl: float = 60.0, negative_ttl: float = 5.0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Any:
+        value = await self._get(key)
+        if value is MISSING:
+            self.misses += 1
+        elif value is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Optional[dict], ttl: Optional[float] = None):
+        """Cache ``value``; ``ttl`` may shorten the backend's expiry, e.g. to that of the source record."""
+        default = self.ttl if value is not None else self.negative_ttl
+        await self._set(key, value, default if ttl is None else min(ttl, default))
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "negative_hits": self.negative_hits, "misses": self.misses}
+
+    async def _get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def _set(self, key: str, value: Optional[dict], ttl: float):
+        raise NotImplementedError
+
+
+class LRUCache(Cache):
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_size: int = 10000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def _get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def _set(self, key: str, value: Optional[dict], ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "size": len(self._entries), "max_size": self.max_size}
+
+
+class RedisCache(Cache):
+    """Redis-compatible backend; values are stored as JSON with a server-side TTL."""
+
+    def __init__(self, url: str, prefix: str = "goodtransfer:", **kwargs):
+        super().__init__(**kwargs)
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def _get(self, key: str) -> Any:
+        raw = await self.redis.get(self.prefix + key)
+        if raw is None:
+            return MISSING
+        return orjson.loads(raw)
+
+    async def _set(self, key: str, value: Optional[dict], ttl: float):
+        await self.redis.set(self.prefix + key, orjson.dumps(value), px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self.redis.delete(self.prefix + key)
+
+    async def close(self):
+        await self.redis.close()
+
+
+def create_cache(backend: str, max_size: int = 10000, ttl: float = 60.0,
+                 negative_ttl: float = 5.0, url: Optional[str] = None) -> Optional[Cache]:
+    """Build the cache named by ``backend`` ("memory", "redis" or "none")."""
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return LRUCache(max_size, ttl=ttl, negative_ttl=negative_ttl)
+    if backend == "redis":
+        return RedisCache(url, ttl=ttl, negative_ttl=negative_ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,396 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+app = typer.Typer(help="GOOD TRANSFER backend maintenance commands.")
+
+
+def _part_path(output: Path, part: int) -> Path:
+    return output.with_name(f"{output.stem}-{part:05d}{output.suffix}")
+
+
+@app.command()
+def export(
+    output: Path = typer.Option(..., help="File to write; with --rows-per-file, the name template for parts."),
+    format: str = typer.Option("csv", help="csv or parquet."),
+    status: Optional[str] = typer.Option(None, help="Only export forms with this status."),
+    archived: bool = typer.Option(False, help="Export the archive instead of the hot collection."),
+    after: Optional[str] = typer.Option(None, help="Start after this (timestamp, id) cursor."),
+    resume: bool = typer.Option(False, help="Continue from the checkpoint file."),
+    checkpoint: Optional[Path] = typer.Option(None, help="Checkpoint file; defaults to OUTPUT.checkpoint."),
+    batch_size: int = typer.Option(1000, help="Documents fetched and written per batch."),
+    rows_per_file: int = typer.Option(0, help="Split the export into part files of this many rows."),
+):
+    """Export contact forms in (timestamp, id) order with a resumable checkpoint.
+
+    CSV checkpoints after every batch and resumes by appending. A Parquet
+    file is only readable once closed, so Parquet checkpoints after every
+    finished part file; use --rows-per-file to bound the work lost to an
+    interruption.
+    """
+    from contact_export import ExportFormatError, check_export_format
+    checkpoint = checkpoint or output.with_name(output.name + ".checkpoint")
+
+    try:
+        check_export_format(format)
+    except ExportFormatError as e:
+        raise typer.BadParameter(str(e), param_hint="--format")
+
+    position = {"after": after, "part": 0, "rows": 0, "archived": archived}
+    if resume:
+        if not checkpoint.exists():
+            raise typer.BadParameter(f"No checkpoint at {checkpoint}", param_hint="--resume")
+        position = json.loads(checkpoint.read_text())
+        if position.get("archived", False) != archived:
+            raise typer.BadParameter(f"{checkpoint} is from an export {'without' if archived else 'with'} "
+                                     "--archived", param_hint="--resume")
+        if format == "parquet" and not rows_per_file:
+            raise typer.BadParameter("Resuming a Parquet export needs --rows-per-file", param_hint="--resume")
+    elif (_part_path(output, 0) if rows_per_file else output).exists():
+        raise typer.BadParameter(f"{output} already exists", param_hint="--output")
+
+    exported = asyncio.run(_export(output, format, status, archived, position, checkpoint, batch_size,
+                                   rows_per_file))
+    typer.echo(f"Exported {exported} contact forms")
+
+
+async def _export(output: Path, fmt: str, status: Optional[str], archived: bool, position: dict,
+                  checkpoint: Path, batch_size: int, rows_per_file: int) -> int:
+    from contact_export import export_batches, export_chunks
+    from resources import Resources, load_settings
+    from server import build_contact_query, encode_cursor
+
+    resources = Resources(load_settings())
+    exported = 0
+
+    def save_checkpoint():
+        checkpoint.write_text(json.dumps(position))
+
+    def advance(last: dict):
+        position["after"] = encode_cursor(last["timestamp"], last["id"])
+        if fmt == "csv":
+            save_checkpoint()
+
+    async def counted(batches):
+        nonlocal exported
+        async for batch in batches:
+            exported += len(batch)
+            position["rows"] += len(batch)
+            yield batch
+
+    try:
+        if resources.db is None:
+            # Like GET /api/contact/export, which answers 501 there
+            raise typer.BadParameter(f"Export is not available with {resources.storage} storage")
+        collection = resources.contact_archive if archived else resources.db.contact_forms
+        while True:
+            path = _part_path(output, position["part"]) if rows_per_file else output
+            # A CSV file checkpointed part-way through is continued in place
+            append = fmt == "csv" and position["rows"] > 0 and path.exists()
+            if not append:
+                position["rows"] = 0
+            query, sort, projection = build_contact_query(status=status, after=position["after"])
+            cursor = collection.find(query, projection).sort(sort)
+            if rows_per_file:
+                cursor = cursor.limit(rows_per_file - position["rows"])
+
+            chunks = export_chunks(fmt, counted(export_batches(cursor, batch_size)),
+                                   header=not append, on_batch=advance)
+            with open(path, "ab" if append else "wb") as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+                    # Rows must be on disk before the checkpoint moves past them
+                    f.flush()
+
+            if not rows_per_file:
+                save_checkpoint()
+                break
+            if position["rows"] == 0:
+                path.unlink()
+                break
+            full = position["rows"] >= rows_per_file
+            if full:
+                position["part"] += 1
+                position["rows"] = 0
+            save_checkpoint()
+            if not full:
+                break
+    finally:
+        await resources.close()
+    return exported
+
+
+@app.command()
+def archive(
+    loop: bool = typer.Option(False, help="Keep running, one pass every CONTACT_ARCHIVE_INTERVAL seconds."),
+):
+    """Move completed, cancelled and old contact forms to the archive collection.
+
+    Uses the same CONTACT_ARCHIVE_* settings as the in-process archiver, so it
+    can run from cron instead of inside an API worker.
+    """
+    moved = asyncio.run(_archive(loop))
+    typer.echo(f"Archived {moved} contact forms")
+
+
+async def _archive(loop: bool) -> int:
+    from resources import Resources, load_settings
+
+    resources = Resources(load_settings())
+    archiver = resources.contact_archiver
+    try:
+        while True:
+            await archiver.run_once()
+            if not loop:
+                break
+            await asyncio.sleep(archiver.interval)
+    finally:
+        await resources.close()
+    return archiver.archived_total
+
+
+@app.command()
+def outbox(
+    loop: bool = typer.Option(False, help="Keep dispatching new events until interrupted."),
+):
+    """Run the contact outbox handlers outside the API.
+
+    Uses the same CONTACT_OUTBOX_* settings as the in-process workers; run
+    the API with CONTACT_OUTBOX_DISPATCH=false to dispatch from here only.
+    Without --loop, processes the events that are due and exits.
+    """
+    processed = asyncio.run(_outbox(loop))
+    typer.echo(f"Processed {processed} outbox events")
+
+
+async def _outbox(loop: bool) -> int:
+    from resources import Resources, load_settings
+
+    resources = Resources(load_settings())
+    contact_outbox = resources.contact_outbox
+    try:
+        if contact_outbox is None:
+            raise typer.BadParameter("CONTACT_OUTBOX is not enabled")
+        if loop:
+            contact_outbox.start()
+            await asyncio.Event().wait()
+        await contact_outbox.run_once()
+    finally:
+        await resources.close()
+    return contact_outbox.claimed_total
+
+
+@app.command("requeue-outbox")
+def requeue_outbox():
+    """Give dead outbox events a fresh set of attempts, e.g. after fixing a handler."""
+    requeued = asyncio.run(_requeue_outbox())
+    typer.echo(f"Requeued {requeued} outbox events")
+
+
+async def _requeue_outbox() -> int:
+    from resources import Resources, load_settings
+
+    resources = Resources(load_settings())
+    try:
+        if resources.contact_outbox is None:
+            raise typer.BadParameter("CONTACT_OUTBOX is not enabled")
+        return await resources.contact_outbox.requeue_dead()
+    finally:
+        await resources.close()
+
+
+@app.command("migrate-amounts")
+def migrate_amounts(
+    batch_size: int = typer.Option(1000, help="Forms updated per bulk write."),
+    rebuild_rollups: bool = typer.Option(True, help="Recompute the hourly and daily rollups afterwards."),
+):
+    """Store float amounts of older contact forms as integer minor units with a currency.
+
+    Runs in batches over the hot and archive collections and can be
+    interrupted and restarted. Amounts are read through their shortest
+    decimal repr and rounded half-even to the currency's minor unit.
+    """
+    migrated, skipped = asyncio.run(_migrate_amounts(batch_size))
+    typer.echo(f"Migrated {migrated} contact forms, skipped {skipped} with unusable amounts")
+    if rebuild_rollups:
+        rebuild_rollups_command()
+
+
+async def _migrate_amounts(batch_size: int):
+    from pymongo import UpdateOne
+
+    from money import DEFAULT_CURRENCY, from_minor, to_minor
+    from resources import Resources, load_settings
+
+    resources = Resources(load_settings())
+    migrated = 0
+    unusable = []
+    try:
+        for collection in (resources.db.contact_forms, resources.contact_archive):
+            while True:
+                query = {"amount_minor": {"$exists": False}, "id": {"$nin": unusable}}
+                documents = await collection.find(query, {"_id": 0, "id": 1, "amount": 1, "currency": 1}) \
+                    .limit(batch_size).to_list(batch_size)
+                if not documents:
+                    break
+                operations = []
+                for document in documents:
+                    currency = document.get("currency") or DEFAULT_CURRENCY
+                    try:
+                        minor = to_minor(document["amount"], currency, strict=False)
+                    except (KeyError, TypeError, ValueError):
+                        unusable.append(document["id"])
+                        continue
+                    operations.append(UpdateOne(
+                        {"id": document["id"], "amount_minor": {"$exists": False}},
+                        {"$set": {"amount_minor": minor, "currency": currency,
+                                  "amount": float(from_minor(minor, currency))}}))
+                if operations:
+                    result = await collection.bulk_write(operations, ordered=False)
+                    migrated += result.modified_count
+    finally:
+        await resources.close()
+    return migrated, len(unusable)
+
+
+@app.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the hourly and daily contact rollups from all stored forms.
+
+    Increments from forms written while a bucket is being replaced are lost,
+    so run it when traffic is low.
+    """
+    written = asyncio.run(_rebuild_rollups())
+    typer.echo(f"Rebuilt {written} rollup documents")
+
+
+async def _rebuild_rollups() -> int:
+    from contact_archive import ARCHIVE_COLLECTION
+    from resources import Resources, load_settings
+
+    resources = Resources(load_settings())
+    try:
+        return await resources.contact_rollups.rebuild(["contact_forms", ARCHIVE_COLLECTION])
+    finally:
+        await resources.close()
+
+
+@app.command("rebuild-status-latest")
+def rebuild_status_latest_command():
+    """Recompute the latest status per client from stored heartbeats and legacy status checks."""
+    clients = asyncio.run(_rebuild_status_latest())
+    typer.echo(f"Rebuilt the latest status of {clients} clients")
+
+
+async def _rebuild_status_latest() -> int:
+    from resources import Resources, load_settings
+    from status_heartbeats import HEARTBEAT_COLLECTION
+
+    resources = Resources(load_settings())
+    try:
+        return await resources.status_latest.rebuild([HEARTBEAT_COLLECTION, "status_checks"])
+    finally:
+        await resources.close()
+
+
+@app.command("index-search")
+def index_search(
+    batch_size: int = typer.Option(1000, help="Forms updated per bulk write."),
+):
+    """Add the normalized search fields to contact forms stored before search existed."""
+    updated = asyncio.run(_index_search(batch_size))
+    typer.echo(f"Indexed {updated} contact forms for search")
+
+
+async def _index_search(batch_size: int) -> int:
+    from pymongo import UpdateOne
+
+    from contact_search import search_fields
+    from resources import Resources, load_settings
+
+    resources = Resources(load_settings())
+    updated = 0
+    try:
+        for collection in (resources.db.contact_forms, resources.contact_archive):
+            while True:
+                documents = await collection.find({"search_tokens": {"$exists": False}},
+                                                  {"_id": 0, "id": 1, "name": 1, "phone": 1, "email": 1}) \
+                    .limit(batch_size).to_list(batch_size)
+                if not documents:
+                    break
+                result = await collection.bulk_write(
+                    [UpdateOne({"id": document["id"]}, {"$set": search_fields(document)}) for document in documents],
+                    ordered=False)
+                updated += result.modified_count
+    finally:
+        await resources.close()
+    return updated
+
+
+@app.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create the indexes the API needs, e.g. once per deploy.
+
+    Workers started with MONGO_ENSURE_INDEXES=false then only check that
+    the indexes exist and come up faster.
+    """
+    asyncio.run(_ensure_indexes())
+    typer.echo("Indexes are in place")
+
+
+async def _ensure_indexes():
+    from resources import Resources, ensure_indexes, load_settings
+
+    resources = Resources(load_settings())
+    try:
+        await ensure_indexes(resources.db, resources.archive_compressor, resources.heartbeat_ttl,
+                             resources.heartbeat_timeseries)
+    finally:
+        await resources.close()
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("0.0.0.0", help="Interface to bind."),
+    port: int = typer.Option(8001, help="Port to bind."),
+    workers: int = typer.Option(0, help="Worker processes; 0 uses one per CPU core."),
+    backlog: int = typer.Option(2048, help="Pending connections the socket queues."),
+    limit_concurrency: Optional[int] = typer.Option(None, help="Per-worker connection cap before 503s."),
+    log_level: str = typer.Option("info", help="Uvicorn log level."),
+):
+    """Run the API with several worker processes sharing one socket.
+
+    Each worker imports the app through ``server:create_app`` and opens its
+    own Mongo client, caches and background tasks in the lifespan, so
+    nothing is shared across the fork. The worker count is passed on as
+    WEB_CONCURRENCY, so with more than one the contact cache defaults to
+    redis (or none without REDIS_URL) instead of a stale per-worker copy.
+    Size MONGO_MAX_POOL_SIZE per worker: the deployment opens up to
+    workers x pool size connections. Under gunicorn the equivalent is
+    ``WEB_CONCURRENCY=N gunicorn 'server:create_app()' -k
+    uvicorn.workers.UvicornWorker``.
+    """
+    import os
+
+    import uvicorn
+
+    workers = workers or os.cpu_count() or 1
+    # Inherited by the workers; Resources picks the contact cache backend from it
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        backlog=backlog,
+        limit_concurrency=limit_concurrency,
+        log_level=log_level,
+    )
+
+
+if __name__ == "__main__":
+    app()
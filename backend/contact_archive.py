@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Sequence
+
+from pymongo import ReplaceOne
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "contact_forms_archive"
+
+
+async def ensure_archive_collection(database, compressor: Optional[str] = "zstd"):
+    """Create the archive collection with ``compressor`` block compression unless it exists.
+
+    Archived forms are read rarely, so they trade CPU for disk and cache
+    footprint. Pass no compressor to use the server default.
+    """
+    if await database.list_collection_names(filter={"name": ARCHIVE_COLLECTION}):
+        return
+    options = {}
+    if compressor:
+        options["storageEngine"] = {"wiredTiger": {"configString": f"block_compressor={compressor}"}}
+    try:
+        await database.create_collection(ARCHIVE_COLLECTION, **options)
+    except CollectionInvalid:
+        # Another worker created it first
+        pass
+
+
+class ContactArchiver:
+    """Moves finished or old contact forms from ``contact_forms`` to the archive.
+
+    Each batch is upserted into the archive and then deleted from the hot
+    collection, so an interrupted run is safe to repeat. The delete repeats
+    the archive condition: a form whose status changed back in the meantime
+    stays in the hot collection and shadows its archived copy. ``on_moved``
+    is awaited after every run that moved forms.
+    """
+
+    def __init__(self, collection, archive, statuses: Sequence[str] = ("completed", "cancelled"),
+                 max_age_days: float = 90, batch_size: int = 1000, interval: float = 300,
+                 batch_pause: float = 0.1, on_moved: Optional[Callable[[], Awaitable[None]]] = None):
+        self.collection = collection
+        self.archive = archive
+        self.statuses = list(statuses)
+        self.max_age = timedelta(days=max_age_days)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.batch_pause = batch_pause
+        self.on_moved = on_moved
+        self._task: Optional[asyncio.Task] = None
+
+        self.archived_total = 0
+        self.runs = 0
+        self.last_run_ms = 0.0
+
+    def archive_filter(self, now: Optional[datetime] = None) -> dict:
+        cutoff = (now or datetime.utcnow()) - self.max_age
+        return {"$or": [{"status": {"$in": self.statuses}}, {"timestamp": {"$lt": cutoff}}]}
+
+    async def archive_batch(self, query: dict) -> int:
+        documents = await self.collection.find(query, {"_id": 0}).limit(self.batch_size).to_list(self.batch_size)
+        if not documents:
+            return 0
+        await self.archive.bulk_write([ReplaceOne({"id": doc["id"]}, doc, upsert=True) for doc in documents],
+                                      ordered=False)
+        result = await self.collection.delete_many({"$and": [{"id": {"$in": [doc["id"] for doc in documents]}},
+                                                             query]})
+        self.archived_total += result.deleted_count
+        return len(documents)
+
+    async def run_once(self) -> int:
+        """Archive everything currently eligible; return the number of forms moved."""
+        started = time.perf_counter()
+        query = self.archive_filter()
+        moved = 0
+        while True:
+            count = await self.archive_batch(query)
+            moved += count
+            if count < self.batch_size:
+                break
+            # Leave room for request traffic between batches
+            await asyncio.sleep(self.batch_pause)
+        self.runs += 1
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        if moved and self.on_moved:
+            await self.on_moved()
+        if moved:
+            logger.info("Archived %d contact forms in %.1f ms", moved, self.last_run_ms)
+        return moved
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"archived_total": self.archived_total, "runs": self.runs, "last_run_ms": self.last_run_ms}
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except PyMongoError:
+                logger.exception("Contact archive run failed")
+            await asyncio.sleep(self.interval)
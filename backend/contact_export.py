@@ -0,0 +1,124 @@
+import csv
+import io
+from typing import AsyncIterator, Callable, List, Optional
+
+EXPORT_FIELDS = ["id", "name", "email", "phone", "amount", "amount_minor", "currency", "message", "timestamp",
+                 "status"]
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportFormatError(ValueError):
+    pass
+
+
+def check_export_format(fmt: str):
+    """Fail before streaming starts when ``fmt`` cannot be produced."""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportFormatError(f"Unknown export format: {fmt}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportFormatError("Parquet export requires pyarrow")
+
+
+async def export_batches(cursor, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """Group a Motor cursor into lists of at most ``batch_size`` documents."""
+    batch = []
+    async for document in cursor.batch_size(batch_size):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def csv_chunks(batches: AsyncIterator[List[dict]], header: bool = True,
+                     on_batch: Optional[Callable[[dict], None]] = None) -> AsyncIterator[bytes]:
+    """Encode each batch as CSV rows; ``on_batch`` receives the last document written."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    async for batch in batches:
+        for document in batch:
+            writer.writerow({**document, "timestamp": document["timestamp"].isoformat()})
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        if on_batch:
+            on_batch(batch[-1])
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.string()),
+        ("name", pa.string()),
+        ("email", pa.string()),
+        ("phone", pa.string()),
+        ("amount", pa.float64()),
+        ("amount_minor", pa.int64()),
+        ("currency", pa.string()),
+        ("message", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("status", pa.string()),
+    ])
+
+
+async def parquet_chunks(batches: AsyncIterator[List[dict]],
+                         on_batch: Optional[Callable[[dict], None]] = None) -> AsyncIterator[bytes]:
+    """Encode each batch as one Parquet row group and yield the bytes as they are produced."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        async for batch in batches:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+            if on_batch:
+                on_batch(batch[-1])
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(fmt: str, batches: AsyncIterator[List[dict]], header: bool = True,
+                  on_batch: Optional[Callable[[dict], None]] = None) -> AsyncIterator[bytes]:
+    check_export_format(fmt)
+    if fmt == "parquet":
+        return parquet_chunks(batches, on_batch=on_batch)
+    return csv_chunks(batches, header=header, on_batch=on_batch)
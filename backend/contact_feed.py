@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Optional, Set
+
+import orjson
+from pymongo.errors import OperationFailure, PyMongoError
+
+from contact_search import SEARCH_FIELDS
+
+logger = logging.getLogger(__name__)
+
+FEED_PIPELINE = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+
+
+def _event(change: dict) -> dict:
+    document = change.get("fullDocument") or {}
+    for field in ("_id", *SEARCH_FIELDS):
+        document.pop(field, None)
+    return {
+        "id": change["_id"]["_data"],
+        "type": change["operationType"],
+        "data": orjson.dumps(document),
+    }
+
+
+class Subscription:
+    def __init__(self, feed: "ContactFeed", max_size: int):
+        self.feed = feed
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = False
+        self._task: Optional[asyncio.Task] = None
+
+    def push(self, event: dict):
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up; the client reconnects with Last-Event-ID
+            self.dropped = True
+            self.close()
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None when nothing arrived within ``timeout`` seconds."""
+        if self.dropped and self.queue.empty():
+            raise ConnectionResetError("Subscriber fell behind the feed")
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.feed.subscribers.discard(self)
+        if self._task:
+            self._task.cancel()
+
+
+class ContactFeed:
+    """Fans one change stream on ``contact_forms`` out to many subscribers.
+
+    Recent events are kept so a client reconnecting with ``Last-Event-ID`` is
+    replayed from memory. A client that is further behind, e.g. after a
+    restart, gets a change stream resumed from that token only until it
+    reaches an event in the history, and then joins the shared stream; at
+    most ``max_catch_ups`` of those run at once, the rest wait their turn.
+    Change streams need a replica set.
+    """
+
+    def __init__(self, collection, history: int = 1000, subscriber_queue: int = 1000, max_catch_ups: int = 50):
+        self.collection = collection
+        self.subscriber_queue = subscriber_queue
+        self.history: Deque[dict] = deque(maxlen=history)
+        self.subscribers: Set[Subscription] = set()
+        self.events_total = 0
+        self.catching_up = 0
+        self.handed_over_total = 0
+        self._catch_up_slots = asyncio.Semaphore(max_catch_ups)
+        self._resume_token: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        subscription = Subscription(self, self.subscriber_queue)
+        if not last_event_id:
+            self.subscribers.add(subscription)
+        elif not self._join(subscription, last_event_id):
+            subscription._task = asyncio.create_task(self._catch_up(subscription, last_event_id))
+        return subscription
+
+    def _join(self, subscription: Subscription, last_event_id: str) -> bool:
+        """Replay the history after ``last_event_id`` and register; False when it is not in the history."""
+        ids = [event["id"] for event in self.history]
+        if last_event_id not in ids:
+            return False
+        # Replay and registration happen without an await in between, so
+        # no event is missed or delivered twice
+        for event in list(self.history)[ids.index(last_event_id) + 1:]:
+            subscription.push(event)
+        self.subscribers.add(subscription)
+        return True
+
+    async def close(self):
+        for subscription in list(self.subscribers):
+            subscription.close()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self.subscribers), "history": len(self.history),
+                "events_total": self.events_total, "catching_up": self.catching_up,
+                "handed_over_total": self.handed_over_total}
+
+    def _publish(self, event: dict):
+        self.events_total += 1
+        self.history.append(event)
+        for subscription in list(self.subscribers):
+            subscription.push(event)
+
+    async def _run(self):
+        delay = 0.5
+        while True:
+            try:
+                async with self.collection.watch(FEED_PIPELINE, full_document="updateLookup",
+                                                 resume_after=self._resume_token) as stream:
+                    delay = 0.5
+                    async for change in stream:
+                        self._resume_token = change["_id"]
+                        self._publish(_event(change))
+            except PyMongoError:
+                logger.exception("Contact change stream failed; retrying in %.1f s", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def _catch_up(self, subscription: Subscription, last_event_id: str):
+        """Private change stream for a client that reconnected from beyond the history.
+
+        Runs until the client's position shows up in the history, i.e. the
+        shared stream has seen it too, then closes and joins the shared one.
+        """
+        async with self._catch_up_slots:
+            self.catching_up += 1
+            try:
+                await self._follow_until_joined(subscription, last_event_id)
+            finally:
+                self.catching_up -= 1
+
+    async def _follow_until_joined(self, subscription: Subscription, last_event_id: str):
+        token = {"_data": last_event_id}
+        delay = 0.5
+        while True:
+            try:
+                async with self.collection.watch(FEED_PIPELINE, full_document="updateLookup",
+                                                 resume_after=token) as stream:
+                    delay = 0.5
+                    while True:
+                        if self._join(subscription, token["_data"]):
+                            self.handed_over_total += 1
+                            return
+                        # Waits up to the server's await time, so the check above also runs while idle
+                        change = await stream.try_next()
+                        if change is not None:
+                            token = change["_id"]
+                            subscription.push(_event(change))
+            except OperationFailure:
+                # Unknown token or the oplog no longer reaches back that far
+                logger.warning("Cannot resume contact feed from %s; following live events", token)
+                self.subscribers.add(subscription)
+                return
+            except PyMongoError:
+                logger.exception("Contact catch-up stream failed; retrying in %.1f s", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
@@ -0,0 +1,313 @@
+import asyncio
+import importlib
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import orjson
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import PyMongoError
+
+from contact_search import SEARCH_FIELDS
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "contact_outbox"
+
+CONTACT_CREATED = "contact.created"
+
+OUTBOX_INDEXES = [
+    # Claims look for the oldest due event; running events become due again when their lease runs out
+    IndexModel([("state", ASCENDING), ("available_at", ASCENDING)], name="state_available_at"),
+    # Only finished events get an expires_at; dead ones stay until requeued
+    IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+]
+
+HandlerFunction = Callable[[dict], Awaitable[None]]
+
+
+class OutboxHandler:
+    """A named side effect of new contact forms, run at most ``concurrency`` at a time.
+
+    A call that raises or takes longer than ``timeout`` seconds fails and is
+    retried with the event later.
+    """
+
+    def __init__(self, name: str, function: HandlerFunction, concurrency: int = 8, timeout: float = 30.0):
+        self.name = name
+        self.function = function
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __call__(self, event: dict):
+        async with self._semaphore:
+            await asyncio.wait_for(self.function(event), self.timeout)
+
+    async def close(self):
+        close = getattr(self.function, "close", None)
+        if close is not None:
+            await close()
+
+
+class Webhook:
+    """POSTs each event as JSON to ``url``; any answer but 2xx is a failure and retried.
+
+    The Idempotency-Key header is the same on every retry of an event, so
+    the receiver can drop the duplicates at-least-once delivery produces.
+    """
+
+    def __init__(self, name: str, url: str, timeout: float = 30.0):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self._client = None
+
+    async def __call__(self, event: dict):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.post(self.url, content=orjson.dumps(event), headers={
+            "Content-Type": "application/json",
+            "Idempotency-Key": f"{event['id']}:{self.name}",
+        })
+        response.raise_for_status()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def load_handlers(spec: str, concurrency: int = 8, timeout: float = 30.0) -> Dict[str, OutboxHandler]:
+    """Handlers from ``name=target`` entries separated by commas.
+
+    A target is either an http(s) URL, called as a webhook, or
+    ``module:function`` naming an async function that takes the event,
+    e.g. ``notify_agent=https://hooks.example.com/agents,score_lead=scoring:score``.
+    """
+    handlers = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, target = entry.partition("=")
+        name, target = name.strip(), target.strip()
+        if not name or not target:
+            raise ValueError(f"Outbox handler must be name=target: {entry!r}")
+        if target.startswith(("http://", "https://")):
+            function = Webhook(name, target, timeout)
+        else:
+            module, _, attribute = target.partition(":")
+            function = getattr(importlib.import_module(module), attribute)
+        handlers[name] = OutboxHandler(name, function, concurrency, timeout)
+    return handlers
+
+
+class ContactOutbox:
+    """Durable queue of what has to happen after a contact form is stored.
+
+    Agent notification, lead scoring and CRM sync are registered handlers.
+    The contact repository inserts one event per new form together with the
+    form, so submissions cost one extra document however many handlers run.
+    ``workers`` tasks claim due events with a lease, call every handler that
+    has not yet succeeded for the event and record the outcome. Failures are
+    retried with exponential backoff and jitter; after ``max_attempts`` the
+    event is parked as dead until ``requeue_dead``. A worker that dies
+    mid-event loses its lease and the event runs again, so handlers must be
+    idempotent. Workers in several processes may share one collection.
+    """
+
+    def __init__(self, collection, handlers: Dict[str, OutboxHandler], workers: int = 8,
+                 max_attempts: int = 8, backoff: float = 1.0, max_backoff: float = 300.0,
+                 lease: float = 60.0, poll_interval: float = 1.0, retention_days: float = 7):
+        self.collection = collection
+        self.handlers = handlers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = timedelta(seconds=lease)
+        self.poll_interval = poll_interval
+        self.retention = timedelta(days=retention_days)
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+        self.recorded_total = 0
+        self.claimed_total = 0
+        self.completed_total = 0
+        self.retried_total = 0
+        self.dead_total = 0
+        self.handler_failures_total = 0
+        self.lease_lost_total = 0
+        self.in_flight = 0
+        self.last_lag_ms = 0.0
+
+    @staticmethod
+    def event(document: dict) -> dict:
+        """The outbox document for a newly stored contact form."""
+        now = datetime.utcnow()
+        payload = {key: value for key, value in document.items() if key != "_id" and key not in SEARCH_FIELDS}
+        return {
+            "event": CONTACT_CREATED,
+            "contact_id": document["id"],
+            "payload": payload,
+            "state": "pending",
+            "attempts": 0,
+            "done": [],
+            "created_at": now,
+            "available_at": now,
+        }
+
+    async def record(self, events: List[dict], session=None):
+        if events:
+            await self.collection.insert_many(events, ordered=False, session=session)
+
+    def notify(self, recorded: int):
+        """Count ``recorded`` stored events and wake idle workers, which would otherwise wait for the next poll."""
+        self.recorded_total += recorded
+        self._wake.set()
+
+    def start(self):
+        if not self.handlers:
+            logger.warning("Contact outbox has no handlers; events are stored but not dispatched")
+            return
+        self._stopping = False
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self, grace: float = 5.0):
+        """Stop claiming and give events in flight ``grace`` seconds; unfinished ones run again later."""
+        self._stopping = True
+        self._wake.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=grace)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._tasks = []
+        for handler in self.handlers.values():
+            await handler.close()
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        event = await self.collection.find_one_and_update(
+            {"state": {"$in": ["pending", "running"]}, "available_at": {"$lte": now}},
+            {"$set": {"state": "running", "available_at": now + self.lease, "lease": uuid.uuid4().hex},
+             "$inc": {"attempts": 1}},
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if event is not None:
+            self.claimed_total += 1
+            self.last_lag_ms = (now - event["created_at"]).total_seconds() * 1000
+        return event
+
+    async def process(self, event: dict):
+        """Run the handlers still owed for ``event`` concurrently and store the outcome."""
+        self.in_flight += 1
+        try:
+            pending = [name for name in self.handlers if name not in event["done"]]
+            message = {"id": str(event["_id"]), "event": event["event"], "attempt": event["attempts"],
+                       "contact": event["payload"]}
+            results = await asyncio.gather(*(self.handlers[name](message) for name in pending),
+                                           return_exceptions=True)
+        finally:
+            self.in_flight -= 1
+
+        succeeded = [name for name, result in zip(pending, results) if not isinstance(result, BaseException)]
+        errors = {name: repr(result) for name, result in zip(pending, results) if isinstance(result, BaseException)}
+        for name, error in errors.items():
+            logger.warning("Outbox handler %s failed for contact %s (attempt %d): %s",
+                           name, event["contact_id"], event["attempts"], error)
+        self.handler_failures_total += len(errors)
+
+        now = datetime.utcnow()
+        if not errors:
+            changes = {"state": "done", "expires_at": now + self.retention}
+            self.completed_total += 1
+        elif event["attempts"] >= self.max_attempts:
+            changes = {"state": "dead", "errors": errors}
+            self.dead_total += 1
+            logger.error("Outbox event for contact %s is dead after %d attempts", event["contact_id"],
+                         event["attempts"])
+        else:
+            changes = {"state": "pending", "available_at": now + self.retry_delay(event["attempts"]),
+                       "errors": errors}
+            self.retried_total += 1
+        update = {"$set": changes, "$unset": {"lease": ""}}
+        if succeeded:
+            update["$addToSet"] = {"done": {"$each": succeeded}}
+        result = await self.collection.update_one({"_id": event["_id"], "lease": event["lease"]}, update)
+        if result.matched_count == 0:
+            # The lease ran out and another worker has the event; keep what succeeded so it is not repeated
+            self.lease_lost_total += 1
+            if succeeded:
+                await self.collection.update_one({"_id": event["_id"]},
+                                                 {"$addToSet": {"done": {"$each": succeeded}}})
+
+    def retry_delay(self, attempts: int) -> timedelta:
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        # Jitter keeps events that failed together from retrying together
+        return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+    async def run_once(self) -> int:
+        """Process due events until there are none left; return how many were processed."""
+        processed = 0
+        while True:
+            event = await self.claim()
+            if event is None:
+                return processed
+            await self.process(event)
+            processed += 1
+
+    async def requeue_dead(self) -> int:
+        result = await self.collection.update_many(
+            {"state": "dead"},
+            {"$set": {"state": "pending", "attempts": 0, "available_at": datetime.utcnow()}})
+        return result.modified_count
+
+    async def backlog(self) -> Dict[str, int]:
+        """Events by state; finished ones until they expire."""
+        counts = {"pending": 0, "running": 0, "done": 0, "dead": 0}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$state", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            "handlers": len(self.handlers),
+            "workers": len(self._tasks),
+            "in_flight": self.in_flight,
+            "recorded_total": self.recorded_total,
+            "claimed_total": self.claimed_total,
+            "completed_total": self.completed_total,
+            "retried_total": self.retried_total,
+            "dead_total": self.dead_total,
+            "handler_failures_total": self.handler_failures_total,
+            "lease_lost_total": self.lease_lost_total,
+            "last_lag_ms": round(self.last_lag_ms, 3),
+        }
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                event = await self.claim()
+            except PyMongoError:
+                logger.exception("Could not claim a contact outbox event")
+                event = None
+            if event is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            try:
+                await self.process(event)
+            except PyMongoError:
+                # The lease runs out and the event is claimed again
+                logger.exception("Could not store the outcome of outbox event %s", event["_id"])
@@ -0,0 +1,149 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel, ReplaceOne, UpdateOne
+
+from contact_stats import BUCKET_SIZES, DEFAULT_RANGES, StatsRangeError, floor_bucket
+from money import DEFAULT_CURRENCY, from_minor
+from repositories import naive_utc
+
+ROLLUP_UNITS = ("hour", "day")
+
+ROLLUP_INDEXES = [
+    IndexModel([("unit", ASCENDING), ("bucket", ASCENDING), ("status", ASCENDING), ("currency", ASCENDING)],
+               name="unit_bucket_status_currency", unique=True),
+]
+
+RollupKey = Tuple[str, datetime, str, str]
+
+
+def _key(form: dict, unit: str) -> RollupKey:
+    return (unit, floor_bucket(form["timestamp"], unit), form["status"], form.get("currency", DEFAULT_CURRENCY))
+
+
+def _key_filter(key: RollupKey) -> dict:
+    unit, bucket, status, currency = key
+    return {"unit": unit, "bucket": bucket, "status": status, "currency": currency}
+
+
+def _row(document: dict) -> dict:
+    currency = document["currency"]
+    return {
+        "bucket": document["bucket"],
+        "status": document["status"],
+        "currency": currency,
+        "count": document["count"],
+        "amount_sum_minor": document["amount_minor"],
+        "amount_sum": float(from_minor(document["amount_minor"], currency)),
+    }
+
+
+class ContactRollups:
+    """Hourly and daily count and amount totals per (status, currency).
+
+    Every write to ``contact_forms`` applies ``$inc`` upserts here, so totals
+    for a range are read from one small document per bucket instead of
+    aggregating the forms. Archiving does not change them.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.updates_total = 0
+
+    async def record(self, forms: Iterable[dict]):
+        """Count newly written ``forms``; forms sharing a bucket become one update."""
+        await self._apply(self._increments(forms, 1))
+
+    async def move(self, form: dict, previous_status: str):
+        """Shift ``form`` from ``previous_status`` to its current status."""
+        increments = self._increments([{**form, "status": previous_status}], -1)
+        for key, (count, amount) in self._increments([form], 1).items():
+            previous = increments.get(key, (0, 0))
+            increments[key] = (previous[0] + count, previous[1] + amount)
+        await self._apply(increments)
+
+    async def query(self, unit: str = "hour", since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    status: Optional[str] = None, currency: Optional[str] = None) -> dict:
+        if unit not in BUCKET_SIZES:
+            raise StatsRangeError(f"Unknown bucket: {unit}")
+        until = naive_utc(until) if until else datetime.utcnow()
+        since = floor_bucket(naive_utc(since) if since else until - DEFAULT_RANGES[unit], unit)
+        if since >= until:
+            raise StatsRangeError("since must be before until")
+
+        query = {"unit": unit, "bucket": {"$gte": since, "$lt": until}}
+        if status is not None:
+            query["status"] = status
+        if currency is not None:
+            query["currency"] = currency
+        cursor = self.collection.find(query, {"_id": 0}).sort(
+            [("bucket", ASCENDING), ("status", ASCENDING), ("currency", ASCENDING)])
+        buckets = [_row(document) async for document in cursor]
+
+        totals: Dict[Tuple[str, str], dict] = {}
+        for row in buckets:
+            total = totals.setdefault((row["status"], row["currency"]), {
+                "status": row["status"], "currency": row["currency"], "count": 0, "amount_sum_minor": 0})
+            total["count"] += row["count"]
+            total["amount_sum_minor"] += row["amount_sum_minor"]
+        for total in totals.values():
+            total["amount_sum"] = float(from_minor(total["amount_sum_minor"], total["currency"]))
+        return {"bucket": unit, "since": since, "until": until,
+                "by_status": [totals[key] for key in sorted(totals)], "buckets": buckets}
+
+    async def rebuild(self, sources: List[str]) -> int:
+        """Recompute every rollup from the forms in ``sources``; return the number of rollup documents.
+
+        Meant for backfills and repair: increments that land while a bucket
+        is being replaced are lost, so run it when writes are quiet.
+        """
+        started = datetime.utcnow()
+        written = 0
+        first, *others = sources
+        for unit in ROLLUP_UNITS:
+            match = {"$match": {"amount_minor": {"$exists": True}}}
+            pipeline = [match]
+            for other in others:
+                pipeline.append({"$unionWith": {"coll": other, "pipeline": [match]}})
+            pipeline.append({"$group": {
+                "_id": {"bucket": {"$dateTrunc": {"date": "$timestamp", "unit": unit}},
+                        "status": "$status", "currency": {"$ifNull": ["$currency", DEFAULT_CURRENCY]}},
+                "count": {"$sum": 1},
+                "amount_minor": {"$sum": "$amount_minor"},
+            }})
+            operations = []
+            async for group in self.collection.database[first].aggregate(pipeline):
+                key = {"unit": unit, **group["_id"]}
+                operations.append(ReplaceOne(key, {**key, "count": group["count"],
+                                                   "amount_minor": group["amount_minor"], "rebuilt_at": started},
+                                             upsert=True))
+                if len(operations) >= 1000:
+                    await self.collection.bulk_write(operations, ordered=False)
+                    written += len(operations)
+                    operations = []
+            if operations:
+                await self.collection.bulk_write(operations, ordered=False)
+                written += len(operations)
+            # Buckets no form maps to any more; ones created by live writes have no rebuilt_at
+            await self.collection.delete_many({"unit": unit, "rebuilt_at": {"$lt": started}})
+        return written
+
+    def stats(self) -> dict:
+        return {"updates_total": self.updates_total}
+
+    @staticmethod
+    def _increments(forms: Iterable[dict], sign: int) -> Dict[RollupKey, Tuple[int, int]]:
+        increments: Dict[RollupKey, Tuple[int, int]] = {}
+        for form in forms:
+            for unit in ROLLUP_UNITS:
+                key = _key(form, unit)
+                count, amount = increments.get(key, (0, 0))
+                increments[key] = (count + sign, amount + sign * form["amount_minor"])
+        return increments
+
+    async def _apply(self, increments: Dict[RollupKey, Tuple[int, int]]):
+        operations = [UpdateOne(_key_filter(key), {"$inc": {"count": count, "amount_minor": amount}}, upsert=True)
+                      for key, (count, amount) in increments.items() if count or amount]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+            self.updates_total += len(operations)
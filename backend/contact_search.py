@@ -0,0 +1,137 @@
+import base64
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+from pymongo import ASCENDING, TEXT, IndexModel
+
+# Fields stored next to each form only for lookups; never returned by the API
+SEARCH_FIELDS = ("search_tokens", "search_phone", "search_email")
+
+SEARCH_INDEXES = [
+    # Version 3 text indexes ignore case and diacritics; "none" keeps names unstemmed
+    IndexModel([("name", TEXT), ("email", TEXT)], name="name_email_text", default_language="none",
+               weights={"name": 10, "email": 2}),
+    IndexModel([("search_tokens", ASCENDING)], name="search_tokens"),
+    IndexModel([("search_phone", ASCENDING), ("id", ASCENDING)], name="search_phone_id"),
+    IndexModel([("search_email", ASCENDING), ("id", ASCENDING)], name="search_email_id"),
+]
+
+# Skip-based paging gets slower with depth; nobody reads past this many hits
+MAX_SEARCH_RESULTS = 1000
+MIN_PHONE_DIGITS = 3
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+def normalize(text: str) -> str:
+    """Case- and accent-folded text: "José María" -> "jose maria"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokens(text: str) -> List[str]:
+    return re.findall(r"\w+", normalize(text))
+
+
+def search_fields(form: dict) -> dict:
+    email = form.get("email")
+    return {
+        "search_tokens": sorted(set(tokens(form["name"]))),
+        "search_phone": re.sub(r"\D", "", form["phone"]),
+        "search_email": normalize(email.strip()) if email else None,
+    }
+
+
+def classify(q: str) -> Tuple[str, object]:
+    """Pick how ``q`` is looked up: ("email", prefix), ("phone", digits) or ("name", tokens)."""
+    q = q.strip()
+    if "@" in q:
+        return "email", normalize(q)
+    digits = re.sub(r"\D", "", q)
+    if len(digits) >= MIN_PHONE_DIGITS and not re.search(r"[^\d\s+\-().]", q):
+        return "phone", digits
+    words = tokens(q)
+    if not words:
+        raise SearchQueryError("Query has no searchable characters")
+    return "name", words
+
+
+def encode_search_cursor(mode: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{mode}|{offset}".encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        mode, offset = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return mode, int(offset)
+    except ValueError:
+        raise SearchQueryError("Invalid search cursor")
+
+
+def _prefix(value: str) -> re.Pattern:
+    # Anchored, case-sensitive and on normalized fields, so it is an index range scan
+    return re.compile("^" + re.escape(value))
+
+
+class ContactSearch:
+    """Looks up contact forms by partial name, phone or email.
+
+    Whole words are matched through the text index and ranked by text
+    score; if none match, every query word is treated as a prefix of a name
+    word. Phones match on a digit prefix and emails on a case-folded prefix.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def plan(self, q: str, mode: Optional[str] = None, status: Optional[str] = None,
+             projection: Optional[dict] = None) -> Tuple[str, dict, Optional[list], dict]:
+        """Return (mode, filter, sort, projection) for ``q``; ``mode`` forces the name strategy."""
+        kind, value = classify(q)
+        projection = dict(projection or {"_id": 0})
+        sort = None
+        if kind == "email":
+            query = {"search_email": _prefix(value)}
+            sort = [("search_email", ASCENDING), ("id", ASCENDING)]
+            mode = kind
+        elif kind == "phone":
+            query = {"search_phone": _prefix(value)}
+            sort = [("search_phone", ASCENDING), ("id", ASCENDING)]
+            mode = kind
+        elif mode == "prefix":
+            # Every word must start some name word; each clause can drive the index scan
+            query = {"$and": [{"search_tokens": _prefix(word)} for word in value]}
+        else:
+            mode = "text"
+            query = {"$text": {"$search": " ".join(value)}}
+            projection["score"] = {"$meta": "textScore"}
+            sort = [("score", {"$meta": "textScore"}), ("timestamp", -1)]
+        if status is not None:
+            query = {"$and": [query, {"status": status}]}
+        return mode, query, sort, projection
+
+    async def search(self, q: str, limit: int = 20, cursor: Optional[str] = None, status: Optional[str] = None,
+                     projection: Optional[dict] = None) -> Tuple[List[dict], Optional[str], str]:
+        """One page of matches, the cursor of the next page if any, and the mode used."""
+        mode, offset = decode_search_cursor(cursor) if cursor else (None, 0)
+        limit = min(limit, MAX_SEARCH_RESULTS - offset)
+
+        mode, query, sort, page_projection = self.plan(q, mode, status, projection)
+        rows = await self._page(query, sort, page_projection, offset, limit) if limit > 0 else []
+        if not rows and mode == "text" and offset == 0:
+            mode, query, sort, page_projection = self.plan(q, "prefix", status, projection)
+            rows = await self._page(query, sort, page_projection, offset, limit)
+
+        next_cursor = None
+        if limit > 0 and len(rows) == limit and offset + limit < MAX_SEARCH_RESULTS:
+            next_cursor = encode_search_cursor(mode, offset + limit)
+        return rows, next_cursor, mode
+
+    async def _page(self, query: dict, sort: Optional[list], projection: dict, offset: int, limit: int) -> List[dict]:
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        return await cursor.skip(offset).limit(limit).to_list(limit)
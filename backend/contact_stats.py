@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from cache import MISSING, LRUCache
+from money import DEFAULT_CURRENCY, exponent, from_minor
+from repositories import naive_utc
+
+BUCKET_SIZES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DEFAULT_RANGES = {"hour": timedelta(hours=24), "day": timedelta(days=30)}
+MAX_BUCKETS = 2000
+PERCENTILES = [0.5, 0.9, 0.99]
+
+# Buckets are cached once they closed this long ago, so late writes
+# (write-behind flushes, clock skew) still land before the result is frozen.
+CLOSE_GRACE = timedelta(minutes=1)
+
+
+class StatsRangeError(ValueError):
+    pass
+
+
+def floor_bucket(value: datetime, unit: str) -> datetime:
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if unit == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def stats_pipeline(unit: str, since: datetime, until: datetime, status: Optional[str],
+                   union_with: Optional[str] = None) -> List[dict]:
+    match = {"timestamp": {"$gte": since, "$lt": until}}
+    if status is not None:
+        match["status"] = status
+    stages = [{"$match": match}]
+    if union_with:
+        stages.append({"$unionWith": {"coll": union_with, "pipeline": [{"$match": match}]}})
+    return stages + [
+        {"$group": {
+            "_id": {"bucket": {"$dateTrunc": {"date": "$timestamp", "unit": unit}}, "status": "$status",
+                    "currency": {"$ifNull": ["$currency", DEFAULT_CURRENCY]}},
+            "count": {"$sum": 1},
+            "amount_sum_minor": {"$sum": "$amount_minor"},
+            "amount_avg_minor": {"$avg": "$amount_minor"},
+            "amount_percentiles_minor": {"$percentile": {"input": "$amount_minor", "p": PERCENTILES,
+                                                         "method": "approximate"}},
+        }},
+        {"$sort": {"_id.bucket": 1, "_id.status": 1, "_id.currency": 1}},
+    ]
+
+
+def _row(group: dict) -> dict:
+    # Sums are exact integers in minor units; averages and percentiles are estimates
+    currency = group["_id"]["currency"]
+    scale = 10 ** exponent(currency)
+    average = group["amount_avg_minor"]
+    percentiles = [value / scale if value is not None else None for value in group["amount_percentiles_minor"]]
+    return {
+        "bucket": group["_id"]["bucket"],
+        "status": group["_id"]["status"],
+        "currency": currency,
+        "count": group["count"],
+        "amount_sum_minor": group["amount_sum_minor"],
+        "amount_sum": float(from_minor(group["amount_sum_minor"], currency)),
+        "amount_avg": average / scale if average is not None else None,
+        "amount_p50": percentiles[0],
+        "amount_p90": percentiles[1],
+        "amount_p99": percentiles[2],
+    }
+
+
+class ContactStats:
+    """Volume and amount statistics per (bucket, status, currency), cached per closed bucket.
+
+    Only buckets that are still open, or not cached yet, are aggregated, so a
+    dashboard refresh normally aggregates just the current hour or day.
+    ``$percentile`` requires MongoDB 7.0 or newer. Forms in the ``archive``
+    collection are included.
+    """
+
+    def __init__(self, collection, archive: Optional[str] = None, cache_size: int = 20000,
+                 cache_ttl: float = 7 * 24 * 3600):
+        self.collection = collection
+        self.archive = archive
+        self.cache = LRUCache(cache_size, ttl=cache_ttl)
+        self.aggregations = 0
+
+    async def compute(self, unit: str = "hour", since: Optional[datetime] = None,
+                      until: Optional[datetime] = None, status: Optional[str] = None) -> dict:
+        if unit not in BUCKET_SIZES:
+            raise StatsRangeError(f"Unknown bucket: {unit}")
+        now = datetime.utcnow()
+        until = naive_utc(until) if until else now
+        since = floor_bucket(naive_utc(since) if since else until - DEFAULT_RANGES[unit], unit)
+        if since >= until:
+            raise StatsRangeError("since must be before until")
+
+        size = BUCKET_SIZES[unit]
+        starts = []
+        start = since
+        while start < until:
+            starts.append(start)
+            start += size
+        if len(starts) > MAX_BUCKETS:
+            raise StatsRangeError(f"Range spans more than {MAX_BUCKETS} {unit} buckets")
+
+        rows_by_bucket: Dict[datetime, List[dict]] = {}
+        missing = []
+        for start in starts:
+            cached = await self.cache.get(self._key(unit, status, start)) if start + size <= until else MISSING
+            if cached is MISSING:
+                missing.append(start)
+            else:
+                rows_by_bucket[start] = cached["rows"]
+
+        if missing:
+            fresh = await self._aggregate(unit, missing[0], until, status)
+            for start in missing:
+                rows = fresh.get(start, [])
+                rows_by_bucket[start] = rows
+                if start + size <= until and start + size <= now - CLOSE_GRACE:
+                    await self.cache.set(self._key(unit, status, start), {"rows": rows})
+
+        buckets = [row for start in starts for row in rows_by_bucket[start]]
+        return {
+            "bucket": unit,
+            "since": since,
+            "until": until,
+            "by_status": self._totals(buckets),
+            "buckets": buckets,
+        }
+
+    async def invalidate(self, timestamp: datetime, statuses: List[str]):
+        """Drop the cached buckets a status change of a form created at ``timestamp`` affects."""
+        for unit in BUCKET_SIZES:
+            start = floor_bucket(timestamp, unit)
+            for status in [None, *statuses]:
+                await self.cache.delete(self._key(unit, status, start))
+
+    def stats(self) -> dict:
+        return {"aggregations": self.aggregations, **self.cache.stats()}
+
+    async def _aggregate(self, unit: str, since: datetime, until: datetime,
+                         status: Optional[str]) -> Dict[datetime, List[dict]]:
+        self.aggregations += 1
+        rows: Dict[datetime, List[dict]] = {}
+        async for group in self.collection.aggregate(stats_pipeline(unit, since, until, status, self.archive)):
+            row = _row(group)
+            rows.setdefault(row["bucket"], []).append(row)
+        return rows
+
+    @staticmethod
+    def _key(unit: str, status: Optional[str], start: datetime) -> str:
+        return f"{unit}|{status or '*'}|{start.isoformat()}"
+
+    @staticmethod
+    def _totals(buckets: List[dict]) -> List[dict]:
+        totals: Dict[tuple, dict] = {}
+        for row in buckets:
+            total = totals.setdefault((row["status"], row["currency"]), {
+                "status": row["status"], "currency": row["currency"], "count": 0, "amount_sum_minor": 0})
+            total["count"] += row["count"]
+            total["amount_sum_minor"] += row["amount_sum_minor"]
+        for total in totals.values():
+            total["amount_sum"] = float(from_minor(total["amount_sum_minor"], total["currency"]))
+            total["amount_avg"] = total["amount_sum"] / total["count"]
+        return [totals[key] for key in sorted(totals)]
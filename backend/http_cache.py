@@ -0,0 +1,93 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+VERSIONS_COLLECTION = "collection_versions"
+
+# Clients may keep responses but must revalidate them; a 304 costs no body
+REVALIDATE = "private, no-cache"
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class CollectionVersion:
+    """Change counter for a set of collections, bumped after every write to them.
+
+    Conditional GETs compare it instead of the data, so a poll that finds
+    nothing new costs one ``find_one`` by ``_id`` and no page query.
+    """
+
+    def __init__(self, collection, name: str):
+        self.collection = collection
+        self.name = name
+        self.bumps = 0
+
+    async def bump(self):
+        # $max keeps updated_at from going back when worker clocks disagree
+        await self.collection.update_one({"_id": self.name},
+                                         {"$inc": {"version": 1}, "$max": {"updated_at": datetime.utcnow()}},
+                                         upsert=True)
+        self.bumps += 1
+
+    async def current(self) -> Tuple[int, datetime]:
+        document = await self.collection.find_one({"_id": self.name})
+        if document is None:
+            return 0, EPOCH
+        return document["version"], document["updated_at"]
+
+    def stats(self) -> dict:
+        return {"bumps_total": self.bumps}
+
+
+def make_etag(*parts) -> str:
+    """Weak validator: the body may differ byte-wise between encodings, not in meaning."""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def query_digest(request: Request) -> str:
+    """Short digest of the query string, so every filter and page gets its own validator."""
+    return hashlib.blake2b(str(sorted(request.query_params.multi_items())).encode(), digest_size=8).hexdigest()
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """RFC 9110 conditional GET: If-None-Match wins; If-Modified-Since only when it is absent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" and "x" match
+        opaque = etag[2:] if etag.startswith("W/") else etag
+        candidates = (tag.strip() for tag in if_none_match.split(","))
+        return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        # HTTP dates have whole seconds
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None,
+                      cache_control: str = REVALIDATE) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,175 @@
+import hashlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Union
+
+import orjson
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from cache import MISSING, LRUCache
+from money import DEFAULT_CURRENCY, to_minor
+from write_behind import DUPLICATE_KEY
+
+IDEMPOTENCY_INDEXES = [
+    IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+]
+
+
+def content_key(name: str, phone: str, amount_minor: int, currency: str) -> str:
+    """Key for a submission without an Idempotency-Key header.
+
+    The same name, phone and amount in the same currency map to the same
+    key; its record lasts the dedup window, so a form retried within that
+    window of the first submission is recognised as a replay.
+    """
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    content = f"{name.strip().casefold()}|{digits}|{amount_minor}|{currency}"
+    return "content:" + hashlib.sha256(content.encode()).hexdigest()
+
+
+def form_fingerprint(contact: dict) -> str:
+    """Hash of what was submitted for ``contact``, to tell a retry from another form."""
+    currency = contact.get("currency") or DEFAULT_CURRENCY
+    amount_minor = contact.get("amount_minor")
+    if amount_minor is None:
+        amount_minor = to_minor(contact["amount"], currency, strict=False)
+    submitted = [contact.get("name"), contact.get("email"), contact.get("phone"), amount_minor, currency,
+                 contact.get("message")]
+    return hashlib.sha256(orjson.dumps(submitted)).hexdigest()
+
+
+class IdempotencyStore:
+    """Remembers the contact form created for each idempotency key.
+
+    Keys are claimed with an insert into a collection with a unique index,
+    so concurrent retries cannot both create a form. A record counts until
+    its ``expires_at``; one the TTL index has not removed yet is taken over
+    by the next claim. Recently seen keys are answered from an in-process
+    LRU first.
+    Without a ``collection`` (embedded storage) the LRU is all there is: keys
+    are remembered by this process for the dedup window only.
+    """
+
+    def __init__(self, collection, window: int = 600, key_ttl: int = 86400, cache_size: int = 10000):
+        self.collection = collection
+        self.window = window
+        self.key_ttl = key_ttl
+        self.cache = LRUCache(cache_size, ttl=min(window, key_ttl))
+        self.replays = 0
+
+    def key_for(self, header_key: Optional[str], name: str, phone: str, amount: Union[Decimal, float],
+                currency: str = DEFAULT_CURRENCY) -> str:
+        if header_key:
+            return "header:" + header_key
+        return content_key(name, phone, to_minor(amount, currency, strict=False), currency)
+
+    @staticmethod
+    def conflicts(key: str, original: dict, contact: dict) -> bool:
+        """Whether ``contact`` differs from the ``original`` form claimed under the header ``key``.
+
+        Content keys are derived from the form itself, so only a header key
+        can be sent again with another form.
+        """
+        return key.startswith("header:") and form_fingerprint(original) != form_fingerprint(contact)
+
+    def _record(self, key: str, contact: dict, now: datetime) -> dict:
+        ttl = self.key_ttl if key.startswith("header:") else self.window
+        return {"key": key, "contact": contact, "expires_at": now + timedelta(seconds=ttl)}
+
+    async def _remember(self, key: str, existing: dict, now: datetime) -> dict:
+        """Cache the contact of an earlier claim for no longer than its record lasts."""
+        self.replays += 1
+        await self.cache.set(key, existing["contact"], ttl=(existing["expires_at"] - now).total_seconds())
+        return existing["contact"]
+
+    async def claim(self, key: str, contact: dict) -> Optional[dict]:
+        """Record ``contact`` under ``key``; return the earlier contact if the key was already used."""
+        cached = await self.cache.get(key)
+        if cached is not MISSING:
+            self.replays += 1
+            return cached
+        if self.collection is None:
+            await self.cache.set(key, contact)
+            return None
+
+        now = datetime.utcnow()
+        record = self._record(key, contact, now)
+        try:
+            await self.collection.insert_one(record)
+        except DuplicateKeyError:
+            existing = await self.collection.find_one({"key": key}, {"_id": 0, "contact": 1, "expires_at": 1})
+            if existing is None:
+                # Removed between the insert and the lookup; treat as new
+                return await self.claim(key, contact)
+            if existing["expires_at"] > now:
+                return await self._remember(key, existing, now)
+            # Past its window but not yet removed by the TTL monitor: take it over,
+            # unless a concurrent claim got there first
+            result = await self.collection.update_one(
+                {"key": key, "expires_at": existing["expires_at"]},
+                {"$set": {"contact": contact, "expires_at": record["expires_at"]}})
+            if result.modified_count == 0:
+                return await self.claim(key, contact)
+
+        await self.cache.set(key, contact)
+        return None
+
+    async def claim_many(self, contacts: Dict[str, dict]) -> Dict[str, dict]:
+        """Claim every key of ``contacts`` at once; return the earlier contact of each key already used.
+
+        One ``insert_many`` claims all new keys and one ``find`` fetches the
+        contacts of the duplicates, however many keys there are.
+        """
+        originals: Dict[str, dict] = {}
+        pending: List[str] = []
+        for key in contacts:
+            cached = await self.cache.get(key)
+            if cached is MISSING:
+                pending.append(key)
+            else:
+                self.replays += 1
+                originals[key] = cached
+
+        used: List[str] = []
+        now = datetime.utcnow()
+        if pending and self.collection is not None:
+            try:
+                await self.collection.insert_many([self._record(key, contacts[key], now) for key in pending],
+                                                  ordered=False)
+            except BulkWriteError as e:
+                errors = e.details["writeErrors"]
+                if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                    raise
+                used = [pending[error["index"]] for error in errors]
+        if used:
+            async for existing in self.collection.find({"key": {"$in": used}, "expires_at": {"$gt": now}},
+                                                       {"_id": 0, "key": 1, "contact": 1, "expires_at": 1}):
+                originals[existing["key"]] = await self._remember(existing["key"], existing, now)
+
+        for key in used:
+            if key not in originals:
+                # Removed or past its window since; claim it on its own
+                original = await self.claim(key, contacts[key])
+                if original is not None:
+                    originals[key] = original
+        for key in pending:
+            if key not in used:
+                await self.cache.set(key, contacts[key])
+        return originals
+
+    async def release_many(self, keys: List[str]):
+        for key in keys:
+            await self.cache.delete(key)
+        if self.collection is not None:
+            await self.collection.delete_many({"key": {"$in": keys}})
+
+    async def release(self, key: str):
+        """Forget ``key`` after the insert it guarded failed, so a retry can succeed."""
+        await self.cache.delete(key)
+        if self.collection is not None:
+            await self.collection.delete_one({"key": key})
+
+    def stats(self) -> dict:
+        return {"replays": self.replays, **self.cache.stats()}
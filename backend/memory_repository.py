@@ -0,0 +1,158 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from http_cache import EPOCH
+from repositories import (STATUS_FIELDS, ContactQuery, ContactRepository, Cursor, DuplicateContactError,
+                          StatusRepository, project)
+
+
+def _matches(query: ContactQuery, document: dict) -> bool:
+    if query.status is not None and document.get("status") != query.status:
+        return False
+    if query.currency is not None and document.get("currency") != query.currency:
+        return False
+    if query.min_amount_minor is not None or query.max_amount_minor is not None:
+        amount_minor = document.get("amount_minor")
+        if amount_minor is None:
+            return False
+        if query.min_amount_minor is not None and amount_minor < query.min_amount_minor:
+            return False
+        if query.max_amount_minor is not None and amount_minor > query.max_amount_minor:
+            return False
+    return True
+
+
+class MemoryContactRepository(ContactRepository):
+    """Contact forms in this process' memory, for tests, benchmarks and single-worker demos.
+
+    Nothing survives a restart and workers do not share forms. Listings
+    walk a sorted (timestamp, id) index from the cursor, like the Mongo
+    index scan. There is no archive.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._documents: Dict[str, dict] = {}
+        self._order: List[Cursor] = []
+        self._version = 0
+        self._updated_at = EPOCH
+
+    async def add(self, document: dict):
+        if document["id"] in self._documents:
+            raise DuplicateContactError(f"Duplicate contact form id: {document['id']}")
+        self._documents[document["id"]] = dict(document)
+        insort(self._order, (document["timestamp"], document["id"]))
+
+    async def add_many(self, documents: List[dict]) -> Dict[int, str]:
+        failed = {}
+        for position, document in enumerate(documents):
+            try:
+                await self.add(document)
+            except DuplicateContactError as e:
+                failed[position] = str(e)
+        return failed
+
+    async def get(self, contact_id: str, fields: Sequence[str]) -> Optional[dict]:
+        document = self._documents.get(contact_id)
+        return None if document is None else project(document, fields)
+
+    async def page(self, query: ContactQuery, limit: int) -> List[dict]:
+        if query.archived:
+            return []
+        order = self._order
+        if query.descending:
+            end = len(order)
+            if query.after is not None:
+                end = bisect_left(order, query.after)
+            if query.until is not None:
+                end = min(end, bisect_left(order, (query.until, "")))
+            positions = range(end - 1, -1, -1)
+        else:
+            start = 0
+            if query.after is not None:
+                start = bisect_right(order, query.after)
+            if query.since is not None:
+                start = max(start, bisect_left(order, (query.since, "")))
+            positions = range(start, len(order))
+
+        documents = []
+        for position in positions:
+            timestamp, contact_id = order[position]
+            if query.descending and query.since is not None and timestamp < query.since:
+                break
+            if not query.descending and query.until is not None and timestamp >= query.until:
+                break
+            document = self._documents[contact_id]
+            if _matches(query, document):
+                documents.append(project(document, query.fields))
+                if len(documents) >= limit:
+                    break
+        return documents
+
+    async def set_status(self, contact_id: str, status: str, fields: Sequence[str]) -> Optional[dict]:
+        document = self._documents.get(contact_id)
+        if document is None:
+            return None
+        before = project(document, fields)
+        document["status"] = status
+        document["version"] = document.get("version", 0) + 1
+        return before
+
+    async def version(self) -> Tuple[int, datetime]:
+        return self._version, self._updated_at
+
+    async def bump_version(self):
+        self._version += 1
+        self._updated_at = max(self._updated_at, datetime.utcnow())
+
+
+class MemoryStatusRepository(StatusRepository):
+    """Heartbeats of the last ``ttl_seconds``, at most ``max_heartbeats``, in this process' memory."""
+
+    name = "memory"
+
+    def __init__(self, ttl_seconds: int = 7 * 86400, max_heartbeats: int = 100000):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_heartbeats = max_heartbeats
+        # (timestamp, id, client_name), oldest first; new heartbeats almost always go at the end
+        self._heartbeats: List[Tuple[datetime, str, str]] = []
+        self._latest: Dict[str, dict] = {}
+
+    async def add(self, heartbeats: List[dict]):
+        for heartbeat in heartbeats:
+            insort(self._heartbeats, (heartbeat["timestamp"], heartbeat["id"], heartbeat["client_name"]))
+            current = self._latest.get(heartbeat["client_name"])
+            if current is None or heartbeat["timestamp"] > current["timestamp"]:
+                self._latest[heartbeat["client_name"]] = project(heartbeat, STATUS_FIELDS)
+        self._expire()
+
+    async def recent(self, client_name: Optional[str] = None, limit: int = 1000) -> List[dict]:
+        self._expire()
+        heartbeats = []
+        for timestamp, heartbeat_id, name in reversed(self._heartbeats):
+            if client_name is None or name == client_name:
+                heartbeats.append({"id": heartbeat_id, "client_name": name, "timestamp": timestamp})
+                if len(heartbeats) >= limit:
+                    break
+        return heartbeats
+
+    async def latest(self, client_name: Optional[str] = None, since: Optional[datetime] = None,
+                     limit: int = 1000) -> List[dict]:
+        names = [client_name] if client_name is not None else sorted(self._latest)
+        heartbeats = []
+        for name in names:
+            heartbeat = self._latest.get(name)
+            if heartbeat is None or (since is not None and heartbeat["timestamp"] < since):
+                continue
+            heartbeats.append(dict(heartbeat))
+            if len(heartbeats) >= limit:
+                break
+        return heartbeats
+
+    def _expire(self):
+        expired = bisect_left(self._heartbeats, (datetime.utcnow() - self.ttl,))
+        expired = max(expired, len(self._heartbeats) - self.max_heartbeats)
+        if expired > 0:
+            del self._heartbeats[:expired]
@@ -0,0 +1,48 @@
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from typing import Union
+
+DEFAULT_CURRENCY = "USD"
+
+# amount_minor is stored as a BSON int64
+MAX_MINOR = 2 ** 63 - 1
+
+# ISO 4217 minor-unit exponents that differ from the usual two decimals
+CURRENCY_EXPONENTS = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0, "PYG": 0,
+    "RWF": 0, "UGX": 0, "UYI": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+}
+
+
+def exponent(currency: str) -> int:
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+
+def to_minor(amount: Union[Decimal, float, int, str], currency: str = DEFAULT_CURRENCY, strict: bool = True) -> int:
+    """Amount in integer minor units of ``currency``, e.g. 12.34 USD -> 1234.
+
+    Floats go through their shortest repr, so 0.1 is 10 cents rather than
+    0.1000000000000000055... With ``strict`` an amount finer than the
+    currency's minor unit is rejected; otherwise it is rounded half-even.
+    """
+    try:
+        value = Decimal(str(amount)) if isinstance(amount, float) else Decimal(amount)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {amount!r}")
+    try:
+        scaled = value.scaleb(exponent(currency))
+        minor = scaled.to_integral_value(rounding=ROUND_HALF_EVEN)
+    except ArithmeticError:
+        # Overflow of the decimal context, e.g. 1e999999999
+        raise ValueError(f"Amount out of range: {amount!r}")
+    if strict and minor != scaled:
+        raise ValueError(f"{currency} amounts have at most {exponent(currency)} decimal places")
+    if abs(minor) > MAX_MINOR:
+        raise ValueError(f"Amount out of range: {amount!r}")
+    return int(minor)
+
+
+def from_minor(minor: int, currency: str = DEFAULT_CURRENCY) -> Decimal:
+    return Decimal(minor).scaleb(-exponent(currency))
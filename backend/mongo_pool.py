@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from typing import Mapping
+
+from pymongo import monitoring
+
+# Environment variable -> (MongoClient option, converter)
+POOL_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+    "MONGO_READ_PREFERENCE": ("readPreference", str),
+}
+
+
+def client_options(environ: Mapping[str, str]) -> dict:
+    """MongoClient keyword arguments for the pool settings present in ``environ``."""
+    return {
+        option: convert(environ[name])
+        for name, (option, convert) in POOL_OPTIONS.items()
+        if environ.get(name)
+    }
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool usage collected from pymongo CMAP events."""
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failed = 0
+        self.last_checkout_wait_ms = 0.0
+        self.max_checkout_wait_ms = 0.0
+        # Motor runs pymongo on worker threads; a checkout starts and ends on one thread
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        return {
+            "open": self.created - self.closed,
+            "in_use": self.checked_out - self.checked_in,
+            "created_total": self.created,
+            "checkout_failed_total": self.checkout_failed,
+            "last_checkout_wait_ms": round(self.last_checkout_wait_ms, 3),
+            "max_checkout_wait_ms": round(self.max_checkout_wait_ms, 3),
+        }
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        started = getattr(self._local, "checkout_started", None)
+        if started is not None:
+            self.last_checkout_wait_ms = (time.perf_counter() - started) * 1000
+            self.max_checkout_wait_ms = max(self.max_checkout_wait_ms, self.last_checkout_wait_ms)
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failed += 1
+
+    def connection_checked_in(self, event):
+        self.checked_in += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+async def warm_up(client, connections: int):
+    """Ping on ``connections`` concurrent sockets so the pool is open before traffic arrives."""
+    started = time.perf_counter()
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(connections, 1))))
+    return (time.perf_counter() - started) * 1000
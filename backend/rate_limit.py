@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Container, Iterable, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Public write endpoints that are throttled per client
+RATE_LIMITED_ROUTES = {("POST", "/api/contact"), ("POST", "/api/contact/bulk"), ("POST", "/api/contact/batch")}
+
+# Long-lived or operational requests that must not hold or wait for an admission slot
+ADMISSION_EXEMPT_PREFIXES = ("/api/health", "/api/metrics", "/api/contact/feed", "/api/contact/export")
+# and routes that do so only with stream=true
+ADMISSION_EXEMPT_STREAMS = {("GET", "/api/contact")}
+# Query strings FastAPI reads as a true bool
+TRUE_VALUES = {"1", "on", "t", "true", "y", "yes"}
+
+
+class RateLimiter:
+    """Token bucket per client key: ``burst`` requests at once, refilled at ``rate`` per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.allowed = 0
+        self.limited = 0
+
+    async def acquire(self, key: str) -> float:
+        """Take one token for ``key``; return 0 if allowed, else seconds until a token is available."""
+        wait = await self._take(key)
+        if wait > 0:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"allowed_total": self.allowed, "limited_total": self.limited}
+
+    async def _take(self, key: str) -> float:
+        raise NotImplementedError
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Buckets kept in this worker; with N workers a client effectively gets up to N times the limit."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        super().__init__(rate, burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def _take(self, key: str) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # Evicting the least recent client only hands it a full bucket again
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict:
+        return {**super().stats(), "keys": len(self._buckets), "max_keys": self.max_keys}
+
+
+# Refill and take in one round trip; Redis' clock keeps the workers consistent
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Buckets shared by every worker through a Redis-compatible server.
+
+    If Redis cannot be reached requests are let through: a limiter outage
+    should not turn into a contact form outage.
+    """
+
+    def __init__(self, url: str, rate: float, burst: int, prefix: str = "goodtransfer:ratelimit:"):
+        super().__init__(rate, burst)
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+        self.errors = 0
+        self._redis_error = RedisError
+        self._script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def _take(self, key: str) -> float:
+        try:
+            return float(await self._script(keys=[self.prefix + key], args=[self.rate, self.burst]))
+        except self._redis_error:
+            self.errors += 1
+            logger.warning("Rate limiter backend unavailable; allowing request", exc_info=True)
+            return 0.0
+
+    async def close(self):
+        await self.redis.close()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "backend_errors_total": self.errors}
+
+
+def create_rate_limiter(backend: str, per_minute: float, burst: int, max_keys: int = 100000,
+                        url: Optional[str] = None) -> Optional[RateLimiter]:
+    """Build the limiter named by ``backend`` ("memory", "redis" or "none"); a zero rate disables it."""
+    if backend == "none" or per_minute <= 0:
+        return None
+    rate = per_minute / 60
+    if backend == "memory":
+        return MemoryRateLimiter(rate, burst, max_keys)
+    if backend == "redis":
+        return RedisRateLimiter(url, rate, burst)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+class ConcurrencyLimiter:
+    """Caps the requests this worker serves at once.
+
+    A request waits at most ``max_wait`` seconds for a slot and is shed
+    otherwise, so overload turns into quick 503s instead of a pile-up on
+    the Mongo pool's wait queue.
+    """
+
+    def __init__(self, max_in_flight: int, max_wait: float = 0.1):
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.peak_in_flight = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def acquire(self) -> bool:
+        if self._semaphore.locked():
+            if self.max_wait <= 0:
+                self.shed += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.admitted += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "max_in_flight": self.max_in_flight,
+                "peak_in_flight": self.peak_in_flight, "admitted_total": self.admitted, "shed_total": self.shed}
+
+
+def client_key(scope: dict, api_keys: Container[str] = (), trusted_proxies: int = 0) -> str:
+    """Who a request is counted against: its API key if it is a known one, else its IP address.
+
+    Unknown keys are ignored, or a flood could pick a fresh bucket per request.
+    Behind ``trusted_proxies`` proxies that each append to X-Forwarded-For,
+    the client is the entry the outermost one appended, counted from the
+    right; entries left of it come from the client and can be forged.
+    """
+    headers = dict(scope["headers"])
+    api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+    if api_key and api_key in api_keys:
+        return "key:" + api_key
+    if trusted_proxies:
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            entries = [entry.strip() for entry in forwarded.decode("latin-1").split(",")]
+            return "ip:" + entries[max(0, len(entries) - trusted_proxies)]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+def _exempt(path: str, prefixes: Iterable[str]) -> bool:
+    return any(path == prefix or path.startswith(prefix + "/") for prefix in prefixes)
+
+
+def _streams(scope: dict) -> bool:
+    if (scope["method"], scope["path"].rstrip("/")) not in ADMISSION_EXEMPT_STREAMS:
+        return False
+    stream = parse_qs(scope["query_string"].decode("latin-1")).get("stream")
+    return bool(stream) and stream[-1].lower() in TRUE_VALUES
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the per-client rate limit and the concurrency cap.
+
+    Both run before the body is read or validated, so rejected floods cost
+    no parsing and no Mongo work. Limiters come from the per-worker
+    resources and are skipped when not configured.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        resources = scope["app"].state.resources
+
+        rate_limiter = resources.rate_limiter
+        if rate_limiter and (scope["method"], scope["path"].rstrip("/")) in RATE_LIMITED_ROUTES:
+            key = client_key(scope, resources.rate_limit_keys, resources.trusted_proxies)
+            wait = 0 if key in resources.rate_limit_exempt else await rate_limiter.acquire(key)
+            if wait > 0:
+                response = JSONResponse({"detail": "Too many requests"}, status_code=429,
+                                        headers={"Retry-After": _retry_after(wait)})
+                await response(scope, receive, send)
+                return
+
+        admission = resources.admission
+        if admission is None or _exempt(scope["path"], ADMISSION_EXEMPT_PREFIXES) or _streams(scope):
+            await self.app(scope, receive, send)
+            return
+        if not await admission.acquire():
+            response = JSONResponse({"detail": "Server busy, retry shortly"}, status_code=503,
+                                    headers={"Retry-After": _retry_after(admission.max_wait)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
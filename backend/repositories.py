@@ -0,0 +1,303 @@
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+# Position in (timestamp, id) order
+Cursor = Tuple[datetime, str]
+
+STREAM_BATCH = 500
+
+STATUS_FIELDS = ("id", "client_name", "timestamp")
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; aware query bounds are converted to match."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def project(document: dict, fields: Sequence[str]) -> dict:
+    return {field: document[field] for field in fields if field in document}
+
+
+class DuplicateContactError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ContactQuery:
+    """One page of a contact forms listing, independent of the storage it runs on.
+
+    Forms are ordered by (timestamp, id), newest first when ``descending``;
+    ``after`` is the position of the last form of the previous page. The
+    amount range is in minor units and only matches forms that have them.
+    """
+
+    fields: Tuple[str, ...]
+    status: Optional[str] = None
+    min_amount_minor: Optional[int] = None
+    max_amount_minor: Optional[int] = None
+    currency: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    descending: bool = False
+    after: Optional[Cursor] = None
+    archived: bool = False
+
+
+class ContactRepository:
+    """Storage of contact forms behind the contact endpoints.
+
+    Forms are dicts with the ContactForm fields plus a ``version`` bumped by
+    every status change. The repository also keeps the change counter that
+    conditional list GETs compare; the caller bumps it after each write.
+    """
+
+    name = "base"
+
+    async def add(self, document: dict):
+        raise NotImplementedError
+
+    async def add_many(self, documents: List[dict]) -> Dict[int, str]:
+        """Store every document that can be stored; return the error of each failed position."""
+        raise NotImplementedError
+
+    async def get(self, contact_id: str, fields: Sequence[str]) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def page(self, query: ContactQuery, limit: int) -> List[dict]:
+        raise NotImplementedError
+
+    async def stream(self, query: ContactQuery, limit: Optional[int] = None,
+                     batch_size: int = STREAM_BATCH) -> AsyncIterator[dict]:
+        """Every matching form, fetched a page of ``batch_size`` at a time."""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            documents = await self.page(query, size)
+            for document in documents:
+                yield document
+            if len(documents) < size:
+                return
+            if remaining is not None:
+                remaining -= len(documents)
+            query = replace(query, after=(documents[-1]["timestamp"], documents[-1]["id"]))
+
+    async def set_status(self, contact_id: str, status: str, fields: Sequence[str]) -> Optional[dict]:
+        """Set the status and bump the version; return the form as it was before, or None if unknown."""
+        raise NotImplementedError
+
+    async def version(self) -> Tuple[int, datetime]:
+        raise NotImplementedError
+
+    async def bump_version(self):
+        raise NotImplementedError
+
+    async def ping(self):
+        pass
+
+
+class StatusRepository:
+    """Storage of client heartbeats and of the latest heartbeat per client."""
+
+    name = "base"
+
+    async def add(self, heartbeats: List[dict]):
+        raise NotImplementedError
+
+    async def recent(self, client_name: Optional[str] = None, limit: int = 1000) -> List[dict]:
+        """Most recent heartbeats first, optionally of one client."""
+        raise NotImplementedError
+
+    async def latest(self, client_name: Optional[str] = None, since: Optional[datetime] = None,
+                     limit: int = 1000) -> List[dict]:
+        """Latest heartbeat of every client by client_name, optionally only those seen ``since``."""
+        raise NotImplementedError
+
+
+def mongo_contact_query(query: ContactQuery) -> Tuple[dict, list, dict]:
+    """Translate ``query`` into a Mongo (filter, sort, projection).
+
+    Every combination is served by the ``timestamp_id`` or
+    ``status_timestamp_id`` index without an in-memory sort; the amount
+    range and currency are checked on the documents the index scan returns.
+    """
+    direction = DESCENDING if query.descending else ASCENDING
+    clauses = []
+    if query.status is not None:
+        clauses.append({"status": query.status})
+    if query.since is not None or query.until is not None:
+        timestamp_range = {}
+        if query.since is not None:
+            timestamp_range["$gte"] = query.since
+        if query.until is not None:
+            timestamp_range["$lt"] = query.until
+        clauses.append({"timestamp": timestamp_range})
+    if query.min_amount_minor is not None or query.max_amount_minor is not None:
+        amount_range = {}
+        if query.min_amount_minor is not None:
+            amount_range["$gte"] = query.min_amount_minor
+        if query.max_amount_minor is not None:
+            amount_range["$lte"] = query.max_amount_minor
+        clauses.append({"amount_minor": amount_range})
+    if query.currency is not None:
+        clauses.append({"currency": query.currency})
+    if query.after is not None:
+        timestamp, item_id = query.after
+        op = "$lt" if query.descending else "$gt"
+        clauses.append({"$or": [
+            {"timestamp": {op: timestamp}},
+            {"timestamp": timestamp, "id": {op: item_id}},
+        ]})
+
+    mongo_filter = {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+    sort = [("timestamp", direction), ("id", direction)]
+    projection = {"_id": 0, **{field: 1 for field in query.fields}}
+    return mongo_filter, sort, projection
+
+
+def _write_errors(error: BulkWriteError) -> Dict[int, str]:
+    return {item["index"]: item.get("errmsg", "Write failed") for item in error.details["writeErrors"]}
+
+
+class MongoContactRepository(ContactRepository):
+    """Contact forms in the hot collection, falling through to the archive for reads by id and updates.
+
+    With an ``outbox``, every new form is inserted together with its outbox
+    event in one transaction, which needs a replica set. Without
+    ``transactions`` (standalone servers) the events are inserted right
+    after the forms, and a crash in between loses them.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection, archive, contact_version, outbox=None, transactions: bool = True):
+        self.collection = collection
+        self.archive = archive
+        self.contact_version = contact_version
+        self.outbox = outbox
+        self.transactions = transactions
+
+    async def add(self, document: dict):
+        if self.outbox is None:
+            await self.collection.insert_one(document)
+            return
+        failed = await self.add_many([document])
+        if failed:
+            raise DuplicateContactError(failed[0])
+
+    async def add_many(self, documents: List[dict]) -> Dict[int, str]:
+        if self.outbox is None:
+            try:
+                await self.collection.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                return _write_errors(e)
+            return {}
+        events = [self.outbox.event(document) for document in documents]
+        if self.transactions:
+            failed = await self._add_in_transaction(documents, events)
+        else:
+            try:
+                await self.collection.insert_many(documents, ordered=False)
+                failed = {}
+            except BulkWriteError as e:
+                failed = _write_errors(e)
+            await self.outbox.record([event for position, event in enumerate(events) if position not in failed])
+        if len(failed) < len(documents):
+            self.outbox.notify(len(documents) - len(failed))
+        return failed
+
+    async def _add_in_transaction(self, documents: List[dict], events: List[dict]) -> Dict[int, str]:
+        failed: Dict[int, str] = {}
+        positions = list(range(len(documents)))
+
+        async def write(session):
+            await self.collection.insert_many([documents[p] for p in positions], ordered=False, session=session)
+            await self.outbox.record([events[p] for p in positions], session=session)
+
+        async with await self.collection.database.client.start_session() as session:
+            while positions:
+                try:
+                    await session.with_transaction(write)
+                    break
+                except BulkWriteError as e:
+                    # A write error aborts the whole transaction: drop the rejected forms and write the rest again
+                    rejected = {positions[index]: error for index, error in _write_errors(e).items()}
+                    failed.update(rejected)
+                    positions = [p for p in positions if p not in rejected]
+        return failed
+
+    async def get(self, contact_id: str, fields: Sequence[str]) -> Optional[dict]:
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        for collection in (self.collection, self.archive):
+            document = await collection.find_one({"id": contact_id}, projection)
+            if document is not None:
+                return document
+        return None
+
+    def _cursor(self, query: ContactQuery):
+        mongo_filter, sort, projection = mongo_contact_query(query)
+        collection = self.archive if query.archived else self.collection
+        return collection.find(mongo_filter, projection).sort(sort)
+
+    async def page(self, query: ContactQuery, limit: int) -> List[dict]:
+        return await self._cursor(query).limit(limit).to_list(limit)
+
+    async def stream(self, query: ContactQuery, limit: Optional[int] = None,
+                     batch_size: int = STREAM_BATCH) -> AsyncIterator[dict]:
+        # One cursor instead of a query per page
+        cursor = self._cursor(query)
+        if limit:
+            cursor = cursor.limit(limit)
+        async for document in cursor.batch_size(batch_size):
+            yield document
+
+    async def set_status(self, contact_id: str, status: str, fields: Sequence[str]) -> Optional[dict]:
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        update = {"$set": {"status": status}, "$inc": {"version": 1}}
+        for collection in (self.collection, self.archive):
+            document = await collection.find_one_and_update(
+                {"id": contact_id}, update, projection, return_document=ReturnDocument.BEFORE)
+            if document is not None:
+                return document
+        return None
+
+    async def version(self) -> Tuple[int, datetime]:
+        return await self.contact_version.current()
+
+    async def bump_version(self):
+        await self.contact_version.bump()
+
+    async def ping(self):
+        await self.collection.database.client.admin.command("ping")
+
+
+class MongoStatusRepository(StatusRepository):
+    """Heartbeats in the time-series collection and the materialized latest-per-client view.
+
+    The routes normally queue heartbeats for the write-behind flusher, which
+    updates the view itself; ``add`` writes them at once.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection, status_latest):
+        self.collection = collection
+        self.status_latest = status_latest
+
+    async def add(self, heartbeats: List[dict]):
+        await self.collection.insert_many([dict(heartbeat) for heartbeat in heartbeats], ordered=False)
+        await self.status_latest.record(heartbeats)
+
+    async def recent(self, client_name: Optional[str] = None, limit: int = 1000) -> List[dict]:
+        query = {} if client_name is None else {"client_name": client_name}
+        cursor = self.collection.find(query, {"_id": 0, **{field: 1 for field in STATUS_FIELDS}})
+        return await cursor.sort("timestamp", DESCENDING).limit(limit).to_list(limit)
+
+    async def latest(self, client_name: Optional[str] = None, since: Optional[datetime] = None,
+                     limit: int = 1000) -> List[dict]:
+        return await self.status_latest.latest(client_name, since, limit)
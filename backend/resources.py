@@ -0,0 +1,412 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+from cache import create_cache
+from contact_archive import ARCHIVE_COLLECTION, ContactArchiver, ensure_archive_collection
+from contact_feed import ContactFeed
+from contact_outbox import OUTBOX_COLLECTION, OUTBOX_INDEXES, ContactOutbox, load_handlers
+from contact_rollups import ROLLUP_INDEXES, ContactRollups
+from contact_search import SEARCH_INDEXES, ContactSearch
+from contact_stats import ContactStats
+from http_cache import VERSIONS_COLLECTION, CollectionVersion
+from idempotency import IDEMPOTENCY_INDEXES, IdempotencyStore
+from metrics import MongoCommandTimer
+from memory_repository import MemoryContactRepository, MemoryStatusRepository
+from mongo_pool import PoolStats, client_options, warm_up
+from rate_limit import ConcurrencyLimiter, create_rate_limiter
+from repositories import (ContactRepository, MongoContactRepository, MongoStatusRepository,
+                          StatusRepository)
+from sqlite_repository import SQLiteContactRepository, SQLiteStatusRepository, SQLiteStore
+from status_heartbeats import (HEARTBEAT_COLLECTION, HEARTBEAT_INDEXES, LATEST_INDEXES, StatusLatest,
+                               ensure_heartbeat_collection)
+from write_behind import WriteBehindQueue
+
+ROOT_DIR = Path(__file__).parent
+
+logger = logging.getLogger(__name__)
+
+CONTACT_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel([("status", ASCENDING), ("timestamp", ASCENDING), ("id", ASCENDING)],
+               name="status_timestamp_id"),
+    IndexModel([("timestamp", ASCENDING), ("id", ASCENDING)], name="timestamp_id"),
+    *SEARCH_INDEXES,
+]
+
+# Indexes the routes rely on; created idempotently at startup
+REQUIRED_INDEXES = {
+    "contact_forms": CONTACT_INDEXES,
+    # Same shape, so archived forms can be listed and looked up the same way
+    ARCHIVE_COLLECTION: CONTACT_INDEXES,
+    "status_checks": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("timestamp", ASCENDING), ("id", ASCENDING)], name="timestamp_id"),
+    ],
+    "contact_idempotency": IDEMPOTENCY_INDEXES,
+    "contact_rollups": ROLLUP_INDEXES,
+    HEARTBEAT_COLLECTION: HEARTBEAT_INDEXES,
+    "status_latest": LATEST_INDEXES,
+    OUTBOX_COLLECTION: OUTBOX_INDEXES,
+}
+
+
+async def ensure_collection_indexes(collection, indexes, create: bool = True):
+    """Create the missing ``indexes``, or with ``create`` false only check; raise if any is still absent."""
+    started = time.perf_counter()
+    existing = await collection.index_information()
+    # A warm database already has everything; skip the createIndexes round trip
+    missing = [index for index in indexes if index.document["name"] not in existing]
+    if missing and create:
+        await collection.create_indexes(missing)
+        existing = await collection.index_information()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info("%s %d indexes on %s (%d %s) in %.1f ms", "Ensured" if create else "Checked", len(indexes),
+                collection.name, len(missing), "created" if create else "missing", elapsed_ms)
+
+    absent = [index.document["name"] for index in indexes if index.document["name"] not in existing]
+    if absent:
+        raise RuntimeError(f"Required indexes missing on {collection.name}: {absent}")
+
+
+async def ensure_indexes(database, archive_compressor: Optional[str] = "zstd",
+                         heartbeat_ttl: int = 7 * 86400, heartbeat_timeseries: bool = True, create: bool = True):
+    """Create the collections and indexes the API needs; with ``create`` false only check the indexes exist."""
+    if create:
+        # Before their indexes, which would otherwise create them as plain collections
+        await asyncio.gather(ensure_archive_collection(database, archive_compressor),
+                             ensure_heartbeat_collection(database, heartbeat_ttl, heartbeat_timeseries))
+    await asyncio.gather(*(ensure_collection_indexes(database[name], indexes, create)
+                           for name, indexes in REQUIRED_INDEXES.items()))
+
+
+def load_settings() -> Mapping[str, str]:
+    """Environment with backend/.env applied; variables already set take precedence."""
+    load_dotenv(ROOT_DIR / '.env')
+    return os.environ
+
+
+class Resources:
+    """Everything one worker process owns: the storage and the state built on it.
+
+    Created inside the app lifespan, so each worker opens its own connections
+    after it has been forked or spawned. ``STORAGE_BACKEND`` selects Mongo
+    (the default) or an embedded engine for tests and small edge sites:
+    "memory" or "sqlite". Features built on Mongo aggregations and change
+    streams (search, stats, rollups, the feed, export, the archive and the
+    outbox) are None on embedded storage.
+    """
+
+    def __init__(self, settings: Mapping[str, str]):
+        self.settings = settings
+        self.storage = settings.get('STORAGE_BACKEND', 'mongo')
+        self.health_ping_timeout = float(settings.get('HEALTH_PING_TIMEOUT', '2'))
+        self.ready = False
+
+        # Read-through cache for GET /api/contact/{contact_id}. The memory backend is
+        # per worker: a status change would refresh this worker's entry only, and the
+        # others would serve the old status for up to CONTACT_CACHE_TTL seconds. So with
+        # more than one worker (WEB_CONCURRENCY, which uvicorn and gunicorn read and
+        # cli.py serve sets) the default is the shared redis one, or none without REDIS_URL.
+        workers = int(settings.get('WEB_CONCURRENCY', '1'))
+        cache_backend = settings.get('CONTACT_CACHE_BACKEND')
+        if cache_backend is None:
+            cache_backend = 'memory' if workers <= 1 else 'redis' if settings.get('REDIS_URL') else 'none'
+        elif cache_backend == 'memory' and workers > 1:
+            logger.warning("CONTACT_CACHE_BACKEND=memory with %d workers: status changes reach the "
+                           "other workers only after CONTACT_CACHE_TTL", workers)
+        self.contact_cache = create_cache(
+            cache_backend,
+            max_size=int(settings.get('CONTACT_CACHE_SIZE', '10000')),
+            ttl=float(settings.get('CONTACT_CACHE_TTL', '60')),
+            negative_ttl=float(settings.get('CONTACT_CACHE_NEGATIVE_TTL', '5')),
+            url=settings.get('REDIS_URL'),
+        )
+
+        # Token bucket per client IP or X-Api-Key on the public write endpoints;
+        # use the redis backend to share buckets between workers
+        self.rate_limiter = create_rate_limiter(
+            settings.get('CONTACT_RATE_LIMIT_BACKEND', 'memory'),
+            per_minute=float(settings.get('CONTACT_RATE_LIMIT_PER_MINUTE', '30')),
+            burst=int(settings.get('CONTACT_RATE_LIMIT_BURST', '10')),
+            max_keys=int(settings.get('CONTACT_RATE_LIMIT_MAX_KEYS', '100000')),
+            url=settings.get('REDIS_URL'),
+        )
+        # X-Api-Key values limited per key instead of per IP, and keys not limited at all
+        # (trusted integrations such as bulk importers and benchmarks)
+        exempt = {key for key in settings.get('RATE_LIMIT_EXEMPT_KEYS', '').split(',') if key}
+        self.rate_limit_keys = exempt | {key for key in settings.get('RATE_LIMIT_API_KEYS', '').split(',') if key}
+        self.rate_limit_exempt = {"key:" + key for key in exempt}
+        # Proxies in front of the API that append to X-Forwarded-For, when uvicorn does not rewrite
+        # the client address; RATE_LIMIT_TRUST_FORWARDED=true means one
+        trust_forwarded = settings.get('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+        self.trusted_proxies = int(settings.get('RATE_LIMIT_TRUSTED_PROXIES', '1' if trust_forwarded else '0'))
+
+        # Requests beyond what the Mongo pool can serve are shed with 503 instead of queueing on it
+        max_in_flight = int(settings.get('ADMISSION_MAX_IN_FLIGHT', settings.get('MONGO_MAX_POOL_SIZE') or '100'))
+        self.admission: Optional[ConcurrencyLimiter] = None
+        if max_in_flight > 0:
+            self.admission = ConcurrencyLimiter(
+                max_in_flight, max_wait=float(settings.get('ADMISSION_MAX_WAIT_MS', '100')) / 1000)
+
+        self.heartbeat_ttl = int(float(settings.get('STATUS_HEARTBEAT_TTL_DAYS', '7')) * 86400)
+
+        self.client = None
+        self.db = None
+        self.pool_stats: Optional[PoolStats] = None
+        self.sqlite: Optional[SQLiteStore] = None
+        self.contact_stats: Optional[ContactStats] = None
+        self.contact_rollups: Optional[ContactRollups] = None
+        self.contact_version: Optional[CollectionVersion] = None
+        self.contact_archive = None
+        self.contact_search: Optional[ContactSearch] = None
+        self.archive_search: Optional[ContactSearch] = None
+        self.contact_archiver: Optional[ContactArchiver] = None
+        self.run_archiver = False
+        self.contact_feed: Optional[ContactFeed] = None
+        self.status_latest: Optional[StatusLatest] = None
+        self.status_queue: Optional[WriteBehindQueue] = None
+        self.contact_write_queue: Optional[WriteBehindQueue] = None
+        # Idempotency key of each queued form by id, released if its flush fails
+        self.write_behind_keys: Dict[str, str] = {}
+        self.contact_outbox: Optional[ContactOutbox] = None
+        self.run_outbox = False
+
+        if self.storage == 'mongo':
+            self._open_mongo(settings)
+        elif self.storage == 'memory':
+            self.contacts: ContactRepository = MemoryContactRepository()
+            self.statuses: StatusRepository = MemoryStatusRepository(
+                self.heartbeat_ttl, max_heartbeats=int(settings.get('STATUS_MEMORY_MAX_HEARTBEATS', '100000')))
+        elif self.storage == 'sqlite':
+            # WAL mode: more workers on the same file read concurrently with the one writing
+            self.sqlite = SQLiteStore(settings.get('SQLITE_PATH', str(ROOT_DIR / 'goodtransfer.sqlite3')))
+            self.contacts = SQLiteContactRepository(self.sqlite)
+            self.statuses = SQLiteStatusRepository(self.sqlite, self.heartbeat_ttl)
+        else:
+            raise ValueError(f"Unknown storage backend: {self.storage}")
+
+        # Retried submissions return the original form instead of creating another.
+        # On embedded storage keys are only remembered by this worker, for the dedup window.
+        self.idempotency = IdempotencyStore(
+            self.db.contact_idempotency if self.db is not None else None,
+            window=int(settings.get('IDEMPOTENCY_WINDOW_SECONDS', '600')),
+            key_ttl=int(settings.get('IDEMPOTENCY_KEY_TTL_SECONDS', '86400')),
+        )
+
+    def _open_mongo(self, settings: Mapping[str, str]):
+        self.pool_stats = PoolStats()
+        self.client = AsyncIOMotorClient(settings['MONGO_URL'],
+                                         event_listeners=[self.pool_stats, MongoCommandTimer()],
+                                         **client_options(settings))
+        self.db = self.client[settings['DB_NAME']]
+        self.warmup_connections = int(settings.get('MONGO_WARMUP_CONNECTIONS',
+                                                   settings.get('MONGO_MIN_POOL_SIZE', '4')))
+        # Set to false when indexes are created at deploy time (cli.py ensure-indexes); startup
+        # then only checks they exist, one listIndexes per collection
+        self.ensure_indexes = settings.get('MONGO_ENSURE_INDEXES', 'true').lower() == 'true'
+
+        # Status changes only invalidate this worker's cached buckets; other
+        # workers pick them up when their entries expire
+        self.contact_stats = ContactStats(self.db.contact_forms, archive=ARCHIVE_COLLECTION,
+                                          cache_ttl=float(settings.get('CONTACT_STATS_CACHE_TTL', '300')))
+
+        # Hourly and daily totals kept current on every write
+        self.contact_rollups = ContactRollups(self.db.contact_rollups)
+
+        # Bumped on every write to the hot or archived forms; the validator of conditional list GETs
+        self.contact_version = CollectionVersion(self.db[VERSIONS_COLLECTION], "contact_forms")
+
+        # Moves completed or old forms out of the hot collection; reads by id fall through to it
+        self.contact_archive = self.db[ARCHIVE_COLLECTION]
+        self.archive_compressor = settings.get('CONTACT_ARCHIVE_COMPRESSOR', 'zstd')
+
+        # Agent notification, lead scoring and CRM sync run from an outbox event stored with
+        # each new form, off the request path
+        if settings.get('CONTACT_OUTBOX', 'false').lower() == 'true':
+            workers = int(settings.get('CONTACT_OUTBOX_WORKERS', '8'))
+            self.contact_outbox = ContactOutbox(
+                self.db[OUTBOX_COLLECTION],
+                load_handlers(settings.get('CONTACT_OUTBOX_HANDLERS', ''),
+                              concurrency=int(settings.get('CONTACT_OUTBOX_HANDLER_CONCURRENCY', str(workers))),
+                              timeout=float(settings.get('CONTACT_OUTBOX_HANDLER_TIMEOUT', '30'))),
+                workers=workers,
+                max_attempts=int(settings.get('CONTACT_OUTBOX_MAX_ATTEMPTS', '8')),
+                backoff=float(settings.get('CONTACT_OUTBOX_BACKOFF_SECONDS', '1')),
+                max_backoff=float(settings.get('CONTACT_OUTBOX_MAX_BACKOFF_SECONDS', '300')),
+                lease=float(settings.get('CONTACT_OUTBOX_LEASE_SECONDS', '60')),
+                poll_interval=float(settings.get('CONTACT_OUTBOX_POLL_INTERVAL', '1')),
+                retention_days=float(settings.get('CONTACT_OUTBOX_RETENTION_DAYS', '7')),
+            )
+            # Set to false to dispatch from separate processes only (cli.py outbox)
+            self.run_outbox = settings.get('CONTACT_OUTBOX_DISPATCH', 'true').lower() == 'true'
+        self.contacts = MongoContactRepository(
+            self.db.contact_forms, self.contact_archive, self.contact_version, outbox=self.contact_outbox,
+            # Transactions need a replica set; set to false on a standalone server
+            transactions=settings.get('CONTACT_OUTBOX_TRANSACTIONS', 'true').lower() == 'true')
+
+        self.contact_search = ContactSearch(self.db.contact_forms)
+        self.archive_search = ContactSearch(self.contact_archive)
+        self.contact_archiver = ContactArchiver(
+            self.db.contact_forms,
+            self.contact_archive,
+            statuses=settings.get('CONTACT_ARCHIVE_STATUSES', 'completed,cancelled').split(','),
+            max_age_days=float(settings.get('CONTACT_ARCHIVE_AFTER_DAYS', '90')),
+            batch_size=int(settings.get('CONTACT_ARCHIVE_BATCH_SIZE', '1000')),
+            interval=float(settings.get('CONTACT_ARCHIVE_INTERVAL', '300')),
+            on_moved=self.contacts_changed,
+        )
+        # One archiving process per deployment is enough; or run cli.py archive from cron
+        self.run_archiver = settings.get('CONTACT_ARCHIVE', 'false').lower() == 'true'
+
+        # Server-Sent Events feed of new and updated contact forms
+        self.contact_feed = ContactFeed(self.db.contact_forms,
+                                        max_catch_ups=int(settings.get('CONTACT_FEED_MAX_CATCH_UPS', '50')))
+
+        # Heartbeats from POST /api/status are buffered and written in batches; each
+        # flush also advances the latest-per-client view
+        # Set to false on servers without time-series collections (before MongoDB 5.0)
+        self.heartbeat_timeseries = settings.get('STATUS_HEARTBEAT_TIMESERIES', 'true').lower() == 'true'
+        self.status_latest = StatusLatest(self.db.status_latest)
+        self.statuses = MongoStatusRepository(self.db[HEARTBEAT_COLLECTION], self.status_latest)
+        self.status_queue = WriteBehindQueue(
+            self.db[HEARTBEAT_COLLECTION],
+            max_size=int(settings.get('STATUS_MAX_QUEUE', '50000')),
+            batch_size=int(settings.get('STATUS_BATCH_SIZE', '1000')),
+            flush_interval=float(settings.get('STATUS_FLUSH_INTERVAL', '0.1')),
+            on_written=self.status_latest.record,
+        )
+
+        # Optional write-behind mode for POST /api/contact
+        if settings.get('CONTACT_WRITE_BEHIND', 'false').lower() == 'true':
+            self.contact_write_queue = WriteBehindQueue(
+                self.db.contact_forms,
+                max_size=int(settings.get('WRITE_BEHIND_MAX_QUEUE', '10000')),
+                batch_size=int(settings.get('WRITE_BEHIND_BATCH_SIZE', '500')),
+                flush_interval=float(settings.get('WRITE_BEHIND_FLUSH_INTERVAL', '0.05')),
+                on_written=self.contacts_flushed,
+                on_failed=self.contacts_not_flushed,
+            )
+
+    async def start(self):
+        if self.sqlite:
+            await self.sqlite.open()
+        if self.client is not None:
+            started = time.perf_counter()
+            # Index checks ride on the connections being warmed instead of waiting for them
+            await asyncio.gather(warm_up(self.client, self.warmup_connections),
+                                 ensure_indexes(self.db, self.archive_compressor, self.heartbeat_ttl,
+                                                self.heartbeat_timeseries, create=self.ensure_indexes))
+            logger.info("Warmed up %d Mongo connections and %s indexes in %.1f ms", self.warmup_connections,
+                        "ensured" if self.ensure_indexes else "checked", (time.perf_counter() - started) * 1000)
+        if self.status_queue:
+            self.status_queue.start()
+        if self.contact_write_queue:
+            self.contact_write_queue.start()
+        if self.run_archiver:
+            self.contact_archiver.start()
+        if self.run_outbox:
+            self.contact_outbox.start()
+        self.ready = True
+
+    async def close(self):
+        self.ready = False
+        if self.contact_archiver:
+            await self.contact_archiver.stop()
+        if self.contact_outbox:
+            await self.contact_outbox.stop()
+        # Queued writes must reach Mongo before the client goes away
+        if self.contact_write_queue:
+            await self.contact_write_queue.drain()
+        if self.status_queue:
+            await self.status_queue.drain()
+        if self.contact_cache:
+            await self.contact_cache.close()
+        if self.contact_feed:
+            await self.contact_feed.close()
+        if self.rate_limiter:
+            await self.rate_limiter.close()
+        if self.client is not None:
+            self.client.close()
+        if self.sqlite:
+            await self.sqlite.close()
+
+    async def contacts_written(self, documents: List[dict]):
+        """Count newly stored forms in the rollups and mark the contact lists changed, concurrently."""
+        steps = [self.contacts_changed()]
+        if self.contact_rollups:
+            steps.append(self.record_rollups(documents))
+        await asyncio.gather(*steps)
+
+    async def record_rollups(self, documents: List[dict]):
+        # The forms are stored either way; cli.py rebuild-rollups repairs a missed increment
+        try:
+            await self.contact_rollups.record(documents)
+        except PyMongoError:
+            logger.exception("Could not update rollups for %d contact forms", len(documents))
+
+    def queue_contacts(self, documents: List[dict], keys: List[str]):
+        """Queue forms for the write-behind flusher; ``keys`` are the idempotency keys they were claimed under."""
+        self.contact_write_queue.put_many(documents)
+        self.write_behind_keys.update(zip((document["id"] for document in documents), keys))
+
+    async def contacts_flushed(self, documents: List[dict]):
+        """Write-behind hook: queue the outbox events of the flushed forms, then count them."""
+        for document in documents:
+            self.write_behind_keys.pop(document["id"], None)
+        if self.contact_outbox:
+            # Queued forms are only as durable as the process anyway, so no transaction here
+            try:
+                await self.contact_outbox.record([self.contact_outbox.event(document) for document in documents])
+                self.contact_outbox.notify(len(documents))
+            except PyMongoError:
+                logger.exception("Could not store outbox events for %d contact forms", len(documents))
+        await self.contacts_written(documents)
+
+    async def contacts_not_flushed(self, documents: List[dict]):
+        """Write-behind hook: forget forms that were never stored.
+
+        Their idempotency keys are released, so a retry creates the form
+        instead of replaying an id that does not exist, and their cached
+        copies are dropped.
+        """
+        keys = [self.write_behind_keys.pop(document["id"]) for document in documents
+                if document["id"] in self.write_behind_keys]
+        if keys:
+            await self.idempotency.release_many(keys)
+        if self.contact_cache:
+            for document in documents:
+                await self.contact_cache.delete(document["id"])
+
+    async def contacts_changed(self):
+        try:
+            await self.contacts.bump_version()
+        except PyMongoError:
+            logger.exception("Could not bump the contact forms version")
+
+    def components(self) -> dict:
+        """Objects with a ``stats()`` method, by the name they are exported under."""
+        return {
+            "mongo_pool": self.pool_stats,
+            "contact_cache": self.contact_cache,
+            "contact_stats_cache": self.contact_stats,
+            "contact_archive": self.contact_archiver,
+            "contact_rollups": self.contact_rollups,
+            "contact_version": self.contact_version,
+            "write_behind": self.contact_write_queue,
+            "contact_outbox": self.contact_outbox,
+            "contact_feed": self.contact_feed,
+            "idempotency": self.idempotency,
+            "status_heartbeats": self.status_queue,
+            "status_latest": self.status_latest,
+            "rate_limit": self.rate_limiter,
+            "admission": self.admission,
+        }
@@ -1,26 +1,38 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo.errors import PyMongoError
+import asyncio
+import json
+import sqlite3
+import orjson
+import time
+import base64
 import logging
-from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Dict, List, Literal, Mapping, Optional, Tuple
 import uuid
 from datetime import datetime
+from decimal import Decimal
 
+from cache import MISSING
+from contact_search import SearchQueryError, search_fields
+from compression import CompressionMiddleware
+from contact_stats import StatsRangeError
+from http_cache import is_not_modified, make_etag, not_modified, query_digest, validator_headers
+from metrics import Gauge, MetricsMiddleware, registry
+from money import DEFAULT_CURRENCY, from_minor, to_minor
+from rate_limit import AdmissionMiddleware
+from repositories import ContactQuery, mongo_contact_query, naive_utc
+from resources import Resources, load_settings
+from write_behind import QueueFullError
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app without a prefix
-app = FastAPI()
+FEED_HEARTBEAT_SECONDS = 15
+STATUS_BATCH_MAX = 1000
+# A batch of CONTACT_BATCH_MAX forms with ASCII messages this long fits in CONTACT_BATCH_MAX_BYTES
+CONTACT_MESSAGE_MAX_LENGTH = 5000
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -35,70 +47,753 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class StatusBatchResponse(BaseModel):
+    accepted: int
+
 class ContactForm(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     email: Optional[str] = None
     phone: str
+    # amount_minor is authoritative; amount is kept for display and older clients
     amount: float
+    amount_minor: int
+    currency: str = DEFAULT_CURRENCY
     message: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     status: str = Field(default="pending")
 
+    @model_validator(mode="before")
+    @classmethod
+    def fill_minor_units(cls, data):
+        if not isinstance(data, dict):
+            return data
+        currency = data.get("currency") or DEFAULT_CURRENCY
+        if data.get("amount_minor") is None and data.get("amount") is not None:
+            # New forms and documents stored before the migration only have the amount
+            data = {**data, "amount_minor": to_minor(data["amount"], currency, strict=False)}
+        if data.get("amount_minor") is not None:
+            data = {**data, "amount": float(from_minor(data["amount_minor"], currency))}
+        return data
+
 class ContactFormCreate(BaseModel):
     name: str
     email: Optional[str] = None
     phone: str
-    amount: float
-    message: Optional[str] = None
+    # 18 digits fit in int64 minor units for every currency exponent
+    amount: Decimal = Field(max_digits=18)
+    currency: str = Field(default=DEFAULT_CURRENCY, pattern="^[A-Z]{3}$")
+    message: Optional[str] = Field(None, max_length=CONTACT_MESSAGE_MAX_LENGTH)
+
+    @model_validator(mode="after")
+    def check_precision(self):
+        to_minor(self.amount, self.currency)
+        return self
+
+class ContactStatusUpdate(BaseModel):
+    status: Literal["pending", "in_progress", "completed", "cancelled"]
+
+class ContactReplay(ContactFormCreate):
+    # A form queued offline by the PWA, with the key it was first submitted under
+    idempotency_key: Optional[str] = Field(None, max_length=200)
+
+class ContactBatchResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    replayed: bool = False
+    error: Optional[str] = None
+
+class ContactBatchResponse(BaseModel):
+    accepted: int
+    replayed: int
+    failed: int
+    results: List[ContactBatchResult]
+
+class BulkContactResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkContactResponse(BaseModel):
+    inserted: int
+    failed: int
+    results: List[BulkContactResult]
+
+# Keyset pagination over (timestamp, id)
+CONTACT_PAGE_DEFAULT = 1000
+CONTACT_PAGE_MAX = 1000
+CONTACT_STREAM_BATCH = 500
+
+def encode_cursor(timestamp: datetime, item_id: str) -> str:
+    raw = f"{timestamp.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, item_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(timestamp), item_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+async def stream_contact_forms(documents):
+    async for contact_form in documents:
+        yield orjson.dumps(contact_form) + b"\n"
+
+# List endpoints fetch only the model's fields and encode the documents
+# directly, instead of building models that FastAPI then re-validates.
+CONTACT_FIELDS = tuple(ContactForm.model_fields)
+# Single-form reads also need the version their ETag is made from
+CONTACT_DOCUMENT_FIELDS = (*CONTACT_FIELDS, "version")
+CONTACT_PROJECTION = {"_id": 0, **{field: 1 for field in CONTACT_FIELDS}}
+
+def contact_query(
+    status: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    order: str = "asc",
+    fields: Optional[str] = None,
+    after: Optional[str] = None,
+    currency: Optional[str] = None,
+    archived: bool = False,
+) -> ContactQuery:
+    """Validate list filters into a storage-independent query.
+
+    An amount range is in ``currency``, USD unless given.
+    """
+    min_amount_minor = max_amount_minor = None
+    if min_amount is not None or max_amount is not None:
+        # Minor units only compare within one currency
+        currency = currency or DEFAULT_CURRENCY
+        try:
+            if min_amount is not None:
+                min_amount_minor = to_minor(min_amount, currency, strict=False)
+            if max_amount is not None:
+                max_amount_minor = to_minor(max_amount, currency, strict=False)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    projection = CONTACT_FIELDS
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(ContactForm.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {sorted(unknown)}")
+        # id and timestamp are always returned so the page cursor can be built
+        projection = ("id", "timestamp", *sorted(requested - {"id", "timestamp"}))
+    return ContactQuery(
+        fields=projection,
+        status=status,
+        min_amount_minor=min_amount_minor,
+        max_amount_minor=max_amount_minor,
+        currency=currency,
+        since=naive_utc(since),
+        until=naive_utc(until),
+        descending=order == "desc",
+        after=decode_cursor(after) if after else None,
+        archived=archived,
+    )
+
+def build_contact_query(*args, **kwargs) -> Tuple[dict, list, dict]:
+    """Translate list filters into a Mongo (filter, sort, projection), for the export and the CLI."""
+    return mongo_contact_query(contact_query(*args, **kwargs))
+
+# Bulk ingestion
+BULK_CHUNK_SIZE = 500
+# A partner kiosk export or a backfill file; larger imports are split by the client
+BULK_MAX_ROWS = 10_000
+BULK_MAX_BYTES = 16 * 1024 * 1024
+# Offline replays from one device
+CONTACT_BATCH_MAX = 100
+# 100 forms with messages of several kilobytes each
+CONTACT_BATCH_MAX_BYTES = 1024 * 1024
+
+async def iter_bulk_rows(request: Request, max_bytes: Optional[int] = None):
+    """Yield raw rows from a JSON array body or an NDJSON stream; a body over ``max_bytes`` gets a 413."""
+    async def body_chunks():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if max_bytes is not None and received > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Body must be at most {max_bytes} bytes")
+            yield chunk
+
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        buffer = b""
+        async for chunk in body_chunks():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        rows = json.loads(b"".join([chunk async for chunk in body_chunks()]))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for row in rows:
+        yield row
+
+async def read_bulk_rows(request: Request, max_rows: int, max_bytes: int) -> list:
+    """Read every raw row of a bulk body, refusing one over ``max_rows`` or ``max_bytes`` with a 413.
+
+    The body is read in full before any row is written, so a refused request
+    writes nothing and can be split and resent as is.
+    """
+    # Oversized bodies are refused before their rows are parsed
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Body must be at most {max_bytes} bytes")
+    rows = []
+    async for row in iter_bulk_rows(request, max_bytes):
+        rows.append(row)
+        if len(rows) > max_rows:
+            raise HTTPException(status_code=413, detail=f"At most {max_rows} forms per request")
+    return rows
+
+def contact_document(contact_obj: ContactForm) -> dict:
+    """The stored form: the model plus the normalized fields search uses."""
+    document = contact_obj.dict()
+    return {**document, **search_fields(document)}
+
+def load_bulk_row(row) -> dict:
+    if isinstance(row, bytes):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError("Row must be a JSON object")
+    return row
+
+def parse_bulk_row(row) -> ContactForm:
+    return ContactForm(**ContactFormCreate(**load_bulk_row(row)).dict())
+
+async def insert_bulk_chunk(resources: Resources, chunk: List[Tuple[int, ContactForm]],
+                            results: List[BulkContactResult]):
+    documents = [contact_document(contact_obj) for _, contact_obj in chunk]
+    failed = await resources.contacts.add_many(documents)
+    await resources.contacts_written([document for position, document in enumerate(documents)
+                                      if position not in failed])
+    for position, (index, contact_obj) in enumerate(chunk):
+        if position in failed:
+            results.append(BulkContactResult(index=index, error=failed[position]))
+        else:
+            results.append(BulkContactResult(index=index, id=contact_obj.id))
+
+async def record_heartbeats(resources: Resources, heartbeats: List[dict]):
+    if resources.status_queue is None:
+        # Embedded storage writes them at once
+        await resources.statuses.add(heartbeats)
+        return
+    try:
+        resources.status_queue.put_many(heartbeats)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def require(resources: Resources, component):
+    """``component``, or a 501 when the storage backend does not provide it."""
+    if component is None:
+        raise HTTPException(status_code=501, detail=f"Not available with {resources.storage} storage")
+    return component
+
+def get_resources(request: Request) -> Resources:
+    """Per-worker resources created by the app lifespan."""
+    return request.app.state.resources
 
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Hello World"}
 
+@api_router.get("/health")
+async def health(resources: Resources = Depends(get_resources)):
+    """Readiness probe: 503 until startup finished and while the storage does not answer a ping."""
+    client = resources.client
+    body = {"ready": resources.ready, "storage": resources.storage}
+    if client is not None:
+        body["pool"] = {**resources.pool_stats.stats(), "max_size": client.options.pool_options.max_pool_size}
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(resources.contacts.ping(), resources.health_ping_timeout)
+        body["mongo_ping_ms" if client is not None else "ping_ms"] = \
+            round((time.perf_counter() - started) * 1000, 3)
+    except (asyncio.TimeoutError, PyMongoError, sqlite3.Error) as e:
+        body["ready"] = False
+        body["error"] = str(e) or "Storage ping timed out"
+    return ORJSONResponse(body, status_code=200 if body["ready"] else 503)
+
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
+async def create_status_check(input: StatusCheckCreate, resources: Resources = Depends(get_resources)):
+    """Record a client heartbeat.
+
+    On Mongo, heartbeats are buffered and written in batches, so they are
+    only as durable as the process until the next flush (STATUS_FLUSH_INTERVAL).
+    """
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await record_heartbeats(resources, [status_obj.dict()])
     return status_obj
 
+@api_router.post("/status/batch", response_model=StatusBatchResponse)
+async def create_status_checks_batch(input: List[StatusCheckCreate], resources: Resources = Depends(get_resources)):
+    """Record up to STATUS_BATCH_MAX heartbeats, e.g. relayed by a kiosk gateway, in one request."""
+    if len(input) > STATUS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {STATUS_BATCH_MAX} heartbeats per batch")
+    await record_heartbeats(resources, [StatusCheck(**status.dict()).dict() for status in input])
+    return StatusBatchResponse(accepted=len(input))
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(
+    client_name: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    resources: Resources = Depends(get_resources),
+):
+    """Most recent heartbeats first, optionally of one client."""
+    return ORJSONResponse(await resources.statuses.recent(client_name, limit))
+
+@api_router.get("/status/latest", response_model=List[StatusCheck])
+async def get_latest_status_checks(
+    client_name: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    resources: Resources = Depends(get_resources),
+):
+    """Latest heartbeat of every client, optionally only those seen ``since`` a time."""
+    return ORJSONResponse(await resources.statuses.latest(client_name, naive_utc(since), limit))
 
 # Contact Form Endpoints
 @api_router.post("/contact", response_model=ContactForm)
-async def create_contact_form(input: ContactFormCreate):
+async def create_contact_form(
+    input: ContactFormCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=200),
+    resources: Resources = Depends(get_resources),
+):
+    """Create a contact form.
+
+    A retry with the same ``Idempotency-Key`` header, or without one but with
+    the same name, phone, amount and currency inside the dedup window, returns the
+    original form with ``Idempotent-Replayed: true`` instead of a new one. The
+    header sent again with a different form gets a 422.
+    """
     contact_dict = input.dict()
     contact_obj = ContactForm(**contact_dict)
-    _ = await db.contact_forms.insert_one(contact_obj.dict())
+    idempotency = resources.idempotency
+    key = idempotency.key_for(idempotency_key, input.name, input.phone, input.amount, input.currency)
+    original = await idempotency.claim(key, contact_obj.dict())
+    if original is not None:
+        # Otherwise anyone reusing a key would read another submitter's form
+        if idempotency.conflicts(key, original, contact_obj.dict()):
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different form")
+        response.headers["Idempotent-Replayed"] = "true"
+        return ContactForm(**original)
+
+    try:
+        if resources.contact_write_queue:
+            # Returns once queued; the flusher writes it shortly after
+            try:
+                resources.queue_contacts([contact_document(contact_obj)], [key])
+            except QueueFullError as e:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        else:
+            await resources.contacts.add(contact_document(contact_obj))
+    except Exception:
+        await idempotency.release(key)
+        raise
+    if not resources.contact_write_queue:
+        # Queued forms are counted by the flusher once written
+        await resources.contacts_written([contact_obj.dict()])
+    if resources.contact_cache:
+        await resources.contact_cache.set(contact_obj.id, contact_obj.dict())
     return contact_obj
 
+@api_router.post("/contact/bulk", response_model=BulkContactResponse)
+async def create_contact_forms_bulk(request: Request, resources: Resources = Depends(get_resources)):
+    """Insert many contact forms from a JSON array or an NDJSON stream.
+
+    Rows are validated and written in chunks with unordered ``insert_many``;
+    the response reports the outcome of every row by its position. A body
+    over ``BULK_MAX_ROWS`` rows or ``BULK_MAX_BYTES`` gets a 413.
+    """
+    rows = await read_bulk_rows(request, BULK_MAX_ROWS, BULK_MAX_BYTES)
+    results: List[BulkContactResult] = []
+    chunk: List[Tuple[int, ContactForm]] = []
+    for index, row in enumerate(rows):
+        try:
+            chunk.append((index, parse_bulk_row(row)))
+        except (ValidationError, ValueError, TypeError) as e:
+            results.append(BulkContactResult(index=index, error=str(e)))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await insert_bulk_chunk(resources, chunk, results)
+            chunk = []
+    if chunk:
+        await insert_bulk_chunk(resources, chunk, results)
+
+    results.sort(key=lambda result: result.index)
+    failed = sum(1 for result in results if result.error)
+    return BulkContactResponse(inserted=len(results) - failed, failed=failed, results=results)
+
+@api_router.post("/contact/batch", response_model=ContactBatchResponse)
+async def create_contact_forms_batch(request: Request, resources: Resources = Depends(get_resources)):
+    """Accept the contact forms a device queued while offline, in one request.
+
+    Every row is deduplicated like a single ``POST /api/contact``: by its
+    ``idempotency_key``, or by name, phone, amount and currency inside the
+    dedup window. A row seen before returns the original form with ``replayed``
+    set, so a device may resend a batch whose response it never received.
+    Invalid rows, and rows reusing an ``idempotency_key`` for a different form,
+    are reported and should not be resent.
+    """
+    rows = await read_bulk_rows(request, CONTACT_BATCH_MAX, CONTACT_BATCH_MAX_BYTES)
+
+    idempotency = resources.idempotency
+    errors: Dict[int, str] = {}
+    row_keys: Dict[int, str] = {}
+    row_forms: Dict[int, dict] = {}
+    forms: Dict[str, ContactForm] = {}
+    for index, row in enumerate(rows):
+        try:
+            replay = ContactReplay(**load_bulk_row(row))
+        except (ValidationError, ValueError, TypeError) as e:
+            errors[index] = str(e)
+            continue
+        key = idempotency.key_for(replay.idempotency_key, replay.name, replay.phone, replay.amount,
+                                  replay.currency)
+        row_keys[index] = key
+        row_forms[index] = ContactForm(**replay.dict(exclude={"idempotency_key"})).dict()
+        if key not in forms:
+            forms[key] = ContactForm(**row_forms[index])
+
+    originals = await idempotency.claim_many({key: form.dict() for key, form in forms.items()})
+    new_keys = [key for key in forms if key not in originals]
+    failed: Dict[str, str] = {}
+    if new_keys:
+        documents = [contact_document(forms[key]) for key in new_keys]
+        try:
+            if resources.contact_write_queue:
+                try:
+                    resources.queue_contacts(documents, new_keys)
+                except QueueFullError as e:
+                    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+            else:
+                failed = {new_keys[position]: error
+                          for position, error in (await resources.contacts.add_many(documents)).items()}
+                if failed:
+                    await idempotency.release_many(list(failed))
+        except Exception:
+            await idempotency.release_many(new_keys)
+            raise
+        written = [forms[key].dict() for key in new_keys if key not in failed]
+        if not resources.contact_write_queue:
+            await resources.contacts_written(written)
+        if resources.contact_cache:
+            for contact in written:
+                await resources.contact_cache.set(contact["id"], contact)
+
+    results: List[ContactBatchResult] = []
+    first_rows = set()
+    for index in range(len(rows)):
+        key = row_keys.get(index)
+        if key is None:
+            results.append(ContactBatchResult(index=index, error=errors[index]))
+        elif idempotency.conflicts(key, originals.get(key) or forms[key].dict(), row_forms[index]):
+            results.append(ContactBatchResult(index=index,
+                                              error="idempotency_key was already used for a different form"))
+        elif key in failed:
+            results.append(ContactBatchResult(index=index, error=failed[key]))
+        elif key in originals:
+            results.append(ContactBatchResult(index=index, id=originals[key]["id"], replayed=True))
+        else:
+            # A key repeated within the batch creates the form once
+            results.append(ContactBatchResult(index=index, id=forms[key].id, replayed=key in first_rows))
+            first_rows.add(key)
+    replayed = sum(1 for result in results if result.replayed)
+    failed_rows = sum(1 for result in results if result.error)
+    return ContactBatchResponse(accepted=len(results) - replayed - failed_rows, replayed=replayed,
+                                failed=failed_rows, results=results)
+
 @api_router.get("/contact", response_model=List[ContactForm])
-async def get_contact_forms():
-    contact_forms = await db.contact_forms.find().to_list(1000)
-    return [ContactForm(**contact_form) for contact_form in contact_forms]
+async def get_contact_forms(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    stream: bool = False,
+    status: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    fields: Optional[str] = None,
+    currency: Optional[str] = None,
+    archived: bool = False,
+    resources: Resources = Depends(get_resources),
+):
+    """List contact forms ordered by (timestamp, id).
+
+    Filter with ``status``, ``currency``, ``min_amount``/``max_amount`` and
+    ``since``/``until``; ``order=desc`` returns newest first and ``fields``
+    is a comma-separated projection. Pass the ``X-Next-Cursor`` response
+    header back as ``after`` to fetch the next page. With ``stream=true``
+    rows are sent as NDJSON while the cursor produces them, and ``limit`` is
+    optional. ``archived=true`` lists the archive instead.
+
+    Pages carry an ETag from the contact forms version and the query, so
+    a poll with ``If-None-Match`` gets a 304 without running the query
+    while nothing was written.
+    """
+    query = contact_query(status, min_amount, max_amount, since, until, order, fields, after, currency, archived)
+    if stream:
+        documents = resources.contacts.stream(query, limit, CONTACT_STREAM_BATCH)
+        return StreamingResponse(stream_contact_forms(documents), media_type="application/x-ndjson")
+
+    version, updated_at = await resources.contacts.version()
+    headers = validator_headers(make_etag("contacts", version, query_digest(request)), updated_at)
+    if is_not_modified(request, headers["ETag"], updated_at):
+        return not_modified(headers)
+
+    limit = min(limit or CONTACT_PAGE_DEFAULT, CONTACT_PAGE_MAX)
+    contact_forms = await resources.contacts.page(query, limit)
+    response = ORJSONResponse(contact_forms, headers=headers)
+    if len(contact_forms) == limit:
+        last = contact_forms[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["timestamp"], last["id"])
+    return response
+
+@api_router.get("/contact/search", response_model=List[ContactForm])
+async def search_contact_forms(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+    archived: bool = False,
+    resources: Resources = Depends(get_resources),
+):
+    """Find contact forms by partial name, phone or email, ignoring case and accents.
+
+    Name matches are ranked by text score (returned as ``score``); phone and
+    email matches are prefix matches. Pass the ``X-Next-Cursor`` response
+    header back as ``after`` for the next page; ``X-Search-Mode`` tells
+    which strategy matched.
+    """
+    search = require(resources, resources.archive_search if archived else resources.contact_search)
+    try:
+        rows, next_cursor, mode = await search.search(q, limit, after, status, CONTACT_PROJECTION)
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response = ORJSONResponse(rows, headers={"X-Search-Mode": mode})
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+@api_router.get("/contact/stats")
+async def get_contact_stats(
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    status: Optional[str] = None,
+    resources: Resources = Depends(get_resources),
+):
+    """Count and amount statistics per (bucket, status) plus totals per status."""
+    try:
+        stats = await require(resources, resources.contact_stats).compute(bucket, since, until, status)
+    except StatsRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(stats)
+
+@api_router.get("/contact/rollups")
+async def get_contact_rollups(
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    status: Optional[str] = None,
+    currency: Optional[str] = None,
+    resources: Resources = Depends(get_resources),
+):
+    """Counts and exact amount totals per (bucket, status, currency) from the maintained rollups.
+
+    Reads one document per bucket instead of aggregating the forms; use
+    /contact/stats for averages and percentiles.
+    """
+    try:
+        rollups = await require(resources, resources.contact_rollups).query(bucket, since, until, status, currency)
+    except StatsRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(rollups)
+
+@api_router.get("/contact/feed")
+async def contact_form_feed(
+    last_event_id: Optional[str] = Header(None),
+    resources: Resources = Depends(get_resources),
+):
+    """Server-Sent Events for inserted and updated contact forms.
+
+    Each event id is the change stream resume token; browsers send it back
+    as ``Last-Event-ID`` on reconnect and the feed continues from there.
+    """
+    subscription = require(resources, resources.contact_feed).subscribe(last_event_id)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await subscription.get(FEED_HEARTBEAT_SECONDS)
+                except ConnectionResetError:
+                    return
+                if event is None:
+                    yield b": keepalive\n\n"
+                    continue
+                yield (f"id: {event['id']}\nevent: {event['type']}\n".encode()
+                       + b"data: " + event["data"] + b"\n\n")
+        finally:
+            subscription.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api_router.get("/contact/export")
+async def export_contact_forms(
+    format: str = "csv",
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    archived: bool = False,
+    resources: Resources = Depends(get_resources),
+):
+    """Stream contact forms as CSV or Parquet in (timestamp, id) order.
+
+    Resume an interrupted export by passing the cursor of the last exported
+    row as ``after``; ``archived=true`` exports the archive.
+    """
+    # Loaded on first export so workers that never export do not pay for it
+    from contact_export import EXPORT_FORMATS, ExportFormatError, export_batches, export_chunks
+
+    require(resources, resources.db)
+    query, sort, projection = build_contact_query(status=status, since=since, until=until, after=after)
+    collection = resources.contact_archive if archived else resources.db.contact_forms
+    cursor = collection.find(query, projection).sort(sort)
+    try:
+        chunks = export_chunks(format, export_batches(cursor))
+    except ExportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(chunks, media_type=EXPORT_FORMATS[format], headers={
+        "Content-Disposition": f'attachment; filename="contact_forms.{format}"',
+    })
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of request, Mongo, pool, cache and queue metrics."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/metrics/cache")
+async def get_cache_metrics(resources: Resources = Depends(get_resources)):
+    if not resources.contact_cache:
+        return {"enabled": False}
+    return {"enabled": True, **resources.contact_cache.stats()}
+
+@api_router.get("/metrics/write-behind")
+async def get_write_behind_metrics(resources: Resources = Depends(get_resources)):
+    if not resources.contact_write_queue:
+        return {"enabled": False}
+    return {"enabled": True, **resources.contact_write_queue.stats()}
+
+@api_router.get("/metrics/outbox")
+async def get_outbox_metrics(resources: Resources = Depends(get_resources)):
+    """Outbox dispatch counters of this worker and the events in the collection by state."""
+    if not resources.contact_outbox:
+        return {"enabled": False}
+    return {"enabled": True, **resources.contact_outbox.stats(), "backlog": await resources.contact_outbox.backlog()}
+
+@api_router.get("/metrics/admission")
+async def get_admission_metrics(resources: Resources = Depends(get_resources)):
+    """Rate limiter and concurrency cap counters, for tuning the limits."""
+    return {
+        "rate_limit": {"enabled": False} if not resources.rate_limiter
+        else {"enabled": True, **resources.rate_limiter.stats()},
+        "admission": {"enabled": False} if not resources.admission
+        else {"enabled": True, **resources.admission.stats()},
+    }
 
 @api_router.get("/contact/{contact_id}", response_model=ContactForm)
-async def get_contact_form(contact_id: str):
-    contact_form = await db.contact_forms.find_one({"id": contact_id})
+async def get_contact_form(contact_id: str, request: Request, response: Response,
+                           resources: Resources = Depends(get_resources)):
+    """One contact form; its ETag is the document version, so a 304 skips building the response."""
+    contact_cache = resources.contact_cache
+    contact_form = await contact_cache.get(contact_id) if contact_cache else MISSING
+    if contact_form is MISSING:
+        contact_form = await resources.contacts.get(contact_id, CONTACT_DOCUMENT_FIELDS)
+        if contact_cache:
+            await contact_cache.set(contact_id, contact_form)
     if not contact_form:
         raise HTTPException(status_code=404, detail="Contact form not found")
+    headers = validator_headers(make_etag(contact_id, contact_form.get("version", 0)))
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
     return ContactForm(**contact_form)
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.patch("/contact/{contact_id}", response_model=ContactForm)
+async def update_contact_status(
+    contact_id: str,
+    input: ContactStatusUpdate,
+    resources: Resources = Depends(get_resources),
+):
+    """Set the status of a contact form, archived or not.
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    Completed and cancelled forms are moved to the archive by the archiver.
+    """
+    # The pre-image tells which status buckets the stats have to recompute
+    contact_form = await resources.contacts.set_status(contact_id, input.status, CONTACT_DOCUMENT_FIELDS)
+    if contact_form is None:
+        raise HTTPException(status_code=404, detail="Contact form not found")
+
+    previous_status = contact_form["status"]
+    counted = "amount_minor" in contact_form
+    contact_form["status"] = input.status
+    contact_form["version"] = contact_form.get("version", 0) + 1
+    if resources.contact_cache:
+        # The memory backend is only the default with a single worker, whose entry this refreshes
+        await resources.contact_cache.set(contact_id, contact_form)
+    await resources.contacts_changed()
+    if previous_status != input.status and resources.contact_stats:
+        await resources.contact_stats.invalidate(contact_form["timestamp"], [previous_status, input.status])
+        # Forms not migrated to minor units are not in the rollups yet
+        if counted:
+            await resources.contact_rollups.move(contact_form, previous_status)
+    return ContactForm(**contact_form)
+
+# Component stats are copied into gauges whenever /api/metrics is scraped
+component_gauges = {
+    "mongo_pool": registry.register(Gauge("mongo_pool_stat", "Mongo connection pool usage.")),
+    "contact_cache": registry.register(Gauge("contact_cache_stat", "Contact read-through cache counters.")),
+    "contact_stats_cache": registry.register(Gauge("contact_stats_cache_stat", "Contact stats bucket cache.")),
+    "contact_archive": registry.register(Gauge("contact_archive_stat", "Contact forms moved to the archive.")),
+    "contact_rollups": registry.register(Gauge("contact_rollups_stat", "Rollup updates applied.")),
+    "contact_version": registry.register(Gauge("contact_version_stat", "Contact forms version bumps.")),
+    "write_behind": registry.register(Gauge("write_behind_stat", "Contact write-behind queue.")),
+    "contact_outbox": registry.register(Gauge("contact_outbox_stat", "Contact outbox dispatch.")),
+    "contact_feed": registry.register(Gauge("contact_feed_stat", "Contact change stream fan-out.")),
+    "idempotency": registry.register(Gauge("idempotency_stat", "Replayed submissions and key cache.")),
+    "status_heartbeats": registry.register(Gauge("status_heartbeats_stat", "Heartbeat write buffer.")),
+    "status_latest": registry.register(Gauge("status_latest_stat", "Latest-status view updates.")),
+    "rate_limit": registry.register(Gauge("rate_limit_stat", "Per-client rate limiter decisions.")),
+    "admission": registry.register(Gauge("admission_stat", "Concurrency cap usage and shed requests.")),
+}
+
+def component_stats_collector(resources: Resources):
+    def collect_component_stats():
+        for name, component in resources.components().items():
+            if component is None:
+                continue
+            for stat, value in component.stats().items():
+                component_gauges[name].set(value, stat=stat)
+    return collect_component_stats
 
 # Configure logging
 logging.basicConfig(
@@ -107,6 +802,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+def create_app(settings: Optional[Mapping[str, str]] = None) -> FastAPI:
+    """Build the application; the storage and everything on it is opened per worker in the lifespan.
+
+    Nothing is connected at import time, so ``uvicorn --workers N`` and
+    gunicorn's ``UvicornWorker`` give every worker its own client and pool
+    after fork. ``settings`` defaults to the environment plus backend/.env.
+    """
+    if settings is None:
+        settings = load_settings()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        resources = Resources(settings)
+        app.state.resources = resources
+        collector = component_stats_collector(resources)
+        registry.add_collector(collector)
+        try:
+            await resources.start()
+            yield
+        finally:
+            registry.remove_collector(collector)
+            await resources.close()
+
+    # Create the main app without a prefix
+    app = FastAPI(lifespan=lifespan)
+
+    # Include the router in the main app
+    app.include_router(api_router)
+
+    # Inside CORS so rejections still carry CORS headers, and inside metrics so they are counted
+    app.add_middleware(AdmissionMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "X-Search-Mode", "Retry-After"],
+    )
+
+    # Inside metrics, so response sizes are recorded as sent
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(settings.get('COMPRESSION_MIN_SIZE', '1024')),
+        gzip_level=int(settings.get('COMPRESSION_GZIP_LEVEL', '6')),
+        brotli_quality=int(settings.get('COMPRESSION_BROTLI_QUALITY', '4')),
+    )
+
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+# `uvicorn server:app` keeps working; multi-worker launches use `server:create_app` with --factory
+app = create_app()
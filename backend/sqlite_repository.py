@@ -0,0 +1,296 @@
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import orjson
+
+from http_cache import EPOCH
+from repositories import ContactQuery, ContactRepository, StatusRepository, project
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contact_forms (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    status TEXT NOT NULL,
+    amount_minor INTEGER,
+    currency TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    document BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contact_forms_timestamp_id ON contact_forms (timestamp, id);
+CREATE INDEX IF NOT EXISTS contact_forms_status_timestamp_id ON contact_forms (status, timestamp, id);
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS status_heartbeats (
+    id TEXT PRIMARY KEY,
+    client_name TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS status_heartbeats_timestamp ON status_heartbeats (timestamp);
+CREATE INDEX IF NOT EXISTS status_heartbeats_client_name_timestamp ON status_heartbeats (client_name, timestamp);
+CREATE TABLE IF NOT EXISTS status_latest (
+    client_name TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+"""
+
+# Columns kept outside the JSON document, because queries filter on them or updates change them
+CONTACT_COLUMNS = ("id", "timestamp", "status", "version")
+
+
+def encode_timestamp(value: datetime) -> str:
+    # Fixed width, so text order is time order
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def decode_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+class SQLiteStore:
+    """One SQLite database file in WAL mode, used from a single thread.
+
+    Statements run on a dedicated thread so they never block the event
+    loop. With WAL, other workers and processes read while one writes;
+    ``synchronous=NORMAL`` syncs at checkpoints instead of every commit, so
+    a power loss may drop the last transactions but cannot corrupt the file.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    async def open(self):
+        await self.run(self._open)
+
+    def _open(self):
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        self.connection = connection
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    @contextmanager
+    def transaction(self):
+        # IMMEDIATE takes the write lock up front, so a read-then-write cannot interleave with another writer
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    async def close(self):
+        if self.connection is not None:
+            await self.run(self.connection.close)
+            self.connection = None
+        self._executor.shutdown()
+
+
+def _contact_row(document: dict) -> tuple:
+    body = {key: value for key, value in document.items() if key not in CONTACT_COLUMNS and key != "_id"}
+    return (document["id"], encode_timestamp(document["timestamp"]), document["status"],
+            document.get("amount_minor"), document.get("currency"), document.get("version", 0),
+            orjson.dumps(body))
+
+
+def _contact_document(row: tuple) -> dict:
+    contact_id, timestamp, status, version, body = row
+    return {**orjson.loads(body), "id": contact_id, "timestamp": decode_timestamp(timestamp),
+            "status": status, "version": version}
+
+
+CONTACT_SELECT = "SELECT id, timestamp, status, version, document FROM contact_forms"
+
+
+class SQLiteContactRepository(ContactRepository):
+    """Contact forms in a SQLite table, for small edge sites without a Mongo server.
+
+    The filtered and sorted columns are real columns with the same indexes
+    as in Mongo; the rest of each form is a JSON document. There is no
+    archive.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, store: SQLiteStore, version_name: str = "contact_forms"):
+        self.store = store
+        self.version_name = version_name
+
+    async def add(self, document: dict):
+        await self.store.run(self._add, document)
+
+    def _add(self, document: dict):
+        self.store.connection.execute("INSERT INTO contact_forms VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      _contact_row(document))
+
+    async def add_many(self, documents: List[dict]) -> Dict[int, str]:
+        return await self.store.run(self._add_many, documents)
+
+    def _add_many(self, documents: List[dict]) -> Dict[int, str]:
+        failed = {}
+        with self.store.transaction() as connection:
+            for position, document in enumerate(documents):
+                try:
+                    connection.execute("INSERT INTO contact_forms VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                       _contact_row(document))
+                except sqlite3.IntegrityError as e:
+                    # Only this statement is rolled back; the transaction goes on
+                    failed[position] = str(e)
+        return failed
+
+    async def get(self, contact_id: str, fields: Sequence[str]) -> Optional[dict]:
+        row = await self.store.run(self._fetch_one, contact_id)
+        return None if row is None else project(_contact_document(row), fields)
+
+    def _fetch_one(self, contact_id: str) -> Optional[tuple]:
+        return self.store.connection.execute(CONTACT_SELECT + " WHERE id = ?", (contact_id,)).fetchone()
+
+    async def page(self, query: ContactQuery, limit: int) -> List[dict]:
+        if query.archived:
+            return []
+        rows = await self.store.run(self._fetch_page, query, limit)
+        return [project(_contact_document(row), query.fields) for row in rows]
+
+    def _fetch_page(self, query: ContactQuery, limit: int) -> List[tuple]:
+        clauses = []
+        params = []
+        if query.status is not None:
+            clauses.append("status = ?")
+            params.append(query.status)
+        if query.since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(encode_timestamp(query.since))
+        if query.until is not None:
+            clauses.append("timestamp < ?")
+            params.append(encode_timestamp(query.until))
+        if query.min_amount_minor is not None:
+            clauses.append("amount_minor >= ?")
+            params.append(query.min_amount_minor)
+        if query.max_amount_minor is not None:
+            clauses.append("amount_minor <= ?")
+            params.append(query.max_amount_minor)
+        if query.currency is not None:
+            clauses.append("currency = ?")
+            params.append(query.currency)
+        if query.after is not None:
+            clauses.append("(timestamp, id) " + ("<" if query.descending else ">") + " (?, ?)")
+            params.extend([encode_timestamp(query.after[0]), query.after[1]])
+        direction = "DESC" if query.descending else "ASC"
+        sql = CONTACT_SELECT
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY timestamp {direction}, id {direction} LIMIT ?"
+        return self.store.connection.execute(sql, (*params, limit)).fetchall()
+
+    async def set_status(self, contact_id: str, status: str, fields: Sequence[str]) -> Optional[dict]:
+        row = await self.store.run(self._set_status, contact_id, status)
+        return None if row is None else project(_contact_document(row), fields)
+
+    def _set_status(self, contact_id: str, status: str) -> Optional[tuple]:
+        with self.store.transaction() as connection:
+            row = connection.execute(CONTACT_SELECT + " WHERE id = ?", (contact_id,)).fetchone()
+            if row is not None:
+                connection.execute("UPDATE contact_forms SET status = ?, version = version + 1 WHERE id = ?",
+                                   (status, contact_id))
+        return row
+
+    async def version(self) -> Tuple[int, datetime]:
+        row = await self.store.run(self._fetch_version)
+        if row is None:
+            return 0, EPOCH
+        return row[0], decode_timestamp(row[1])
+
+    def _fetch_version(self) -> Optional[tuple]:
+        return self.store.connection.execute("SELECT version, updated_at FROM collection_versions WHERE name = ?",
+                                             (self.version_name,)).fetchone()
+
+    async def bump_version(self):
+        await self.store.run(self._bump_version)
+
+    def _bump_version(self):
+        # max() keeps updated_at from going back when worker clocks disagree
+        self.store.connection.execute(
+            "INSERT INTO collection_versions VALUES (?, 1, ?) ON CONFLICT (name) DO UPDATE SET "
+            "version = version + 1, updated_at = max(updated_at, excluded.updated_at)",
+            (self.version_name, encode_timestamp(datetime.utcnow())))
+
+    async def ping(self):
+        await self.store.run(self.store.connection.execute, "SELECT 1")
+
+
+class SQLiteStatusRepository(StatusRepository):
+    """Heartbeats and the latest heartbeat per client in SQLite; heartbeats expire after ``ttl_seconds``."""
+
+    name = "sqlite"
+
+    def __init__(self, store: SQLiteStore, ttl_seconds: int = 7 * 86400, expire_interval: float = 60):
+        self.store = store
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.expire_interval = expire_interval
+        self._expired_at = 0.0
+
+    async def add(self, heartbeats: List[dict]):
+        await self.store.run(self._add, heartbeats)
+
+    def _add(self, heartbeats: List[dict]):
+        rows = [(heartbeat["id"], heartbeat["client_name"], encode_timestamp(heartbeat["timestamp"]))
+                for heartbeat in heartbeats]
+        with self.store.transaction() as connection:
+            connection.executemany("INSERT OR IGNORE INTO status_heartbeats VALUES (?, ?, ?)", rows)
+            # Like the Mongo view, an older heartbeat never replaces a newer one
+            connection.executemany(
+                "INSERT INTO status_latest (id, client_name, timestamp) VALUES (?, ?, ?) "
+                "ON CONFLICT (client_name) DO UPDATE SET id = excluded.id, timestamp = excluded.timestamp "
+                "WHERE excluded.timestamp > status_latest.timestamp", rows)
+            now = time.monotonic()
+            if now - self._expired_at >= self.expire_interval:
+                self._expired_at = now
+                connection.execute("DELETE FROM status_heartbeats WHERE timestamp < ?",
+                                   (encode_timestamp(datetime.utcnow() - self.ttl),))
+
+    async def recent(self, client_name: Optional[str] = None, limit: int = 1000) -> List[dict]:
+        rows = await self.store.run(self._fetch_recent, client_name, limit)
+        return [{"id": row[0], "client_name": row[1], "timestamp": decode_timestamp(row[2])} for row in rows]
+
+    def _fetch_recent(self, client_name: Optional[str], limit: int) -> List[tuple]:
+        sql = "SELECT id, client_name, timestamp FROM status_heartbeats"
+        params: tuple = ()
+        if client_name is not None:
+            sql += " WHERE client_name = ?"
+            params = (client_name,)
+        return self.store.connection.execute(sql + " ORDER BY timestamp DESC LIMIT ?", (*params, limit)).fetchall()
+
+    async def latest(self, client_name: Optional[str] = None, since: Optional[datetime] = None,
+                     limit: int = 1000) -> List[dict]:
+        rows = await self.store.run(self._fetch_latest, client_name, since, limit)
+        return [{"id": row[0], "client_name": row[1], "timestamp": decode_timestamp(row[2])} for row in rows]
+
+    def _fetch_latest(self, client_name: Optional[str], since: Optional[datetime], limit: int) -> List[tuple]:
+        clauses = []
+        params = []
+        if client_name is not None:
+            clauses.append("client_name = ?")
+            params.append(client_name)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(encode_timestamp(since))
+        sql = "SELECT id, client_name, timestamp FROM status_latest"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self.store.connection.execute(sql + " ORDER BY client_name LIMIT ?", (*params, limit)).fetchall()
@@ -0,0 +1,107 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid
+
+from write_behind import DUPLICATE_KEY
+
+HEARTBEAT_COLLECTION = "status_heartbeats"
+
+HEARTBEAT_INDEXES = [
+    IndexModel([("client_name", ASCENDING), ("timestamp", ASCENDING)], name="client_name_timestamp"),
+]
+
+LATEST_INDEXES = [
+    IndexModel([("client_name", ASCENDING)], name="client_name_unique", unique=True),
+]
+
+
+async def ensure_heartbeat_collection(database, ttl_seconds: int, timeseries: bool = True):
+    """Create the heartbeat collection unless it exists; heartbeats expire after ``ttl_seconds``.
+
+    As a time-series collection, heartbeats of one client are stored in
+    compressed buckets and expire a bucket at a time. Without ``timeseries``
+    (servers before 5.0) it is a plain collection with a TTL index.
+    """
+    if not await database.list_collection_names(filter={"name": HEARTBEAT_COLLECTION}):
+        options = {}
+        if timeseries:
+            options = {"timeseries": {"timeField": "timestamp", "metaField": "client_name", "granularity": "seconds"},
+                       "expireAfterSeconds": ttl_seconds}
+        try:
+            await database.create_collection(HEARTBEAT_COLLECTION, **options)
+        except CollectionInvalid:
+            # Another worker created it first
+            pass
+    if not timeseries:
+        await database[HEARTBEAT_COLLECTION].create_index([("timestamp", ASCENDING)], name="timestamp_ttl",
+                                                          expireAfterSeconds=ttl_seconds)
+
+
+class StatusLatest:
+    """Materialized "latest heartbeat per client_name", one document per client.
+
+    Each flushed batch is coalesced to its newest heartbeat per client, which
+    replaces the stored one only if it is newer; a stale update fails the
+    unique index on the upsert and is dropped. Reads never touch the
+    heartbeat history.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.updates_total = 0
+        self.stale_total = 0
+
+    async def record(self, heartbeats: Iterable[dict]):
+        newest: Dict[str, dict] = {}
+        for heartbeat in heartbeats:
+            current = newest.get(heartbeat["client_name"])
+            if current is None or heartbeat["timestamp"] > current["timestamp"]:
+                newest[heartbeat["client_name"]] = heartbeat
+        if not newest:
+            return
+        operations = [
+            UpdateOne({"client_name": name, "timestamp": {"$lt": heartbeat["timestamp"]}},
+                      {"$set": {"id": heartbeat["id"], "timestamp": heartbeat["timestamp"]}}, upsert=True)
+            for name, heartbeat in newest.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+            stale = 0
+        except BulkWriteError as e:
+            codes = [error.get("code") for error in e.details["writeErrors"]]
+            if any(code != DUPLICATE_KEY for code in codes):
+                raise
+            # Another worker already stored a newer heartbeat for these clients
+            stale = len(codes)
+        self.updates_total += len(operations) - stale
+        self.stale_total += stale
+
+    async def latest(self, client_name: Optional[str] = None, since: Optional[datetime] = None,
+                     limit: int = 1000) -> List[dict]:
+        query = {}
+        if client_name is not None:
+            query["client_name"] = client_name
+        if since is not None:
+            query["timestamp"] = {"$gte": since}
+        cursor = self.collection.find(query, {"_id": 0, "id": 1, "client_name": 1, "timestamp": 1})
+        return await cursor.sort("client_name", ASCENDING).limit(limit).to_list(limit)
+
+    async def rebuild(self, sources: List[str]) -> int:
+        """Recompute the view from the heartbeats in ``sources``; return the number of clients."""
+        clients: Dict[str, dict] = {}
+        for source in sources:
+            pipeline = [
+                {"$sort": {"client_name": 1, "timestamp": -1}},
+                {"$group": {"_id": "$client_name", "id": {"$first": "$id"}, "timestamp": {"$first": "$timestamp"}}},
+            ]
+            async for group in self.collection.database[source].aggregate(pipeline, allowDiskUse=True):
+                current = clients.get(group["_id"])
+                if current is None or group["timestamp"] > current["timestamp"]:
+                    clients[group["_id"]] = {"id": group["id"], "timestamp": group["timestamp"]}
+        await self.record({"client_name": name, **heartbeat} for name, heartbeat in clients.items())
+        return len(clients)
+
+    def stats(self) -> dict:
+        return {"updates_total": self.updates_total, "stale_total": self.stale_total}
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class WriteBehindQueue:
+    """Bounded in-process insert buffer drained by a background flusher.
+
+    Documents are accepted into an ``asyncio.Queue`` and written with
+    unordered ``insert_many`` once ``batch_size`` documents are waiting or
+    ``flush_interval`` seconds have passed since the first one arrived.
+    Writes are only as durable as the process: ``drain`` must run before the
+    Mongo client is closed. ``on_written`` is awaited with the documents each
+    flush newly stored, ``on_failed`` with those it gave up on.
+    """
+
+    def __init__(self, collection, max_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.05, max_retries: int = 3,
+                 on_written: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+                 on_failed: Optional[Callable[[List[dict]], Awaitable[None]]] = None):
+        self.collection = collection
+        self.on_written = on_written
+        self.on_failed = on_failed
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.failed_total = 0
+        self.rejected_total = 0
+        self.flush_batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def put(self, document: dict):
+        if self._closing:
+            raise QueueFullError("Write queue is shutting down")
+        try:
+            self.queue.put_nowait(document)
+        except asyncio.QueueFull:
+            self.rejected_total += 1
+            raise QueueFullError("Write queue is full")
+        self.enqueued_total += 1
+
+    def put_many(self, documents: List[dict]):
+        """Queue all of ``documents`` or, if they do not fit, none of them."""
+        if self._closing:
+            raise QueueFullError("Write queue is shutting down")
+        if self.queue.maxsize - self.queue.qsize() < len(documents):
+            self.rejected_total += len(documents)
+            raise QueueFullError("Write queue is full")
+        for document in documents:
+            self.queue.put_nowait(document)
+        self.enqueued_total += len(documents)
+
+    async def drain(self):
+        """Stop accepting writes, flush everything queued and stop the flusher."""
+        self._closing = True
+        if self._task is None:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.queue.qsize(),
+            "max_size": self.queue.maxsize,
+            "enqueued_total": self.enqueued_total,
+            "flushed_total": self.flushed_total,
+            "failed_total": self.failed_total,
+            "rejected_total": self.rejected_total,
+            "flush_batches": self.flush_batches,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+    async def _next_batch(self) -> List[dict]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._flush(batch)
+            except Exception:
+                # Not expected past _flush, but a dead flusher would leave drain() waiting forever
+                self.failed_total += len(batch)
+                logger.exception("Write-behind flush of %d documents failed", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _flush(self, batch: List[dict]):
+        started = time.perf_counter()
+        written: List[dict] = []
+        failed_documents: List[dict] = []
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                self.flushed_total += len(batch)
+                written = batch
+                break
+            except BulkWriteError as e:
+                # Unordered inserts keep going past bad rows, so the rest are already written.
+                # Duplicate keys mean an earlier, interrupted attempt already stored the row.
+                errors = {error["index"]: error.get("code") for error in e.details["writeErrors"]}
+                failed = sum(1 for code in errors.values() if code != DUPLICATE_KEY)
+                self.flushed_total += len(batch) - failed
+                self.failed_total += failed
+                if failed:
+                    logger.error("Write-behind flush rejected %d of %d documents", failed, len(batch))
+                # Rows stored by the interrupted attempt still need their hooks
+                written = [document for index, document in enumerate(batch)
+                           if errors.get(index, DUPLICATE_KEY) == DUPLICATE_KEY]
+                failed_documents = [batch[index] for index, code in errors.items() if code != DUPLICATE_KEY]
+                break
+            except PyMongoError:
+                if attempt == self.max_retries:
+                    self.failed_total += len(batch)
+                    logger.exception("Write-behind flush of %d documents failed", len(batch))
+                    failed_documents = batch
+                    break
+                await asyncio.sleep(0.1 * 2 ** attempt)
+            except Exception:
+                # e.g. bson's InvalidDocument; retrying cannot help
+                self.failed_total += len(batch)
+                logger.exception("Write-behind flush of %d documents failed", len(batch))
+                failed_documents = batch
+                break
+
+        if written and self.on_written:
+            try:
+                await self.on_written(written)
+            except Exception:
+                logger.exception("Write-behind post-write hook failed for %d documents", len(written))
+        if failed_documents and self.on_failed:
+            try:
+                await self.on_failed(failed_documents)
+            except Exception:
+                logger.exception("Write-behind failure hook failed for %d documents", len(failed_documents))
+
+        self.flush_batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Backend API Benchmarks for GOOD TRANSFER Money Transfer Service
+Measures throughput and serialization cost of the Contact Form API endpoints
+"""
+
+import requests
+import asyncio
+import time
+import uuid
+import sys
+import os
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+# Point at a local backend by default; override with BACKEND_URL
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:8001/api")
+
+# A key listed in the backend's RATE_LIMIT_EXEMPT_KEYS, so the contact rate limit does not skew results
+BENCH_API_KEY = os.environ.get("BENCH_API_KEY")
+
+BULK_ROWS = int(os.environ.get("BENCH_BULK_ROWS", "1000"))
+BULK_MIN_SPEEDUP = 20.0
+
+SERIALIZATION_ROWS = 1000
+SERIALIZATION_ROUNDS = 50
+
+
+def make_contact(i):
+    return {
+        "name": f"Benchmark Lead {i}",
+        "phone": f"+1-555-{i:07d}",
+        "amount": 100.0 + i,
+        "email": f"lead{i}@example.com",
+    }
+
+
+def bench_single_posts(session, rows):
+    """POST every row to /contact one request at a time"""
+    started = time.perf_counter()
+    for i in range(rows):
+        response = session.post(f"{BACKEND_URL}/contact", json=make_contact(i))
+        response.raise_for_status()
+    return rows / (time.perf_counter() - started)
+
+
+def bench_bulk_post(session, rows):
+    """POST all rows to /contact/bulk in a single request"""
+    payload = [make_contact(i) for i in range(rows)]
+    started = time.perf_counter()
+    response = session.post(f"{BACKEND_URL}/contact/bulk", json=payload)
+    response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    if response.json()["inserted"] != rows:
+        raise RuntimeError(f"Bulk insert reported failures: {response.json()['failed']}")
+    return rows / elapsed
+
+
+def bench_list_serialization():
+    """CPU per 1000 rows for GET /contact: model + response_model path vs projected ORJSON"""
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from server import ContactForm
+
+    docs = [
+        {**make_contact(i), "id": str(uuid.uuid4()), "message": None,
+         "timestamp": datetime.utcnow(), "status": "pending"}
+        for i in range(SERIALIZATION_ROWS)
+    ]
+    field = create_response_field(name="Response", type_=List[ContactForm])
+
+    async def model_path():
+        content = [ContactForm(**doc) for doc in docs]
+        return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+    def fast_path():
+        return ORJSONResponse(docs).body
+
+    def cpu_ms(render):
+        started = time.process_time()
+        for _ in range(SERIALIZATION_ROUNDS):
+            render()
+        return (time.process_time() - started) * 1000 / SERIALIZATION_ROUNDS
+
+    loop = asyncio.new_event_loop()
+    before = cpu_ms(lambda: loop.run_until_complete(model_path()))
+    loop.close()
+    after = cpu_ms(fast_path)
+
+    print(f"Serialization per {SERIALIZATION_ROWS} rows, model path: {before:8.2f} ms CPU")
+    print(f"Serialization per {SERIALIZATION_ROWS} rows, fast path:  {after:8.2f} ms CPU")
+    print(f"Speedup: {before / after:.1f}x")
+    return after < before
+
+
+def bench_bulk_ingestion():
+    session = requests.Session()
+    if BENCH_API_KEY:
+        session.headers["X-Api-Key"] = BENCH_API_KEY
+    single_rps = bench_single_posts(session, BULK_ROWS)
+    bulk_rps = bench_bulk_post(session, BULK_ROWS)
+    speedup = bulk_rps / single_rps
+
+    print(f"Single POST /contact:    {single_rps:10.1f} rows/s")
+    print(f"Bulk POST /contact/bulk: {bulk_rps:10.1f} rows/s")
+    print(f"Speedup: {speedup:.1f}x (target {BULK_MIN_SPEEDUP:.0f}x)")
+    return speedup >= BULK_MIN_SPEEDUP
+
+
+def main():
+    print("=" * 60)
+    print("GOOD TRANSFER Backend Benchmarks")
+    print("=" * 60)
+    print(f"Benchmarking backend URL: {BACKEND_URL}")
+    print()
+
+    benchmarks = [
+        bench_list_serialization,
+        bench_bulk_ingestion,
+    ]
+
+    passed = 0
+    for benchmark in benchmarks:
+        try:
+            if benchmark():
+                passed += 1
+        except Exception as e:
+            print(f"❌ FAIL {benchmark.__name__}: {str(e)}")
+
+    print()
+    print(f"BENCHMARK SUMMARY: {passed}/{len(benchmarks)} targets met")
+    return passed == len(benchmarks)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
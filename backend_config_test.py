@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Configuration Tests for GOOD TRANSFER Contact Form API
+Runs the checks that need particular settings against in-process apps
+
+Rate limits, the concurrency cap, the write-behind queue and exports only
+show their behaviour with settings a shared test server does not have.
+Each check therefore builds the app with its own settings on the
+in-memory Mongo stand-in (mongomock-motor), runs its lifespan and talks to
+it through httpx's ASGI transport, from the address CLIENT_ADDRESS. The
+contact feed needs change streams, which the stand-in lacks; its check
+scripts them.
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+# Before the backend imports the Motor client
+import motor.motor_asyncio
+from mongomock_motor import AsyncMongoMockClient
+
+motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+import httpx
+from bson.errors import InvalidDocument
+from pymongo.errors import AutoReconnect, OperationFailure
+from typer.testing import CliRunner
+
+import cli
+import server
+from contact_archive import ARCHIVE_COLLECTION
+from contact_feed import ContactFeed
+from resources import ensure_indexes
+
+CLIENT_ADDRESS = "203.0.113.9"
+
+BASE_SETTINGS = {
+    "MONGO_URL": "mongodb://localhost:27017",
+    # The stand-in cannot create collections with storage or time-series options
+    "CONTACT_ARCHIVE_COMPRESSOR": "",
+    "STATUS_HEARTBEAT_TIMESERIES": "false",
+    "CONTACT_RATE_LIMIT_PER_MINUTE": "0",
+}
+
+
+def contact(i=0, **fields):
+    return {"name": f"Config Test {uuid.uuid4().hex[:8]}", "phone": f"+1-555-{i:07d}", "amount": 10 + i, **fields}
+
+
+@asynccontextmanager
+async def running_app(**settings):
+    """The app with ``settings`` on a fresh database, started, and a client for its /api."""
+    app = server.create_app({**BASE_SETTINGS, "DB_NAME": "config_test_" + uuid.uuid4().hex[:8], **settings})
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, client=(CLIENT_ADDRESS, 40000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test/api") as client:
+            yield app, client
+
+
+async def check_forwarded_for_is_not_spoofable():
+    settings = {"CONTACT_RATE_LIMIT_PER_MINUTE": "1", "CONTACT_RATE_LIMIT_BURST": "2",
+                "RATE_LIMIT_TRUST_FORWARDED": "true"}
+    async with running_app(**settings) as (_, client):
+        statuses = []
+        for i in range(3):
+            # The client forges the left-most entry; the proxy appends the address it saw
+            headers = {"X-Forwarded-For": f"198.51.100.{i}, 198.51.100.200"}
+            statuses.append((await client.post("/contact", json=contact(i), headers=headers)).status_code)
+        assert statuses == [200, 200, 429], f"forged entries picked fresh buckets: {statuses}"
+        other = await client.post("/contact", json=contact(), headers={"X-Forwarded-For": "198.51.100.201"})
+        assert other.status_code == 200, f"another client shares the bucket: {other.status_code}"
+
+    async with running_app(**settings, RATE_LIMIT_TRUSTED_PROXIES="2") as (_, client):
+        statuses = []
+        for i in range(3):
+            headers = {"X-Forwarded-For": f"198.51.100.{i}, 198.51.100.200, 10.0.0.1"}
+            statuses.append((await client.post("/contact", json=contact(i), headers=headers)).status_code)
+        assert statuses == [200, 200, 429], f"two trusted hops: {statuses}"
+
+
+class HeldCollection:
+    """Wraps the write-behind collection: inserts wait for ``released`` and raise ``error`` if set.
+
+    The next ``lost_replies`` inserts store the documents and then fail, like
+    a connection dropped before the server's reply arrived.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.released = asyncio.Event()
+        self.error = None
+        self.lost_replies = 0
+
+    async def insert_many(self, documents, ordered=True):
+        await self.released.wait()
+        if self.error is not None:
+            raise self.error
+        result = await self.collection.insert_many(documents, ordered=ordered)
+        if self.lost_replies:
+            self.lost_replies -= 1
+            raise AutoReconnect("connection closed")
+        return result
+
+
+def hold_write_behind(app):
+    queue = app.state.resources.contact_write_queue
+    queue.collection = HeldCollection(queue.collection)
+    return queue, queue.collection
+
+
+async def wait_for(condition, timeout=5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+WRITE_BEHIND = {"CONTACT_WRITE_BEHIND": "true", "WRITE_BEHIND_BATCH_SIZE": "1"}
+
+
+async def check_contact_cache_follows_workers():
+    stand_in = AsyncMongoMockClient()
+    database = "config_test_" + uuid.uuid4().hex[:8]
+    # Two workers of one deployment: same database, a cache each
+    with mock.patch("resources.AsyncIOMotorClient", return_value=stand_in):
+        async with running_app(DB_NAME=database, WEB_CONCURRENCY="2") as (first, reader), \
+                running_app(DB_NAME=database, WEB_CONCURRENCY="2") as (_, writer):
+            assert first.state.resources.contact_cache is None, "per-worker cache with two workers"
+            contact_id = (await reader.post("/contact", json=contact())).json()["id"]
+            assert (await reader.get(f"/contact/{contact_id}")).json()["status"] == "pending"
+            assert (await writer.patch(f"/contact/{contact_id}", json={"status": "in_progress"})).status_code == 200
+            status = (await reader.get(f"/contact/{contact_id}")).json()["status"]
+            assert status == "in_progress", f"the other worker still serves {status}"
+
+    async with running_app() as (app, _):
+        assert app.state.resources.contact_cache is not None, "single worker lost its cache"
+
+    with mock.patch("uvicorn.run") as run_server, mock.patch.dict(os.environ):
+        await asyncio.to_thread(run_cli, "serve", "--workers", "3")
+        assert os.environ["WEB_CONCURRENCY"] == "3" and run_server.call_args.kwargs["workers"] == 3
+
+
+async def check_write_behind_queue_full():
+    async with running_app(**WRITE_BEHIND, WRITE_BEHIND_MAX_QUEUE="2") as (app, client):
+        queue, held = hold_write_behind(app)
+        # The flusher holds the first form, the queue the next two
+        for i in range(3):
+            assert (await client.post("/contact", json=contact(i))).status_code == 200
+        form = contact(3)
+        full = await client.post("/contact", json=form)
+        assert full.status_code == 503, f"full queue answered {full.status_code}"
+        assert full.headers.get("Retry-After") == "1", f"Retry-After: {full.headers.get('Retry-After')}"
+        held.released.set()
+        await wait_for(lambda: queue.flushed_total == 3)
+        # The rejected form was not claimed, so its retry is new rather than a replay
+        retry = await client.post("/contact", json=form)
+        assert retry.status_code == 200 and "Idempotent-Replayed" not in retry.headers, retry.headers
+
+
+async def check_write_behind_drains_on_shutdown():
+    async with running_app(**WRITE_BEHIND) as (app, client):
+        queue, held = hold_write_behind(app)
+        ids = [(await client.post("/contact", json=contact(i))).json()["id"] for i in range(3)]
+        assert queue.flushed_total == 0
+        asyncio.get_running_loop().call_later(0.1, held.released.set)
+    # Leaving the lifespan waited for the queued forms
+    stored = await held.collection.count_documents({"id": {"$in": ids}})
+    assert stored == 3 and queue.flushed_total == 3, f"{stored} of 3 forms stored at shutdown"
+
+
+async def check_write_behind_flush_failure_releases_keys():
+    async with running_app(**WRITE_BEHIND) as (app, client):
+        queue, held = hold_write_behind(app)
+        held.error = OperationFailure("No space left on device", code=14031)
+        keyed, unkeyed = contact(1), contact(2)
+        headers = {"Idempotency-Key": "config-" + uuid.uuid4().hex}
+        lost = [(await client.post("/contact", json=keyed, headers=headers)).json()["id"],
+                (await client.post("/contact", json=unkeyed)).json()["id"]]
+        held.released.set()
+        await wait_for(lambda: queue.failed_total == 2, timeout=10)
+        for contact_id in lost:
+            status = (await client.get(f"/contact/{contact_id}")).status_code
+            assert status == 404, f"lost form {contact_id} answered {status}"
+
+        held.error = None
+        retries = [await client.post("/contact", json=keyed, headers=headers),
+                   await client.post("/contact", json=unkeyed)]
+        for retry, contact_id in zip(retries, lost):
+            assert retry.status_code == 200 and "Idempotent-Replayed" not in retry.headers, \
+                f"retry replayed the lost form: {retry.headers}"
+            assert retry.json()["id"] != contact_id
+        await wait_for(lambda: queue.flushed_total == 2)
+        for retry in retries:
+            assert (await client.get(f"/contact/{retry.json()['id']}")).status_code == 200
+        assert not app.state.resources.write_behind_keys, "keys of flushed forms kept"
+
+
+def load_parquet():
+    """pyarrow.parquet, or None where the optional Parquet support is not installed."""
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow.parquet
+
+
+def csv_rows(data):
+    return list(csv.DictReader(io.StringIO(data.decode() if isinstance(data, bytes) else data)))
+
+
+def row_cursor(row):
+    return server.encode_cursor(datetime.fromisoformat(row["timestamp"]), row["id"])
+
+
+def invoke_cli(*args):
+    return CliRunner().invoke(cli.app, list(args))
+
+
+def run_cli(*args):
+    result = invoke_cli(*args)
+    assert result.exit_code == 0, f"cli.py {' '.join(args)} failed: {result.output}{result.exception!r}"
+
+
+async def check_export():
+    pq = load_parquet()
+    database = "config_test_" + uuid.uuid4().hex[:8]
+    stand_in = AsyncMongoMockClient()
+    # The app and the CLI each open a client; here both get the same stand-in
+    with mock.patch("resources.AsyncIOMotorClient", return_value=stand_in), \
+            mock.patch.dict(os.environ, {**BASE_SETTINGS, "DB_NAME": database}):
+        async with running_app(DB_NAME=database) as (_, client):
+            for i in range(5):
+                assert (await client.post("/contact", json=contact(i))).status_code == 200
+
+            response = await client.get("/contact/export", params={"format": "csv"})
+            assert response.status_code == 200 and response.headers["content-type"].startswith("text/csv")
+            full_csv = response.content
+            rows = csv_rows(full_csv)
+            ids = [row["id"] for row in rows]
+            assert len(rows) == 5 and rows[0]["amount"] == "10.0", f"exported {rows}"
+
+            resumed = await client.get("/contact/export", params={"after": row_cursor(rows[1])})
+            assert [row["id"] for row in csv_rows(resumed.content)] == ids[2:], "resumed export differs"
+
+            response = await client.get("/contact/export", params={"format": "parquet"})
+            if pq is None:
+                assert response.status_code == 400, f"parquet export without pyarrow: {response.status_code}"
+            else:
+                assert response.status_code == 200, f"parquet export answered {response.status_code}"
+                table = pq.read_table(io.BytesIO(response.content))
+                assert table.column("id").to_pylist() == ids, "parquet rows differ from csv"
+                assert table.column("amount_minor").to_pylist() == [(10 + i) * 100 for i in range(5)]
+
+            unknown = await client.get("/contact/export", params={"format": "xml"})
+            assert unknown.status_code == 400, f"unknown format answered {unknown.status_code}"
+
+        with tempfile.TemporaryDirectory() as directory:
+            # An export interrupted after the first batch: its rows and the checkpoint after them
+            output = Path(directory) / "contacts.csv"
+            interrupted = b"".join(full_csv.splitlines(keepends=True)[:3])
+            output.write_bytes(interrupted)
+            checkpoint = Path(directory) / "contacts.csv.checkpoint"
+            checkpoint.write_text(json.dumps({"after": row_cursor(rows[1]), "part": 0, "rows": 2}))
+            await asyncio.to_thread(run_cli, "export", "--output", str(output), "--resume", "--batch-size", "2")
+            exported = csv_rows(output.read_bytes())
+            assert output.read_bytes().startswith(interrupted), "resume rewrote the exported rows"
+            assert [row["id"] for row in exported] == ids, f"resumed file has {[row['id'] for row in exported]}"
+            assert json.loads(checkpoint.read_text())["after"] == row_cursor(rows[-1])
+
+            # --archived reads the archive, and a resume has to keep to the same collection
+            db = stand_in[database]
+            await db[ARCHIVE_COLLECTION].insert_many(await db.contact_forms.find({"id": {"$in": ids[:2]}}).to_list(None))
+            archived = Path(directory) / "archived.csv"
+            await asyncio.to_thread(run_cli, "export", "--output", str(archived), "--archived")
+            assert [row["id"] for row in csv_rows(archived.read_bytes())] == ids[:2], "archived export differs"
+            result = await asyncio.to_thread(invoke_cli, "export", "--output", str(output), "--resume", "--archived")
+            assert result.exit_code == 2 and "--archived" in result.output, result.output
+
+            with mock.patch.dict(os.environ, {"STORAGE_BACKEND": "memory"}):
+                embedded = Path(directory) / "embedded.csv"
+                result = await asyncio.to_thread(invoke_cli, "export", "--output", str(embedded))
+            assert result.exit_code == 2 and "memory storage" in result.output, \
+                f"export on memory storage: {result.output}{result.exception!r}"
+            if pq is None:
+                print("   Parquet checks skipped: pyarrow is not installed")
+                return
+
+            # Parquet parts: the last one was lost before it was checkpointed
+            output = Path(directory) / "contacts.parquet"
+            await asyncio.to_thread(run_cli, "export", "--output", str(output), "--format", "parquet",
+                                    "--rows-per-file", "2")
+            parts = sorted(Path(directory).glob("contacts-*.parquet"))
+            assert len(parts) == 3, f"parts: {parts}"
+            parts[-1].unlink()
+            checkpoint = Path(directory) / "contacts.parquet.checkpoint"
+            checkpoint.write_text(json.dumps({"after": row_cursor(rows[3]), "part": 2, "rows": 0}))
+            await asyncio.to_thread(run_cli, "export", "--output", str(output), "--format", "parquet",
+                                    "--rows-per-file", "2", "--resume")
+            exported = [row for part in parts for row in pq.read_table(part).column("id").to_pylist()]
+            assert exported == ids, f"resumed parts have {exported}"
+
+
+async def check_write_behind_retry_after_lost_reply():
+    async with running_app(**{**WRITE_BEHIND, "WRITE_BEHIND_BATCH_SIZE": "10"}, WRITE_BEHIND_FLUSH_INTERVAL="0.2") \
+            as (app, client):
+        resources = app.state.resources
+        queue, held = hold_write_behind(app)
+        hooked = []
+        on_written = queue.on_written
+
+        async def record(documents):
+            hooked.extend(document["id"] for document in documents)
+            await on_written(documents)
+
+        queue.on_written = record
+        held.lost_replies = 1
+        version, _ = await resources.contact_version.current()
+        ids = [(await client.post("/contact", json=contact(i))).json()["id"] for i in range(2)]
+        held.released.set()
+        await wait_for(lambda: queue.flush_batches == 1, timeout=10)
+        # The retry found both forms stored by the attempt whose reply was lost
+        assert sorted(hooked) == sorted(ids), f"post-write hook got {hooked}"
+        assert queue.failed_total == 0 and queue.flushed_total == 2, queue.stats()
+        assert not resources.write_behind_keys, "keys of stored forms kept"
+        assert (await resources.contact_version.current())[0] != version, "contacts version not bumped"
+
+
+async def check_write_behind_survives_unexpected_errors():
+    async with running_app(**WRITE_BEHIND) as (app, client):
+        queue, held = hold_write_behind(app)
+        held.error = InvalidDocument("cannot encode object")
+        form = contact(1)
+        lost = (await client.post("/contact", json=form)).json()["id"]
+        held.released.set()
+        await wait_for(lambda: queue.failed_total == 1)
+        held.error = None
+        retry = await client.post("/contact", json=form)
+        assert retry.json()["id"] != lost, "unencodable form was not released"
+
+        async def broken_hook(documents):
+            raise RuntimeError("cache backend unreachable")
+
+        await wait_for(lambda: queue.flushed_total == 1)
+        queue.on_written = broken_hook
+        assert (await client.post("/contact", json=contact(2))).status_code == 200
+        await wait_for(lambda: queue.flushed_total == 2)
+        assert (await client.post("/contact", json=contact(3))).status_code == 200
+        await wait_for(lambda: queue.flushed_total == 3)
+    # Leaving the lifespan drained the queue instead of waiting on a dead flusher
+
+
+class ScriptedOplog:
+    """Stands in for a collection's change streams: every stream reads one shared list of changes."""
+
+    def __init__(self):
+        self.changes = []
+        self.streams_open = 0
+
+    def insert(self, name):
+        token = {"_data": f"{len(self.changes):08d}"}
+        self.changes.append({"_id": token, "operationType": "insert", "fullDocument": {"name": name}})
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        ids = [change["_id"] for change in self.changes]
+        return ScriptedStream(self, ids.index(resume_after) + 1 if resume_after else len(self.changes))
+
+
+class ScriptedStream:
+    def __init__(self, oplog, position):
+        self.oplog = oplog
+        self.position = position
+
+    async def __aenter__(self):
+        self.oplog.streams_open += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.oplog.streams_open -= 1
+
+    async def try_next(self):
+        if self.position < len(self.oplog.changes):
+            self.position += 1
+            return self.oplog.changes[self.position - 1]
+        await asyncio.sleep(0.01)
+        return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            change = await self.try_next()
+            if change is not None:
+                return change
+
+
+async def received(subscription):
+    names = []
+    while (event := await subscription.get(0.05)) is not None:
+        names.append(event["data"].decode())
+    return names
+
+
+async def check_feed_catch_up_joins_shared_stream():
+    oplog = ScriptedOplog()
+    for i in range(3):
+        oplog.insert(f"before-{i}")
+    feed = ContactFeed(oplog, max_catch_ups=1)
+    live = feed.subscribe()
+    await asyncio.sleep(0.05)
+    # Both reconnect from before the shared stream started; only one catch-up runs at a time
+    first = feed.subscribe("00000000")
+    second = feed.subscribe("00000001")
+    await asyncio.sleep(0.05)
+    assert feed.catching_up == 1, f"catch-ups not capped: {feed.stats()}"
+    for i in range(3):
+        oplog.insert(f"after-{i}")
+    await asyncio.sleep(0.2)
+
+    assert feed.catching_up == 0 and feed.handed_over_total == 2, f"catch-ups still running: {feed.stats()}"
+    assert oplog.streams_open == 1, f"{oplog.streams_open} streams open, only the shared one should be"
+    assert {first, second, live} <= feed.subscribers, "caught-up clients did not join the shared stream"
+    oplog.insert("joined")
+    await asyncio.sleep(0.05)
+    after = [f'{{"name":"after-{i}"}}' for i in range(3)] + ['{"name":"joined"}']
+    first_names, second_names = await received(first), await received(second)
+    assert first_names == [f'{{"name":"before-{i}"}}' for i in (1, 2)] + after, f"first: {first_names}"
+    assert second_names == ['{"name":"before-2"}'] + after, f"second: {second_names}"
+    assert await received(live) == after, "live subscriber missed events"
+    feed._task.cancel()
+
+
+async def check_rate_limit():
+    settings = {"CONTACT_RATE_LIMIT_PER_MINUTE": "1", "CONTACT_RATE_LIMIT_BURST": "2",
+                "RATE_LIMIT_EXEMPT_KEYS": "importer"}
+    async with running_app(**settings) as (_, client):
+        statuses = [(await client.post("/contact", json=contact(i))).status_code for i in range(2)]
+        limited = await client.post("/contact", json=contact(2))
+        assert statuses == [200, 200] and limited.status_code == 429, f"{statuses}, then {limited.status_code}"
+        # One token a minute: the next one is most of a minute away
+        assert 50 <= int(limited.headers["Retry-After"]) <= 60, f"Retry-After: {limited.headers['Retry-After']}"
+        bulk = await client.post("/contact/bulk", json=[contact(3)])
+        assert bulk.status_code == 429, f"bulk shares the bucket: {bulk.status_code}"
+        assert (await client.get("/contact")).status_code == 200, "reads are limited"
+        exempt = await client.post("/contact", json=contact(4), headers={"X-Api-Key": "importer"})
+        assert exempt.status_code == 200, f"exempt key answered {exempt.status_code}"
+
+
+async def check_admission_sheds_when_busy():
+    async with running_app(ADMISSION_MAX_IN_FLIGHT="1", ADMISSION_MAX_WAIT_MS="50") as (_, client):
+        body_sent = asyncio.Event()
+
+        async def slow_body():
+            # Admission runs before the body is read, so the upload holds the only slot
+            yield b'[{"name": "Slow Upload", "phone": "+1-555-0000001", "amount": 10}'
+            await body_sent.wait()
+            yield b"]"
+
+        upload = asyncio.create_task(client.post("/contact/bulk", content=slow_body(),
+                                                 headers={"Content-Type": "application/json"}))
+        await asyncio.sleep(0.05)
+        shed = await client.get("/contact")
+        assert shed.status_code == 503, f"second request answered {shed.status_code}"
+        assert shed.headers.get("Retry-After") == "1", f"Retry-After: {shed.headers.get('Retry-After')}"
+        # Streams and operational endpoints do not take a slot
+        for path, params in [("/contact", {"stream": "true"}), ("/metrics", None)]:
+            exempt = await client.get(path, params=params)
+            assert exempt.status_code == 200, f"{path} {params} answered {exempt.status_code}"
+        body_sent.set()
+        assert (await upload).status_code == 200
+        assert (await client.get("/contact")).status_code == 200, "slot not released"
+
+
+async def check_dedup_window_slides():
+    async with running_app(IDEMPOTENCY_WINDOW_SECONDS="1") as (_, client):
+        # Fixed one-second slots would start a new one just after the first submission
+        await asyncio.sleep(0.9 - time.time() % 1 if time.time() % 1 < 0.9 else 0)
+        form, row = contact(1), contact(2)
+        first = (await client.post("/contact", json=form)).json()["id"]
+        first_row = (await client.post("/contact/batch", json=[row])).json()["results"][0]["id"]
+        await asyncio.sleep(0.3)
+        retry = await client.post("/contact", json=form)
+        assert retry.headers.get("Idempotent-Replayed") == "true" and retry.json()["id"] == first, \
+            "retry across a slot boundary created another form"
+        row_retry = (await client.post("/contact/batch", json=[row])).json()["results"][0]
+        assert row_retry["replayed"] and row_retry["id"] == first_row, f"batch retry: {row_retry}"
+
+        # Once the window has passed, the same content is a new form; the stand-in never expires
+        # records, so this also takes over one the TTL monitor has not removed yet
+        await asyncio.sleep(0.8)
+        again = await client.post("/contact", json=form)
+        assert "Idempotent-Replayed" not in again.headers and again.json()["id"] != first, "window did not end"
+        row_again = (await client.post("/contact/batch", json=[row])).json()["results"][0]
+        assert not row_again["replayed"] and row_again["id"] != first_row, f"batch after window: {row_again}"
+
+
+async def check_skipped_index_creation_still_checks():
+    try:
+        async with running_app(MONGO_ENSURE_INDEXES="false"):
+            pass
+    except RuntimeError as e:
+        assert "Required indexes missing" in str(e), f"unexpected error: {e}"
+    else:
+        raise AssertionError("started without the indexes it needs")
+
+    # Every app gets its own stand-in, so the deploy-time step and the check share a database here
+    database = AsyncMongoMockClient()["config_test_" + uuid.uuid4().hex[:8]]
+    await ensure_indexes(database, None, heartbeat_timeseries=False)
+    await ensure_indexes(database, create=False)
+    await database.contact_forms.drop_index("id_unique")
+    try:
+        await ensure_indexes(database, create=False)
+    except RuntimeError as e:
+        assert "id_unique" in str(e), f"unexpected error: {e}"
+    else:
+        raise AssertionError("check passed without id_unique")
+
+
+CHECKS = [
+    check_rate_limit,
+    check_admission_sheds_when_busy,
+    check_forwarded_for_is_not_spoofable,
+    check_dedup_window_slides,
+    check_skipped_index_creation_still_checks,
+    check_contact_cache_follows_workers,
+    check_write_behind_queue_full,
+    check_write_behind_drains_on_shutdown,
+    check_write_behind_flush_failure_releases_keys,
+    check_write_behind_retry_after_lost_reply,
+    check_write_behind_survives_unexpected_errors,
+    check_export,
+    check_feed_catch_up_joins_shared_stream,
+]
+
+
+async def run(selected):
+    ok = True
+    for check in CHECKS:
+        if selected and not any(name in check.__name__ for name in selected):
+            continue
+        try:
+            await check()
+            print(f"✅ PASS {check.__name__}")
+        except AssertionError as e:
+            ok = False
+            print(f"❌ FAIL {check.__name__}: {e}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("checks", nargs="*", help="Run only checks whose name contains one of these")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("GOOD TRANSFER Configuration Tests")
+    print("=" * 60)
+    ok = asyncio.run(run(args.checks))
+    print()
+    print(f"CONFIGURATION TESTS: {'all passed' if ok else 'failures'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Load Testing for GOOD TRANSFER Contact Form API
+Drives the /api routes with concurrent async clients and reports RPS and latency percentiles
+
+By default a local uvicorn is started against an in-memory Mongo stand-in
+(mongomock-motor); pass --mongo real to use MONGO_URL from backend/.env, or
+--target to benchmark a server that is already running. --storage memory or
+sqlite runs the local backend on an embedded storage engine instead of
+Mongo. Results are compared with the stored baseline and the run fails on a
+regression.
+
+--workers 1,2,4 repeats the run against a local backend with that many
+worker processes and prints the throughput speedup over the first count.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+BASELINE_FILE = ROOT_DIR / "backend_load_baseline.json"
+
+# A scenario regresses when RPS falls or p95 latency rises by more than this fraction
+RPS_TOLERANCE = 0.20
+P95_TOLERANCE = 0.25
+
+
+def make_contact(i):
+    return {
+        "name": f"Load Test {i}",
+        "phone": f"+1-555-{i:07d}",
+        "amount": 100.0 + i,
+        "email": f"load{i}@example.com",
+    }
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_scenario(client, name, concurrency, total, make_request):
+    """Send ``total`` requests from ``concurrency`` workers and summarize them"""
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            i = issued
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+    }
+    print(f"{name:<14} {result['rps']:>9.1f} rps  p50 {result['p50_ms']:>7.2f} ms  "
+          f"p95 {result['p95_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms  errors {errors}")
+    return result
+
+
+async def run_load_test(base_url, concurrency, total, read_by_id=True):
+    created_ids = []
+
+    async def create(client, i):
+        response = await client.post("/contact", json=make_contact(i))
+        if response.status_code == 200:
+            created_ids.append(response.json()["id"])
+        return response
+
+    async def replay_batch(client, i):
+        # A device reconnecting with ten forms it queued offline
+        rows = [{**make_contact(total + i * 10 + j), "idempotency_key": f"replay-{i}-{j}"} for j in range(10)]
+        return await client.post("/contact/batch", json=rows)
+
+    async def heartbeat(client, i):
+        return await client.post("/status", json={"client_name": f"kiosk-{i % 500}"})
+
+    async def list_page(client, i):
+        return await client.get("/contact", params={"limit": 100})
+
+    async def get_one(client, i):
+        return await client.get(f"/contact/{created_ids[i % len(created_ids)]}")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        results = {"create_contact": await run_scenario(client, "create_contact", concurrency, total, create)}
+        if not created_ids:
+            raise RuntimeError("No contact forms were created; cannot run read scenarios")
+        results["list_contacts"] = await run_scenario(client, "list_contacts", concurrency, total, list_page)
+        if read_by_id:
+            results["get_contact"] = await run_scenario(client, "get_contact", concurrency, total, get_one)
+        results["replay_batch"] = await run_scenario(client, "replay_batch", concurrency, total // 10,
+                                                     replay_batch)
+        results["heartbeat"] = await run_scenario(client, "heartbeat", concurrency, total, heartbeat)
+    return results
+
+
+def compare_with_baseline(results, baseline):
+    """Return a list of regression messages"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result["errors"]:
+            regressions.append(f"{name}: {result['errors']} failed requests")
+        if result["rps"] < expected["rps"] * (1 - RPS_TOLERANCE):
+            regressions.append(f"{name}: {result['rps']} rps vs baseline {expected['rps']}")
+        if result["p95_ms"] > expected["p95_ms"] * (1 + P95_TOLERANCE):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms vs baseline {expected['p95_ms']} ms")
+    return regressions
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def create_app():
+    """App factory run in every worker, optionally on the in-memory Mongo stand-in or embedded storage"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    # Every simulated client shares one address; measure the app, not the limiter
+    os.environ.setdefault("CONTACT_RATE_LIMIT_PER_MINUTE", "0")
+    os.environ["STORAGE_BACKEND"] = os.environ.get("LOAD_TEST_STORAGE", "mongo")
+    if os.environ["STORAGE_BACKEND"] == "mongo" and os.environ.get("LOAD_TEST_MONGO") == "memory":
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+        # The stand-in cannot create collections with storage or time-series options
+        os.environ["CONTACT_ARCHIVE_COMPRESSOR"] = ""
+        os.environ["STATUS_HEARTBEAT_TIMESERIES"] = "false"
+
+    import server
+    return server.create_app()
+
+
+def serve(port, mongo, workers, storage="mongo"):
+    """Run the backend with ``workers`` processes; workers inherit the storage choice through the environment"""
+    import uvicorn
+    os.environ["LOAD_TEST_MONGO"] = mongo
+    os.environ["LOAD_TEST_STORAGE"] = storage
+    uvicorn.run("backend_load_test:create_app", factory=True, workers=workers,
+                host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_local_server(mongo, workers=1, storage="mongo", sqlite_path=None):
+    port = free_port()
+    env = dict(os.environ)
+    if sqlite_path:
+        # One database file shared by every worker
+        env["SQLITE_PATH"] = sqlite_path
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "--serve", "--port", str(port), "--mongo", mongo,
+         "--workers", str(workers), "--storage", storage],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}/api"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Local backend exited during startup")
+        try:
+            if httpx.get(f"{base_url}/").status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Local backend did not start within 30 seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", help="Base URL of a running backend, e.g. http://localhost:8001/api")
+    parser.add_argument("--mongo", choices=["memory", "real"], default="memory",
+                        help="Mongo used by the local backend")
+    parser.add_argument("--storage", choices=["mongo", "memory", "sqlite"], default="mongo",
+                        help="Storage backend of the local backend")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--workers", default="1",
+                        help="Comma-separated worker counts for the local backend, e.g. 1,2,4")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8001, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(",")]
+    if args.serve:
+        serve(args.port, args.mongo, worker_counts[0], args.storage)
+        return True
+    if args.target and worker_counts != [1]:
+        parser.error("--workers only applies to the local backend, not --target")
+
+    print("=" * 60)
+    print("GOOD TRANSFER Backend Load Testing")
+    print("=" * 60)
+
+    # Every worker has its own in-memory store, so a read by id usually
+    # lands on a worker that never saw the insert
+    in_process = args.mongo == "memory" if args.storage == "mongo" else args.storage == "memory"
+    read_by_id = not in_process or max(worker_counts) == 1
+    if not read_by_id:
+        print("⚠️  In-process storage with several workers: skipping get_contact; use --mongo real or "
+              "--storage sqlite for it")
+    setup = args.mongo if args.storage == "mongo" else f"{args.storage}-storage"
+    scratch = tempfile.TemporaryDirectory()
+
+    runs = {}
+    for workers in worker_counts:
+        process = None
+        base_url = args.target
+        if not base_url:
+            sqlite_path = os.path.join(scratch.name, f"load_test_w{workers}.sqlite3")
+            process, base_url = start_local_server(args.mongo, workers, args.storage, sqlite_path)
+        print(f"Target: {base_url}  workers {workers}  concurrency {args.concurrency}  "
+              f"{args.requests} requests per scenario")
+        print()
+
+        try:
+            runs[workers] = asyncio.run(run_load_test(base_url, args.concurrency, args.requests, read_by_id))
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+        print()
+
+    if len(runs) > 1:
+        first = worker_counts[0]
+        print(f"Throughput relative to {first} worker(s):")
+        for workers, results in runs.items():
+            speedups = "  ".join(f"{name} {result['rps'] / runs[first][name]['rps']:.2f}x"
+                                 for name, result in results.items())
+            print(f"  {workers:>3} workers  {speedups}")
+        print()
+
+    # Baselines are only comparable for the same setup
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    ok = True
+    for workers, results in runs.items():
+        key = f"{'target' if args.target else setup}-c{args.concurrency}"
+        if workers != 1:
+            key += f"-w{workers}"
+
+        if args.save_baseline:
+            baselines[key] = results
+            print(f"📌 Saved baseline '{key}' to {args.baseline}")
+            continue
+
+        if key not in baselines:
+            print(f"⚠️  No baseline '{key}' stored; run with --save-baseline to create one")
+            continue
+
+        regressions = compare_with_baseline(results, baselines[key])
+        for regression in regressions:
+            print(f"❌ REGRESSION {regression}")
+        if not regressions:
+            print(f"✅ No regressions against baseline '{key}'")
+        ok = ok and not regressions
+
+    scratch.cleanup()
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Query Plan Testing for GOOD TRANSFER Contact Form list queries
+Checks that every GET /api/contact filter combination is index-backed
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+
+from resources import REQUIRED_INDEXES, load_settings
+from server import build_contact_query, encode_cursor
+
+# Uses MONGO_URL/DB_NAME from backend/.env unless overridden
+load_settings()
+MONGO_URL = os.environ["MONGO_URL"]
+DB_NAME = os.environ.get("QUERY_PLAN_DB", os.environ["DB_NAME"] + "_query_plan")
+
+NOW = datetime.utcnow()
+CASES = {
+    "no filters": {},
+    "descending": {"order": "desc"},
+    "status": {"status": "pending"},
+    "status + timestamp range": {"status": "pending", "since": NOW - timedelta(days=7), "until": NOW},
+    "timestamp range": {"since": NOW - timedelta(days=1)},
+    "amount range": {"min_amount": 100.0, "max_amount": 5000.0},
+    "status + amount + desc": {"status": "pending", "min_amount": 100.0, "order": "desc"},
+    "projection": {"fields": "name,amount"},
+    "next page": {"after": encode_cursor(NOW, "00000000-0000-0000-0000-000000000000")},
+    "status + next page": {"status": "pending",
+                           "after": encode_cursor(NOW, "00000000-0000-0000-0000-000000000000")},
+}
+
+
+def plan_stages(plan):
+    """Yield every stage name in a winning plan tree"""
+    yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+def check_case(collection, name, params):
+    query, sort, projection = build_contact_query(**params)
+    explain = collection.find(query, projection).sort(sort).limit(100).explain()
+    stages = set(plan_stages(explain["queryPlanner"]["winningPlan"]))
+    problems = stages & {"COLLSCAN", "SORT"}
+    if problems:
+        print(f"❌ FAIL {name}: winning plan uses {sorted(problems)}")
+        return False
+    print(f"✅ PASS {name}: {sorted(stages)}")
+    return True
+
+
+def main():
+    client = MongoClient(MONGO_URL)
+    db = client[DB_NAME]
+    try:
+        collection = db.contact_forms
+        collection.create_indexes(REQUIRED_INDEXES["contact_forms"])
+        collection.insert_one({"id": "seed", "name": "Seed", "phone": "0", "amount": 1.0,
+                               "timestamp": NOW, "status": "pending"})
+
+        passed = sum(check_case(collection, name, params) for name, params in CASES.items())
+        print()
+        print(f"QUERY PLAN SUMMARY: {passed}/{len(CASES)} queries index-backed")
+        return passed == len(CASES)
+    finally:
+        client.drop_database(DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Search Benchmark for GOOD TRANSFER Contact Form API
+Measures GET /api/contact/search query latency over a large contact_forms collection
+
+Seeds --documents synthetic forms (1M by default) into a separate database
+on MONGO_URL, creates the production indexes and times each search
+strategy: ranked full-name text search, name prefixes, phone prefixes, email
+prefixes and a deep page. Fails when a strategy's p95 exceeds the target or
+its winning plan scans the collection. Pass --keep to reuse the seeded
+database on the next run.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from contact_search import ContactSearch, decode_search_cursor, encode_search_cursor, normalize, search_fields
+from resources import REQUIRED_INDEXES, load_settings
+
+# Uses MONGO_URL/DB_NAME from backend/.env unless overridden
+load_settings()
+MONGO_URL = os.environ["MONGO_URL"]
+DB_NAME = os.environ.get("SEARCH_BENCH_DB", os.environ["DB_NAME"] + "_search_bench")
+
+FIRST_NAMES = ["José", "María", "Juan", "Ana", "Luis", "Lucía", "Jesús", "Sofía", "Andrés", "Camila",
+               "Martín", "Valentina", "Ramón", "Inés", "Óscar", "Mónica", "Iván", "Verónica", "Nicolás", "Raúl"]
+LAST_NAMES = ["López", "García", "Martínez", "Rodríguez", "Pérez", "Gómez", "Sánchez", "Hernández", "Díaz",
+              "Muñoz", "Álvarez", "Jiménez", "Ruiz", "Castaño", "Núñez", "Ibáñez", "Peña", "Ordóñez"]
+AREA_CODES = ["347", "718", "212", "305", "786", "213", "646", "917"]
+
+SEED_BATCH = 10000
+P95_TARGET_MS = 50.0
+
+
+def make_form(rng, now):
+    first = rng.choice(FIRST_NAMES)
+    second = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    form = {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "name": f"{first} {second} {last}",
+        "email": f"{normalize(first)}.{normalize(last)}{rng.randrange(10000)}@example.com",
+        "phone": f"+1-{rng.choice(AREA_CODES)}-{rng.randrange(1000):03d}-{rng.randrange(10000):04d}",
+        "amount": 0.0,
+        "amount_minor": rng.randrange(100, 1000000),
+        "currency": "USD",
+        "message": None,
+        "timestamp": now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+        "status": rng.choice(["pending", "pending", "in_progress", "completed"]),
+    }
+    form["amount"] = form["amount_minor"] / 100
+    return {**form, **search_fields(form)}
+
+
+def seed(collection, documents):
+    existing = collection.estimated_document_count()
+    if existing >= documents:
+        print(f"Reusing {existing} seeded documents")
+        return
+    rng = random.Random(existing)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    for offset in range(existing, documents, SEED_BATCH):
+        batch = [make_form(rng, now) for _ in range(min(SEED_BATCH, documents - offset))]
+        collection.insert_many(batch, ordered=False)
+        print(f"\rSeeded {offset + len(batch)}/{documents}", end="", flush=True)
+    print(f"\nSeeded in {time.perf_counter() - started:.1f} s")
+
+
+def scenarios(rng, count):
+    """Search arguments per strategy: (q, cursor)"""
+    def name():
+        # Lowercase and without accents, as staff type it
+        return normalize(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+    return {
+        "full name": [(name(), None) for _ in range(count)],
+        "name prefix": [(rng.choice(LAST_NAMES)[:3] + " " + rng.choice(FIRST_NAMES)[:2],
+                         encode_search_cursor("prefix", 0)) for _ in range(count)],
+        "phone prefix": [(f"+1-{rng.choice(AREA_CODES)}-{rng.randrange(100):02d}", None) for _ in range(count)],
+        "email prefix": [(normalize(f"{rng.choice(FIRST_NAMES)}.{rng.choice(LAST_NAMES)}") + str(rng.randrange(10)),
+                          None) for _ in range(count)],
+        "page 5": [(name(), encode_search_cursor("text", 80)) for _ in range(count)],
+    }
+
+
+def plan_stages(plan):
+    """Yield every stage name in a winning plan tree"""
+    yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+def check_plan(collection, search, q, cursor):
+    mode = decode_search_cursor(cursor)[0] if cursor else None
+    _, query, sort, projection = search.plan(q, mode, projection={"_id": 0, "id": 1})
+    find = collection.find(query, projection)
+    if sort:
+        find = find.sort(sort)
+    stages = set(plan_stages(find.limit(20).explain()["queryPlanner"]["winningPlan"]))
+    return "COLLSCAN" not in stages, sorted(stages)
+
+
+async def time_searches(search, cases, limit):
+    latencies = []
+    rows = 0
+    for q, cursor in cases:
+        started = time.perf_counter()
+        results, _, _ = await search.search(q, limit, cursor)
+        latencies.append((time.perf_counter() - started) * 1000)
+        rows += len(results)
+    return latencies, rows
+
+
+async def run(args):
+    client = AsyncIOMotorClient(MONGO_URL)
+    search = ContactSearch(client[DB_NAME].contact_forms)
+    results = {}
+    try:
+        for name, cases in scenarios(random.Random(42), args.queries).items():
+            # One untimed pass warms the cache so runs are comparable
+            await time_searches(search, cases[:5], args.limit)
+            results[name] = await time_searches(search, cases, args.limit)
+    finally:
+        client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200, help="Searches per strategy")
+    parser.add_argument("--limit", type=int, default=20, help="Page size")
+    parser.add_argument("--p95-target-ms", type=float, default=P95_TARGET_MS)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database for the next run")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("GOOD TRANSFER Contact Search Benchmark")
+    print("=" * 60)
+
+    client = MongoClient(MONGO_URL)
+    collection = client[DB_NAME].contact_forms
+    try:
+        seed(collection, args.documents)
+        started = time.perf_counter()
+        collection.create_indexes(REQUIRED_INDEXES["contact_forms"])
+        print(f"Indexes ready in {time.perf_counter() - started:.1f} s")
+        print()
+
+        ok = True
+        search = ContactSearch(collection)
+        results = asyncio.run(run(args))
+        for name, case in scenarios(random.Random(42), 1).items():
+            latencies, rows = results[name]
+            ordered = sorted(latencies)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+            indexed, stages = check_plan(collection, search, *case[0])
+            passed = indexed and p95 <= args.p95_target_ms
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} {name:<13} p50 {statistics.median(latencies):>7.2f} ms  "
+                  f"p95 {p95:>7.2f} ms  max {ordered[-1]:>7.2f} ms  {rows / len(latencies):>5.1f} rows/query  "
+                  f"{'/'.join(stages)}")
+
+        print()
+        print(f"SEARCH BENCHMARK: {'within' if ok else 'over'} the {args.p95_target_ms:.0f} ms p95 target "
+              f"at {collection.estimated_document_count()} documents")
+        return ok
+    finally:
+        if not args.keep:
+            client.drop_database(DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark for GOOD TRANSFER Contact Form API
+Profiles backend import time and measures process start to the first served /api/ request
+
+The import profile comes from ``python -X importtime -c "import server"`` and
+is summarized per top-level package. The run fails when a module the request
+path must not load is imported, or when the median time to the first
+response exceeds the target. By default the server runs against the
+in-memory Mongo stand-in, whose own import is included in the timing; pass
+--mongo real to use MONGO_URL from backend/.env.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+BASELINE_FILE = ROOT_DIR / "backend_startup_baseline.json"
+
+# Installed for other tooling; loading any of them on startup is a regression
+FORBIDDEN_MODULES = ("boto3", "botocore", "pandas", "numpy", "cryptography", "jose", "passlib", "pyarrow", "redis")
+
+FIRST_REQUEST_TARGET_MS = 2000
+# A run regresses when the import total or time to first request grows by more than this fraction
+TOLERANCE = 0.25
+
+
+def import_profile():
+    """Return (total_us, {top-level package: self_us}) for ``import server``"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue
+        # Self time summed per package, so nested imports are not counted twice
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+    return sum(packages.values()), packages
+
+
+def loaded_modules():
+    """Top-level packages in sys.modules after importing the app"""
+    code = "import sys, server; print('\\n'.join(sorted({m.split('.')[0] for m in sys.modules})))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(port, mongo):
+    """Run the backend in this process, optionally on the in-memory Mongo stand-in"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    if mongo == "memory":
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+        # The stand-in cannot create collections with storage or time-series options
+        os.environ["CONTACT_ARCHIVE_COMPRESSOR"] = ""
+        os.environ["STATUS_HEARTBEAT_TIMESERIES"] = "false"
+
+    import uvicorn
+    uvicorn.run("server:create_app", factory=True, host="127.0.0.1", port=port, log_level="warning")
+
+
+def time_to_first_request(mongo):
+    """Milliseconds from spawning the server process to a 200 from /api/"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "--serve", "--port", str(port), "--mongo", mongo],
+        cwd=BACKEND_DIR, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("Backend exited during startup")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError("Backend did not answer within 30 seconds")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mongo", choices=["memory", "real"], default="memory",
+                        help="Mongo used by the local backend")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to take the median of")
+    parser.add_argument("--target-ms", type=float, default=FIRST_REQUEST_TARGET_MS,
+                        help="Budget for process start to first served request")
+    parser.add_argument("--top", type=int, default=12, help="Packages to list in the import profile")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8001, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.mongo)
+        return True
+
+    print("=" * 60)
+    print("GOOD TRANSFER Backend Startup Benchmark")
+    print("=" * 60)
+
+    failures = []
+
+    total_us, packages = import_profile()
+    print(f"import server: {total_us / 1000:.1f} ms")
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<24} {own / 1000:>8.1f} ms  {own / total_us:>6.1%}")
+    print()
+
+    forbidden = sorted(loaded_modules() & set(FORBIDDEN_MODULES))
+    if forbidden:
+        failures.append(f"importing the app loads {', '.join(forbidden)}")
+
+    samples = [time_to_first_request(args.mongo) for _ in range(args.runs)]
+    first_request_ms = statistics.median(samples)
+    print(f"Process start to first /api/ response: median {first_request_ms:.0f} ms "
+          f"(min {min(samples):.0f}, max {max(samples):.0f}, {args.runs} runs, target {args.target_ms:.0f} ms)")
+    if first_request_ms > args.target_ms:
+        failures.append(f"first request after {first_request_ms:.0f} ms, target {args.target_ms:.0f} ms")
+
+    results = {"import_ms": round(total_us / 1000, 1), "first_request_ms": round(first_request_ms, 1)}
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    print()
+    if args.save_baseline:
+        baselines[args.mongo] = results
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"📌 Saved baseline '{args.mongo}' to {args.baseline}")
+    elif args.mongo in baselines:
+        for name, value in results.items():
+            expected = baselines[args.mongo][name]
+            if value > expected * (1 + TOLERANCE):
+                failures.append(f"{name}: {value} vs baseline {expected}")
+    else:
+        print(f"⚠️  No baseline '{args.mongo}' stored; run with --save-baseline to create one")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Startup within budget")
+    return not failures
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Storage Conformance Tests for GOOD TRANSFER Contact Form API
+Runs one suite of checks and micro-benchmarks against every storage backend
+
+Backends are the repositories behind the contact and status endpoints:
+memory, sqlite (a temporary WAL database) and mongo-memory (the Mongo
+repositories on mongomock-motor) by default; add mongo to use MONGO_URL from
+backend/.env with a scratch database. Besides the checks, every backend
+answers the same random listing queries over the same forms and must return
+exactly what the memory backend returns. The benchmark then times the
+operations the routes perform, --requests of each, on every backend but
+mongo-memory.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from memory_repository import MemoryContactRepository, MemoryStatusRepository
+from repositories import ContactQuery
+from sqlite_repository import SQLiteContactRepository, SQLiteStatusRepository, SQLiteStore
+
+CONTACT_FIELDS = ("id", "name", "email", "phone", "amount", "amount_minor", "currency", "message", "timestamp",
+                  "status")
+DOCUMENT_FIELDS = (*CONTACT_FIELDS, "version")
+STATUSES = ["pending", "in_progress", "completed", "cancelled"]
+CURRENCIES = ["USD", "USD", "USD", "EUR"]
+BASE_TIME = datetime(2026, 1, 1)
+
+
+def make_form(rng, i, timestamp=None):
+    amount_minor = rng.randrange(100, 100000)
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "name": f"Storage Test {i}",
+        "email": f"storage{i}@example.com" if i % 3 else None,
+        "phone": f"+1-555-{i:07d}",
+        "amount": amount_minor / 100,
+        "amount_minor": amount_minor,
+        "currency": rng.choice(CURRENCIES),
+        "message": None,
+        # Whole minutes, so many forms share a timestamp and the id breaks the tie
+        "timestamp": timestamp or BASE_TIME + timedelta(minutes=rng.randrange(600)),
+        "status": rng.choice(STATUSES),
+    }
+
+
+def random_query(rng):
+    since = BASE_TIME + timedelta(minutes=rng.randrange(300)) if rng.random() < 0.3 else None
+    until = BASE_TIME + timedelta(minutes=rng.randrange(300, 600)) if rng.random() < 0.3 else None
+    low = rng.randrange(100, 50000) if rng.random() < 0.3 else None
+    return ContactQuery(
+        fields=CONTACT_FIELDS,
+        status=rng.choice(STATUSES) if rng.random() < 0.4 else None,
+        min_amount_minor=low,
+        max_amount_minor=low + rng.randrange(50000) if low is not None and rng.random() < 0.5 else None,
+        currency=rng.choice(["USD", "EUR"]) if rng.random() < 0.3 else None,
+        since=since,
+        until=until,
+        descending=rng.random() < 0.5,
+    )
+
+
+class Backend:
+    """A fresh pair of repositories, and whatever has to be cleaned up after them."""
+
+    def __init__(self, name):
+        self.name = name
+        self.contacts = None
+        self.statuses = None
+        self._close = []
+
+    async def open(self):
+        if self.name == "memory":
+            self.contacts = MemoryContactRepository()
+            self.statuses = MemoryStatusRepository()
+        elif self.name == "sqlite":
+            directory = tempfile.TemporaryDirectory()
+            store = SQLiteStore(os.path.join(directory.name, "storage_test.sqlite3"))
+            await store.open()
+            self.contacts = SQLiteContactRepository(store)
+            self.statuses = SQLiteStatusRepository(store)
+            self._close += [store.close, directory.cleanup]
+        else:
+            await self._open_mongo()
+
+    async def _open_mongo(self):
+        from http_cache import VERSIONS_COLLECTION, CollectionVersion
+        from repositories import MongoContactRepository, MongoStatusRepository
+        from resources import ensure_indexes, load_settings
+        from status_heartbeats import HEARTBEAT_COLLECTION, StatusLatest
+
+        if self.name == "mongo-memory":
+            from mongomock_motor import AsyncMongoMockClient
+            client = AsyncMongoMockClient()
+            # The stand-in cannot create collections with storage or time-series options
+            options = {"archive_compressor": None, "heartbeat_timeseries": False}
+        else:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            load_settings()
+            client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+            options = {}
+        name = os.environ.get("DB_NAME", "goodtransfer") + "_storage_test_" + uuid.uuid4().hex[:8]
+        db = client[name]
+        await ensure_indexes(db, **options)
+        self.contacts = MongoContactRepository(db.contact_forms, db.contact_forms_archive,
+                                               CollectionVersion(db[VERSIONS_COLLECTION], "contact_forms"))
+        self.statuses = MongoStatusRepository(db[HEARTBEAT_COLLECTION], StatusLatest(db.status_latest))
+
+        async def drop():
+            await client.drop_database(name)
+            client.close()
+        self._close.append(drop)
+
+    async def close(self):
+        for close in self._close:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+async def all_pages(contacts, query, size):
+    documents = []
+    while True:
+        page = await contacts.page(query, size)
+        documents += page
+        if len(page) < size:
+            return documents
+        query = replace(query, after=(page[-1]["timestamp"], page[-1]["id"]))
+
+
+# Each check gets fresh repositories and raises AssertionError on a deviation
+
+async def check_add_and_get(backend):
+    form = make_form(random.Random(1), 1)
+    await backend.contacts.add(dict(form))
+    stored = await backend.contacts.get(form["id"], DOCUMENT_FIELDS)
+    assert {key: stored[key] for key in CONTACT_FIELDS} == form, stored
+    assert stored.get("version", 0) == 0, stored
+    assert await backend.contacts.get(form["id"], ("id", "status")) == {"id": form["id"], "status": form["status"]}
+    assert await backend.contacts.get(str(uuid.uuid4()), CONTACT_FIELDS) is None
+
+
+async def check_duplicates(backend):
+    rng = random.Random(2)
+    first, second, third = (make_form(rng, i) for i in range(3))
+    await backend.contacts.add(dict(first))
+    try:
+        await backend.contacts.add(dict(first))
+    except Exception:
+        pass
+    else:
+        raise AssertionError("a second form with the same id was stored")
+    failed = await backend.contacts.add_many([dict(second), dict(first), dict(third)])
+    assert list(failed) == [1], failed
+    assert await backend.contacts.get(third["id"], ("id",)) == {"id": third["id"]}
+
+
+async def check_keyset_pages(backend):
+    rng = random.Random(3)
+    forms = [make_form(rng, i) for i in range(250)]
+    assert await backend.contacts.add_many([dict(form) for form in forms]) == {}
+    expected = sorted((form["timestamp"], form["id"]) for form in forms)
+    for descending in (False, True):
+        query = ContactQuery(fields=("id", "timestamp"), descending=descending)
+        documents = await all_pages(backend.contacts, query, 40)
+        keys = [(document["timestamp"], document["id"]) for document in documents]
+        assert keys == (expected[::-1] if descending else expected), f"descending={descending}"
+        assert set(documents[0]) == {"id", "timestamp"}, documents[0]
+
+
+async def check_stream(backend):
+    rng = random.Random(4)
+    await backend.contacts.add_many([make_form(rng, i) for i in range(120)])
+    query = ContactQuery(fields=CONTACT_FIELDS, status="pending", descending=True)
+    expected = await all_pages(backend.contacts, query, 1000)
+    streamed = [document async for document in backend.contacts.stream(query, batch_size=7)]
+    assert streamed == expected
+    limited = [document async for document in backend.contacts.stream(query, limit=10, batch_size=3)]
+    assert limited == expected[:10]
+
+
+async def check_set_status(backend):
+    form = make_form(random.Random(5), 5)
+    form["status"] = "pending"
+    await backend.contacts.add(dict(form))
+    before = await backend.contacts.set_status(form["id"], "completed", DOCUMENT_FIELDS)
+    assert before["status"] == "pending" and before.get("version", 0) == 0, before
+    after = await backend.contacts.get(form["id"], DOCUMENT_FIELDS)
+    assert after["status"] == "completed" and after["version"] == 1, after
+    listed = await backend.contacts.page(ContactQuery(fields=("id",), status="completed"), 10)
+    assert listed == [{"id": form["id"]}], listed
+    assert await backend.contacts.set_status(str(uuid.uuid4()), "completed", DOCUMENT_FIELDS) is None
+
+
+async def check_version(backend):
+    version, updated_at = await backend.contacts.version()
+    assert version == 0, version
+    await backend.contacts.bump_version()
+    await backend.contacts.bump_version()
+    bumped, bumped_at = await backend.contacts.version()
+    assert bumped == 2 and bumped_at > updated_at, (bumped, bumped_at)
+
+
+async def check_heartbeats(backend):
+    now = datetime.utcnow().replace(microsecond=0)
+    heartbeats = [{"id": str(uuid.uuid4()), "client_name": f"kiosk-{i % 3}", "timestamp": now + timedelta(seconds=i)}
+                  for i in range(9)]
+    await backend.statuses.add(heartbeats[:5])
+    await backend.statuses.add(heartbeats[5:])
+    # A late heartbeat must not replace a newer latest one
+    late = {"id": str(uuid.uuid4()), "client_name": "kiosk-0", "timestamp": now - timedelta(hours=1)}
+    await backend.statuses.add([late])
+
+    recent = await backend.statuses.recent(limit=4)
+    assert [heartbeat["id"] for heartbeat in recent] == [heartbeat["id"] for heartbeat in heartbeats[:-5:-1]]
+    recent = await backend.statuses.recent("kiosk-1")
+    assert [heartbeat["id"] for heartbeat in recent] == [heartbeats[i]["id"] for i in (7, 4, 1)], recent
+
+    latest = await backend.statuses.latest()
+    assert [(heartbeat["client_name"], heartbeat["id"]) for heartbeat in latest] == \
+        [(f"kiosk-{i}", heartbeats[6 + i]["id"]) for i in range(3)], latest
+    assert set(latest[0]) == {"id", "client_name", "timestamp"}, latest[0]
+    since = await backend.statuses.latest(since=now + timedelta(seconds=7))
+    assert [heartbeat["client_name"] for heartbeat in since] == ["kiosk-1", "kiosk-2"], since
+    assert len(await backend.statuses.latest("kiosk-2")) == 1
+
+
+CHECKS = [check_add_and_get, check_duplicates, check_keyset_pages, check_stream, check_set_status, check_version,
+          check_heartbeats]
+
+
+async def differential(names, forms, queries):
+    """Every backend answers ``queries`` over ``forms``; return the backends that disagree with memory"""
+    answers = {}
+    for name in names:
+        backend = Backend(name)
+        await backend.open()
+        try:
+            await backend.contacts.add_many([dict(form) for form in forms])
+            answers[name] = [[document["id"] for document in await all_pages(backend.contacts, query, 25)]
+                             for query in queries]
+        finally:
+            await backend.close()
+    reference = answers.get("memory")
+    return [name for name, answer in answers.items() if reference is not None and answer != reference]
+
+
+async def benchmark(name, requests):
+    """Operations per second of what each route does against ``name``"""
+    backend = Backend(name)
+    await backend.open()
+    rng = random.Random(7)
+    forms = [make_form(rng, i, datetime.utcnow()) for i in range(requests)]
+    chunk = [make_form(rng, i, datetime.utcnow()) for i in range(requests)]
+    results = {}
+
+    async def timed(label, count, operation):
+        started = time.perf_counter()
+        await operation()
+        results[label] = count / (time.perf_counter() - started)
+
+    async def add():
+        for form in forms:
+            await backend.contacts.add(form)
+
+    async def add_many():
+        for offset in range(0, requests, 500):
+            await backend.contacts.add_many(chunk[offset:offset + 500])
+
+    async def get():
+        for form in forms:
+            await backend.contacts.get(form["id"], DOCUMENT_FIELDS)
+
+    async def page():
+        for i in range(requests // 10):
+            await backend.contacts.page(ContactQuery(fields=CONTACT_FIELDS, status=STATUSES[i % 4],
+                                                     descending=True), 50)
+
+    async def set_status():
+        for form in forms[:requests // 10]:
+            await backend.contacts.set_status(form["id"], "completed", DOCUMENT_FIELDS)
+
+    async def heartbeats():
+        for i in range(requests):
+            await backend.statuses.add([{"id": str(uuid.uuid4()), "client_name": f"kiosk-{i % 50}",
+                                         "timestamp": datetime.utcnow()}])
+
+    try:
+        await timed("add", requests, add)
+        await timed("add_many", requests, add_many)
+        await timed("get", requests, get)
+        await timed("page(50)", requests // 10, page)
+        await timed("set_status", requests // 10, set_status)
+        await timed("heartbeat", requests, heartbeats)
+    finally:
+        await backend.close()
+    return results
+
+
+async def run(args):
+    ok = True
+    for name in args.backends:
+        for check in CHECKS:
+            backend = Backend(name)
+            await backend.open()
+            try:
+                await check(backend)
+                print(f"✅ PASS {name:<12} {check.__name__}")
+            except AssertionError as e:
+                ok = False
+                print(f"❌ FAIL {name:<12} {check.__name__}: {e}")
+            finally:
+                await backend.close()
+
+    rng = random.Random(args.seed)
+    forms = [make_form(rng, i) for i in range(500)]
+    queries = [random_query(rng) for _ in range(60)]
+    disagree = await differential(["memory", *[name for name in args.backends if name != "memory"]], forms, queries)
+    ok = ok and not disagree
+    print(f"{'❌ FAIL' if disagree else '✅ PASS'} {len(queries)} random listings agree across backends"
+          + (f": {', '.join(disagree)} differ from memory" if disagree else ""))
+
+    if args.requests:
+        print()
+        labels = None
+        # mongo-memory would time the stand-in, not Mongo
+        for name in [name for name in args.backends if name != "mongo-memory"]:
+            results = await benchmark(name, args.requests)
+            if labels is None:
+                labels = list(results)
+                print(f"{'ops/s':<14}" + "".join(f"{label:>12}" for label in labels))
+            print(f"{name:<14}" + "".join(f"{results[label]:>12.0f}" for label in labels))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", default="memory,sqlite,mongo-memory",
+                        help="Comma-separated: memory, sqlite, mongo-memory, mongo")
+    parser.add_argument("--requests", type=int, default=2000, help="Operations per benchmark; 0 skips it")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random listings")
+    args = parser.parse_args()
+    args.backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+
+    print("=" * 60)
+    print("GOOD TRANSFER Storage Conformance Tests")
+    print("=" * 60)
+    ok = asyncio.run(run(args))
+    print()
+    print(f"STORAGE TESTS: {'all backends conform' if ok else 'backends deviate'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -2,21 +2,34 @@
 """
 Backend API Testing for GOOD TRANSFER Money Transfer Service
 Tests Contact Form API endpoints and data validation
+
+Runs against BACKEND_URL, or with --local memory|sqlite against a backend
+started here on embedded storage, where the Mongo-only tests are skipped.
 """
 
+import argparse
 import requests
 import json
+import socket
+import subprocess
+import tempfile
 import uuid
 from datetime import datetime
 import sys
 import os
+import time
 
 # Get backend URL from frontend environment
-BACKEND_URL = "https://1a1f880a-30d1-4c0f-b974-eb71cc0e8e9c.preview.emergentagent.com/api"
+BACKEND_URL = os.environ.get("BACKEND_URL",
+                             "https://1a1f880a-30d1-4c0f-b974-eb71cc0e8e9c.preview.emergentagent.com/api")
+
+# Features built on Mongo aggregations and change streams; 501 on embedded storage
+MONGO_ONLY_TESTS = {"test_contact_search", "test_contact_stats", "test_contact_rollups", "test_contact_feed"}
 
 class BackendTester:
-    def __init__(self):
-        self.base_url = BACKEND_URL
+    def __init__(self, base_url=BACKEND_URL, storage="mongo"):
+        self.base_url = base_url
+        self.storage = storage
         self.test_results = []
         self.created_contact_ids = []
         
@@ -163,20 +176,55 @@ class BackendTester:
             # Missing amount
         }
         
+        # Test a message over the length limit
+        long_message = {**invalid_data, "amount": 10, "message": "x" * 5001}
+        
         try:
             response = requests.post(f"{self.base_url}/contact", json=invalid_data)
-            if response.status_code == 422:  # Validation error
+            too_long = requests.post(f"{self.base_url}/contact", json=long_message)
+            if response.status_code == 422 and too_long.status_code == 422:  # Validation error
                 self.log_test("Create Contact Form - Invalid Data", True, 
-                            "Properly rejected request with missing required field")
+                            "Properly rejected missing required field and overlong message")
                 return True
             else:
                 self.log_test("Create Contact Form - Invalid Data", False, 
-                            f"Expected 422 validation error, got: {response.status_code}")
+                            f"Expected 422 validation errors, got: {response.status_code}, {too_long.status_code}")
                 return False
         except Exception as e:
             self.log_test("Create Contact Form - Invalid Data", False, f"Error: {str(e)}")
             return False
     
+    def test_amount_out_of_range(self):
+        """Test that amounts beyond int64 minor units are rejected instead of failing the request"""
+        try:
+            form = {"name": "Overflow Test", "phone": "+1-555-000-0001"}
+            problems = []
+            for amount in ["1e999999999", "1e20", 1e20]:
+                response = requests.post(f"{self.base_url}/contact", json={**form, "amount": amount})
+                if response.status_code != 422:
+                    problems.append(f"POST amount {amount!r}: {response.status_code}")
+            
+            response = requests.post(f"{self.base_url}/contact/bulk",
+                                     json=[{**form, "amount": "1e999999"}, {**form, "amount": 10}])
+            if response.status_code != 200:
+                problems.append(f"bulk: {response.status_code}")
+            elif [bool(result.get("error")) for result in response.json()["results"]] != [True, False]:
+                problems.append(f"bulk results: {response.json()['results']}")
+            
+            for amount in ["1e999999999", "1e20"]:
+                response = requests.get(f"{self.base_url}/contact", params={"min_amount": amount})
+                if response.status_code != 400:
+                    problems.append(f"GET min_amount {amount}: {response.status_code}")
+            
+            if problems:
+                self.log_test("Amount Out Of Range", False, "; ".join(problems))
+                return False
+            self.log_test("Amount Out Of Range", True, "Rejected with 422/400 and per-row bulk errors")
+            return True
+        except Exception as e:
+            self.log_test("Amount Out Of Range", False, f"Error: {str(e)}")
+            return False
+    
     def test_get_all_contact_forms(self):
         """Test retrieving all contact forms"""
         try:
@@ -293,12 +341,427 @@ class BackendTester:
             self.log_test("Data Persistence", False, f"Error: {str(e)}")
             return False
     
+    def test_contact_pagination(self):
+        """Test keyset pagination and NDJSON streaming of contact forms"""
+        try:
+            page1 = requests.get(f"{self.base_url}/contact", params={"limit": 1})
+            if page1.status_code != 200 or len(page1.json()) != 1:
+                self.log_test("Contact Pagination", False,
+                            f"Status code: {page1.status_code}, Response: {page1.text}")
+                return False
+            
+            next_cursor = page1.headers.get("X-Next-Cursor")
+            if next_cursor:
+                page2 = requests.get(f"{self.base_url}/contact",
+                                     params={"limit": 1, "after": next_cursor})
+                if page2.status_code != 200 or page2.json()[0]["id"] == page1.json()[0]["id"]:
+                    self.log_test("Contact Pagination", False, "Second page repeated the first page")
+                    return False
+            
+            stream = requests.get(f"{self.base_url}/contact",
+                                  params={"stream": "true", "limit": 2}, stream=True)
+            rows = [json.loads(line) for line in stream.iter_lines() if line]
+            if stream.status_code == 200 and 1 <= len(rows) <= 2 and "id" in rows[0]:
+                self.log_test("Contact Pagination", True, "Keyset pages and NDJSON stream returned rows")
+                return True
+            else:
+                self.log_test("Contact Pagination", False,
+                            f"Unexpected stream response: {stream.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Contact Pagination", False, f"Error: {str(e)}")
+            return False
+    
+    def test_bulk_contact_forms(self):
+        """Test bulk ingestion with a mix of valid and invalid rows"""
+        rows = [
+            {"name": "Bulk Uno", "phone": "+1-555-000-0001", "amount": 10.0},
+            {"name": "Bulk Invalid", "phone": "+1-555-000-0002"},
+            {"name": "Bulk Dos", "phone": "+1-555-000-0003", "amount": 20.0},
+        ]
+        
+        try:
+            response = requests.post(f"{self.base_url}/contact/bulk", json=rows)
+            if response.status_code != 200:
+                self.log_test("Bulk Contact Forms", False,
+                            f"Status code: {response.status_code}, Response: {response.text}")
+                return False
+            
+            data = response.json()
+            errors = [result["index"] for result in data["results"] if result["error"]]
+            if data["inserted"] == 2 and data["failed"] == 1 and errors == [1]:
+                self.created_contact_ids.extend(
+                    result["id"] for result in data["results"] if result["id"])
+                self.log_test("Bulk Contact Forms", True, "Valid rows inserted, invalid row reported")
+                return True
+            else:
+                self.log_test("Bulk Contact Forms", False, f"Unexpected results: {data}")
+                return False
+        except Exception as e:
+            self.log_test("Bulk Contact Forms", False, f"Error: {str(e)}")
+            return False
+    
+    def test_contact_search(self):
+        """Test accent-insensitive search by name and phone prefix"""
+        try:
+            created = requests.post(f"{self.base_url}/contact", json={
+                "name": "Juan Pérez", "phone": "+1-347-555-0142", "amount": 12.5})
+            if created.status_code != 200:
+                self.log_test("Contact Search", False, f"Create status code: {created.status_code}")
+                return False
+            
+            by_name = requests.get(f"{self.base_url}/contact/search", params={"q": "juan perez"})
+            by_phone = requests.get(f"{self.base_url}/contact/search", params={"q": "+1-347"})
+            if by_name.status_code != 200 or by_phone.status_code != 200:
+                self.log_test("Contact Search", False,
+                            f"Status codes: {by_name.status_code}, {by_phone.status_code}")
+                return False
+            
+            names = [form["name"] for form in by_name.json()]
+            phones = [form["phone"] for form in by_phone.json()]
+            if "Juan Pérez" in names and "+1-347-555-0142" in phones:
+                self.log_test("Contact Search", True,
+                            f"{len(names)} name matches ({by_name.headers.get('X-Search-Mode')}), "
+                            f"{len(phones)} phone matches")
+                return True
+            else:
+                self.log_test("Contact Search", False, f"Names: {names[:5]}, phones: {phones[:5]}")
+                return False
+        except Exception as e:
+            self.log_test("Contact Search", False, f"Error: {str(e)}")
+            return False
+    
+    def test_contact_stats(self):
+        """Test hourly contact form statistics"""
+        try:
+            response = requests.get(f"{self.base_url}/contact/stats", params={"bucket": "hour"})
+            if response.status_code != 200:
+                self.log_test("Contact Stats", False,
+                            f"Status code: {response.status_code}, Response: {response.text}")
+                return False
+            
+            data = response.json()
+            pending = [total for total in data["by_status"] if total["status"] == "pending"]
+            if data["bucket"] == "hour" and pending and pending[0]["count"] >= 1:
+                self.log_test("Contact Stats", True,
+                            f"{pending[0]['count']} pending forms in {len(data['buckets'])} bucket rows")
+                return True
+            else:
+                self.log_test("Contact Stats", False, f"Unexpected stats: {data['by_status']}")
+                return False
+        except Exception as e:
+            self.log_test("Contact Stats", False, f"Error: {str(e)}")
+            return False
+    
+    def test_contact_rollups(self):
+        """Test exact amount totals from the hourly rollups"""
+        try:
+            response = requests.get(f"{self.base_url}/contact/rollups", params={"bucket": "hour"})
+            if response.status_code != 200:
+                self.log_test("Contact Rollups", False,
+                            f"Status code: {response.status_code}, Response: {response.text}")
+                return False
+            
+            data = response.json()
+            usd = [total for total in data["by_status"] if total["currency"] == "USD"]
+            if usd and all(isinstance(total["amount_sum_minor"], int) for total in usd):
+                self.log_test("Contact Rollups", True,
+                            f"{sum(total['count'] for total in usd)} USD forms in {len(data['buckets'])} rollups")
+                return True
+            else:
+                self.log_test("Contact Rollups", False, f"Unexpected rollups: {data['by_status']}")
+                return False
+        except Exception as e:
+            self.log_test("Contact Rollups", False, f"Error: {str(e)}")
+            return False
+    
+    def test_idempotent_submission(self):
+        """Test that a retried submission returns the original contact form"""
+        test_data = {
+            "name": "Reintento Idempotente",
+            "phone": "+1-555-222-3333",
+            "amount": 75.0
+        }
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+        
+        try:
+            first = requests.post(f"{self.base_url}/contact", json=test_data, headers=headers)
+            retry = requests.post(f"{self.base_url}/contact", json=test_data, headers=headers)
+            if first.status_code != 200 or retry.status_code != 200:
+                self.log_test("Idempotent Submission", False,
+                            f"Status codes: {first.status_code}, {retry.status_code}")
+                return False
+            
+            if (retry.json()["id"] != first.json()["id"] or
+                    retry.headers.get("Idempotent-Replayed") != "true"):
+                self.log_test("Idempotent Submission", False, "Retry created a second contact form")
+                return False
+            
+            # The key does not unlock someone else's form
+            reused = requests.post(f"{self.base_url}/contact", json={**test_data, "name": "Otro Cliente"},
+                                   headers=headers)
+            reused_row = requests.post(f"{self.base_url}/contact/batch", json=[
+                {**test_data, "amount": 80.0, "idempotency_key": headers["Idempotency-Key"]}])
+            if (reused.status_code != 422 or "Reintento" in reused.text
+                    or not reused_row.json()["results"][0]["error"] or "Reintento" in reused_row.text):
+                self.log_test("Idempotent Submission", False,
+                            f"Reused key answered {reused.status_code}: {reused.text}; batch: {reused_row.text}")
+                return False
+            
+            # Without a header the content is the key, and the currency is part of it
+            content = {**test_data, "name": f"Reintento {uuid.uuid4().hex[:8]}"}
+            usd = requests.post(f"{self.base_url}/contact", json=content)
+            usd_retry = requests.post(f"{self.base_url}/contact", json=content)
+            eur = requests.post(f"{self.base_url}/contact", json={**content, "currency": "EUR"})
+            if (usd_retry.json()["id"] == usd.json()["id"] and eur.json()["id"] != usd.json()["id"]
+                    and "Idempotent-Replayed" not in eur.headers):
+                self.created_contact_ids.extend([first.json()["id"], usd.json()["id"], eur.json()["id"]])
+                self.log_test("Idempotent Submission", True,
+                            "Retries returned the original form; another currency created a new one")
+                return True
+            else:
+                self.log_test("Idempotent Submission", False,
+                            f"Content replay wrong: USD {usd.json()['id']}, retry {usd_retry.json()['id']}, "
+                            f"EUR {eur.json()['id']}")
+                return False
+        except Exception as e:
+            self.log_test("Idempotent Submission", False, f"Error: {str(e)}")
+            return False
+    
+    def test_contact_status_update(self):
+        """Test updating a contact form's status and reading it back"""
+        if not self.created_contact_ids:
+            self.log_test("Contact Status Update", False, "No contact IDs available for testing")
+            return False
+        
+        contact_id = self.created_contact_ids[0]
+        try:
+            response = requests.patch(f"{self.base_url}/contact/{contact_id}", json={"status": "in_progress"})
+            if response.status_code != 200 or response.json().get("status") != "in_progress":
+                self.log_test("Contact Status Update", False,
+                            f"Status code: {response.status_code}, body: {response.text}")
+                return False
+            
+            invalid = requests.patch(f"{self.base_url}/contact/{contact_id}", json={"status": "unknown"})
+            fetched = requests.get(f"{self.base_url}/contact/{contact_id}")
+            if invalid.status_code == 422 and fetched.json().get("status") == "in_progress":
+                self.log_test("Contact Status Update", True, "Status updated and unknown status rejected")
+                return True
+            else:
+                self.log_test("Contact Status Update", False,
+                            f"Invalid status code: {invalid.status_code}, fetched: {fetched.text}")
+                return False
+        except Exception as e:
+            self.log_test("Contact Status Update", False, f"Error: {str(e)}")
+            return False
+    
+    def test_status_heartbeat_latest(self):
+        """Test that heartbeats are batched into the latest-status-per-client view"""
+        try:
+            client_name = f"kiosk-{uuid.uuid4().hex[:8]}"
+            first = requests.post(f"{self.base_url}/status", json={"client_name": client_name})
+            second = requests.post(f"{self.base_url}/status", json={"client_name": client_name})
+            if first.status_code != 200 or second.status_code != 200:
+                self.log_test("Status Heartbeat Latest", False,
+                            f"Status codes: {first.status_code}, {second.status_code}")
+                return False
+            
+            # Heartbeats are written by a background flusher shortly after the response
+            latest = []
+            for _ in range(10):
+                time.sleep(0.2)
+                latest = requests.get(f"{self.base_url}/status/latest",
+                                      params={"client_name": client_name}).json()
+                if latest and latest[0]["id"] == second.json()["id"]:
+                    self.log_test("Status Heartbeat Latest", True, f"Latest heartbeat of {client_name} is current")
+                    return True
+            self.log_test("Status Heartbeat Latest", False, f"Latest: {latest}")
+            return False
+        except Exception as e:
+            self.log_test("Status Heartbeat Latest", False, f"Error: {str(e)}")
+            return False
+    
+    def test_contact_batch_replay(self):
+        """Test that replayed offline submissions are accepted once and deduplicated"""
+        try:
+            key = str(uuid.uuid4())
+            rows = [
+                {"name": "Offline Lead", "phone": "+1-347-555-0199", "amount": 75.0, "idempotency_key": key},
+                {"name": "Offline Lead", "phone": "+1-347-555-0199", "amount": 75.0, "idempotency_key": key},
+                {"name": "Invalid Offline Lead"},
+            ]
+            first = requests.post(f"{self.base_url}/contact/batch", json=rows)
+            retry = requests.post(f"{self.base_url}/contact/batch", json=rows)
+            if first.status_code != 200 or retry.status_code != 200:
+                self.log_test("Contact Batch Replay", False,
+                            f"Status codes: {first.status_code}, {retry.status_code}")
+                return False
+            
+            first_data = first.json()
+            retry_data = retry.json()
+            created_id = first_data["results"][0]["id"]
+            same_form = all(result["id"] == created_id
+                            for result in first_data["results"][:2] + retry_data["results"][:2])
+            if (first_data["accepted"] == 1 and first_data["replayed"] == 1 and first_data["failed"] == 1
+                    and retry_data["accepted"] == 0 and retry_data["replayed"] == 2 and same_form):
+                self.log_test("Contact Batch Replay", True, f"Replays deduplicated to {created_id}")
+                return True
+            else:
+                self.log_test("Contact Batch Replay", False, f"First: {first_data}, retry: {retry_data}")
+                return False
+        except Exception as e:
+            self.log_test("Contact Batch Replay", False, f"Error: {str(e)}")
+            return False
+    
+    def test_contact_batch_too_large(self):
+        """Test that batches over the row or byte limit are refused with 413"""
+        try:
+            row = json.dumps({"name": "Oversized Batch", "phone": "+1-347-555-0142", "amount": 10})
+            too_many = requests.post(f"{self.base_url}/contact/batch", data="\n".join([row] * 101),
+                                     headers={"Content-Type": "application/x-ndjson"})
+            too_big = requests.post(f"{self.base_url}/contact/batch",
+                                    data=b"[" + b" " * (1024 * 1024) + b"]",
+                                    headers={"Content-Type": "application/json"})
+            if too_many.status_code == 413 and too_big.status_code == 413:
+                self.log_test("Contact Batch Too Large", True,
+                            f"{too_many.json()['detail']}; {too_big.json()['detail']}")
+                return True
+            else:
+                self.log_test("Contact Batch Too Large", False,
+                            f"Status codes: {too_many.status_code}, {too_big.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Contact Batch Too Large", False, f"Error: {str(e)}")
+            return False
+    
+    def test_bulk_too_large(self):
+        """Test that bulk bodies over the row or byte limit are refused with 413"""
+        try:
+            row = json.dumps({"name": "Oversized Bulk", "phone": "+1-347-555-0142", "amount": 10})
+            too_many = requests.post(f"{self.base_url}/contact/bulk", data="\n".join([row] * 10001),
+                                     headers={"Content-Type": "application/x-ndjson"})
+            too_big = requests.post(f"{self.base_url}/contact/bulk",
+                                    data=b"[" + b" " * (16 * 1024 * 1024) + b"]",
+                                    headers={"Content-Type": "application/json"})
+            if too_many.status_code == 413 and too_big.status_code == 413:
+                self.log_test("Bulk Too Large", True,
+                            f"{too_many.json()['detail']}; {too_big.json()['detail']}")
+                return True
+            else:
+                self.log_test("Bulk Too Large", False,
+                            f"Status codes: {too_many.status_code}, {too_big.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Bulk Too Large", False, f"Error: {str(e)}")
+            return False
+    
+    def test_conditional_get(self):
+        """Test ETag revalidation and compression of contact form reads"""
+        try:
+            page = requests.get(f"{self.base_url}/contact", params={"limit": 50})
+            etag = page.headers.get("ETag")
+            if page.status_code != 200 or not etag or not page.json():
+                self.log_test("Conditional GET", False, f"Status code: {page.status_code}, ETag: {etag}")
+                return False
+            
+            unchanged = requests.get(f"{self.base_url}/contact", params={"limit": 50},
+                                     headers={"If-None-Match": etag})
+            contact_id = page.json()[0]["id"]
+            single = requests.get(f"{self.base_url}/contact/{contact_id}")
+            single_unchanged = requests.get(f"{self.base_url}/contact/{contact_id}",
+                                            headers={"If-None-Match": single.headers.get("ETag", "")})
+            encoding = page.headers.get("Content-Encoding")
+            if unchanged.status_code == 304 and not unchanged.content and single_unchanged.status_code == 304:
+                self.log_test("Conditional GET", True,
+                            f"304 for list and form, list encoding: {encoding}, "
+                            f"Cache-Control: {page.headers.get('Cache-Control')}")
+                return True
+            else:
+                self.log_test("Conditional GET", False,
+                            f"Status codes: {unchanged.status_code}, {single_unchanged.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Conditional GET", False, f"Error: {str(e)}")
+            return False
+    
+    def test_admission_metrics(self):
+        """Test that rate limiter and concurrency cap counters are exposed"""
+        try:
+            response = requests.get(f"{self.base_url}/metrics/admission")
+            if response.status_code != 200:
+                self.log_test("Admission Metrics", False, f"Status code: {response.status_code}")
+                return False
+            
+            data = response.json()
+            rate_limit = data.get("rate_limit", {})
+            admission = data.get("admission", {})
+            if "enabled" in rate_limit and "enabled" in admission:
+                self.log_test("Admission Metrics", True,
+                            f"Limited: {rate_limit.get('limited_total', 0)}, shed: {admission.get('shed_total', 0)}")
+                return True
+            else:
+                self.log_test("Admission Metrics", False, f"Unexpected body: {data}")
+                return False
+        except Exception as e:
+            self.log_test("Admission Metrics", False, f"Error: {str(e)}")
+            return False
+    
+    def test_outbox_metrics(self):
+        """Test that the contact outbox reports its dispatch counters and backlog when enabled"""
+        try:
+            response = requests.get(f"{self.base_url}/metrics/outbox")
+            if response.status_code != 200:
+                self.log_test("Outbox Metrics", False, f"Status code: {response.status_code}")
+                return False
+            
+            data = response.json()
+            if data.get("enabled") is False:
+                self.log_test("Outbox Metrics", True, "Outbox disabled")
+                return True
+            backlog = data.get("backlog", {})
+            if {"pending", "running", "done", "dead"} <= set(backlog) and "completed_total" in data:
+                self.log_test("Outbox Metrics", True,
+                            f"Pending: {backlog['pending']}, done: {backlog['done']}, dead: {backlog['dead']}")
+                return True
+            else:
+                self.log_test("Outbox Metrics", False, f"Unexpected body: {data}")
+                return False
+        except Exception as e:
+            self.log_test("Outbox Metrics", False, f"Error: {str(e)}")
+            return False
+    
+    def test_contact_feed(self):
+        """Test that a new contact form is pushed on the change-stream feed"""
+        try:
+            feed = requests.get(f"{self.base_url}/contact/feed", stream=True, timeout=(5, 20))
+            if feed.status_code != 200:
+                self.log_test("Contact Feed", False, f"Status code: {feed.status_code}")
+                return False
+            
+            created = requests.post(f"{self.base_url}/contact", json={
+                "name": "Feed Listener",
+                "phone": "+1-555-444-5555",
+                "amount": float(uuid.uuid4().int % 10000)
+            }).json()
+            
+            for line in feed.iter_lines(decode_unicode=True):
+                if line.startswith("data:") and json.loads(line[5:]).get("id") == created["id"]:
+                    feed.close()
+                    self.created_contact_ids.append(created["id"])
+                    self.log_test("Contact Feed", True, "New contact form arrived on the feed")
+                    return True
+            self.log_test("Contact Feed", False, "Feed closed before the new contact form arrived")
+            return False
+        except Exception as e:
+            self.log_test("Contact Feed", False, f"Error: {str(e)}")
+            return False
+    
     def run_all_tests(self):
         """Run all backend tests"""
         print("=" * 60)
         print("GOOD TRANSFER Backend API Testing")
         print("=" * 60)
-        print(f"Testing backend URL: {self.base_url}")
+        print(f"Testing backend URL: {self.base_url} ({self.storage} storage)")
         print()
         
         tests = [
@@ -306,12 +769,34 @@ class BackendTester:
             self.test_create_contact_form_valid,
             self.test_create_contact_form_minimal,
             self.test_create_contact_form_invalid,
+            self.test_amount_out_of_range,
             self.test_get_all_contact_forms,
             self.test_get_contact_form_by_id,
             self.test_get_contact_form_invalid_id,
-            self.test_data_persistence
+            self.test_data_persistence,
+            self.test_contact_pagination,
+            self.test_bulk_contact_forms,
+            self.test_bulk_too_large,
+            self.test_contact_search,
+            self.test_contact_stats,
+            self.test_contact_rollups,
+            self.test_idempotent_submission,
+            self.test_contact_status_update,
+            self.test_contact_feed,
+            self.test_contact_batch_replay,
+            self.test_contact_batch_too_large,
+            self.test_conditional_get,
+            self.test_admission_metrics,
+            self.test_outbox_metrics,
+            self.test_status_heartbeat_latest
         ]
         
+        if self.storage != "mongo":
+            for test in tests:
+                if test.__name__ in MONGO_ONLY_TESTS:
+                    print(f"⏭️  SKIP {test.__name__}: needs Mongo")
+            tests = [test for test in tests if test.__name__ not in MONGO_ONLY_TESTS]
+        
         passed = 0
         total = len(tests)
         
@@ -334,10 +819,47 @@ class BackendTester:
             print(f"⚠️  {total - passed} tests failed")
             return False
 
+def start_local_backend(storage, directory):
+    """Run the backend on ``storage`` in a subprocess; return it with its base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+    env = {**os.environ, "STORAGE_BACKEND": storage, "SQLITE_PATH": os.path.join(directory, "backend_test.sqlite3"),
+           # Every test shares one address
+           "CONTACT_RATE_LIMIT_PER_MINUTE": "0"}
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=backend_dir, env=env)
+    base_url = f"http://127.0.0.1:{port}/api"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Local backend exited during startup")
+        try:
+            if requests.get(f"{base_url}/").status_code == 200:
+                return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Local backend did not start within 30 seconds")
+
 def main():
     """Main test execution"""
-    tester = BackendTester()
-    success = tester.run_all_tests()
+    parser = argparse.ArgumentParser(description="GOOD TRANSFER backend API tests")
+    parser.add_argument("--local", choices=["memory", "sqlite"],
+                        help="Start a local backend on this storage instead of using BACKEND_URL")
+    args = parser.parse_args()
+    
+    if args.local:
+        with tempfile.TemporaryDirectory() as directory:
+            process, base_url = start_local_backend(args.local, directory)
+            try:
+                success = BackendTester(base_url, args.local).run_all_tests()
+            finally:
+                process.terminate()
+                process.wait()
+    else:
+        success = BackendTester().run_all_tests()
     
     if success:
         print("\n✅ Backend API is working correctly")
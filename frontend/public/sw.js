@@ -1,4 +1,9 @@
-const CACHE_NAME = 'good-transfer-v1.0.0';
+const CACHE_NAME = 'good-transfer-v1.2.0';
+// API reads served stale-while-revalidate; kept apart from the app shell
+const API_CACHE_NAME = 'good-transfer-api-v1';
+const API_CACHE_MAX_ENTRIES = 50;
+// Streams and operational endpoints are always fetched live
+const API_NETWORK_ONLY = ['/api/contact/feed', '/api/contact/export', '/api/health', '/api/metrics'];
 const urlsToCache = [
   '/',
   '/static/css/main.css',
@@ -33,7 +38,7 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames.map((cacheName) => {
-          if (cacheName !== CACHE_NAME) {
+          if (cacheName !== CACHE_NAME && cacheName !== API_CACHE_NAME) {
             console.log('[SW] Deleting old cache:', cacheName);
             return caches.delete(cacheName);
           }
@@ -43,9 +48,125 @@ self.addEventListener('activate', (event) => {
   );
 });
 
+// Offline outbox for contact form submissions
+const OUTBOX_DB = 'good-transfer';
+const OUTBOX_STORE = 'contact-outbox';
+// Rows and bytes per POST /api/contact/batch request; the backend accepts up to
+// 100 rows and 1 MiB, and answers 413 beyond either
+const REPLAY_BATCH_SIZE = 100;
+const REPLAY_BATCH_MAX_BYTES = 1024 * 1024;
+
+const openOutbox = () => new Promise((resolve, reject) => {
+  const request = indexedDB.open(OUTBOX_DB, 1);
+  request.onupgradeneeded = () => {
+    request.result.createObjectStore(OUTBOX_STORE, { keyPath: 'idempotencyKey' });
+  };
+  request.onsuccess = () => resolve(request.result);
+  request.onerror = () => reject(request.error);
+});
+
+const outboxTransaction = async (mode, operation) => {
+  const db = await openOutbox();
+  try {
+    return await new Promise((resolve, reject) => {
+      const transaction = db.transaction(OUTBOX_STORE, mode);
+      const result = operation(transaction.objectStore(OUTBOX_STORE));
+      transaction.oncomplete = () => resolve(result.result);
+      transaction.onerror = () => reject(transaction.error);
+    });
+  } finally {
+    db.close();
+  }
+};
+
+const outboxAll = () => outboxTransaction('readonly', (store) => store.getAll());
+
+const outboxDelete = (keys) => outboxTransaction('readwrite', (store) => {
+  keys.forEach((key) => store.delete(key));
+  return {};
+});
+
+// Queue a submission and ask for a background sync; same key, same entry
+async function queueContactForm(url, idempotencyKey, form) {
+  await outboxTransaction('readwrite', (store) => store.put({
+    idempotencyKey: idempotencyKey || self.crypto.randomUUID(),
+    url,
+    form,
+    queuedAt: new Date().toISOString()
+  }));
+  console.log('[SW] Queued contact form for replay');
+  try {
+    await self.registration.sync.register('contact-form-sync');
+  } catch (error) {
+    // No Background Sync support; the page asks for a replay when it comes back online
+  }
+}
+
+const isContactSubmission = (request) => (
+  request.method === 'POST' && new URL(request.url).pathname === '/api/contact'
+);
+
+// Submit normally; queue the form if the network or the backend is unavailable
+async function submitContactForm(request) {
+  const body = await request.clone().text();
+  try {
+    const response = await fetch(request);
+    // Validation errors would fail again on replay; overload and outages will not
+    if (response.status < 500 && response.status !== 429) {
+      return response;
+    }
+  } catch (error) {
+    console.log('[SW] Contact form submission failed:', error);
+  }
+  await queueContactForm(request.url, request.headers.get('Idempotency-Key'), JSON.parse(body));
+  return new Response(JSON.stringify({ queued: true }), {
+    status: 202,
+    headers: { 'Content-Type': 'application/json', 'X-Queued-Offline': 'true' }
+  });
+}
+
+const isApiRead = (request) => {
+  const { pathname } = new URL(request.url);
+  return request.method === 'GET' && pathname.startsWith('/api/') &&
+    !API_NETWORK_ONLY.some((prefix) => pathname === prefix || pathname.startsWith(`${prefix}/`));
+};
+
+// Drop the oldest API responses; Cache keys come back in insertion order
+async function trimApiCache(cache) {
+  const keys = await cache.keys();
+  await Promise.all(keys.slice(0, Math.max(0, keys.length - API_CACHE_MAX_ENTRIES)).map((key) => cache.delete(key)));
+}
+
+// Answer from the cache at once and refresh it in the background. The
+// refresh goes through the HTTP cache, which revalidates with the ETag the
+// backend sent, so an unchanged resource costs a 304 without a body.
+async function staleWhileRevalidate(event) {
+  const cache = await caches.open(API_CACHE_NAME);
+  const cached = await cache.match(event.request);
+  const refresh = fetch(event.request).then(async (response) => {
+    if (response.ok) {
+      await cache.delete(event.request);
+      await cache.put(event.request, response.clone());
+      await trimApiCache(cache);
+    }
+    return response;
+  });
+
+  if (cached) {
+    event.waitUntil(refresh.catch((error) => console.log('[SW] API refresh failed:', error)));
+    return cached;
+  }
+  return refresh;
+}
+
 // Fetch event - serve cached content when offline
 self.addEventListener('fetch', (event) => {
-  // Skip non-GET requests
+  if (isContactSubmission(event.request)) {
+    event.respondWith(submitContactForm(event.request));
+    return;
+  }
+
+  // Skip other non-GET requests
   if (event.request.method !== 'GET') {
     return;
   }
@@ -55,6 +176,16 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  if (isApiRead(event.request)) {
+    event.respondWith(staleWhileRevalidate(event));
+    return;
+  }
+
+  // Other streams and live API endpoints go straight to the network
+  if (new URL(event.request.url).pathname.startsWith('/api/')) {
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then((response) => {
@@ -95,7 +226,27 @@ self.addEventListener('fetch', (event) => {
 self.addEventListener('sync', (event) => {
   if (event.tag === 'contact-form-sync') {
     console.log('[SW] Background sync: contact-form');
-    event.waitUntil(syncContactForms());
+    event.waitUntil(replayContactForms());
+  }
+});
+
+// Requests from the page: queue a form stored while offline, replay, list or clear the outbox
+self.addEventListener('message', (event) => {
+  const { type } = event.data || {};
+  const reply = (promise) => event.waitUntil(promise.then(
+    (result) => event.ports[0] && event.ports[0].postMessage({ ok: true, result }),
+    (error) => event.ports[0] && event.ports[0].postMessage({ ok: false, error: error.message })
+  ));
+
+  if (type === 'queue-contact-form') {
+    const { url, idempotencyKey, form } = event.data;
+    reply(queueContactForm(url, idempotencyKey, form));
+  } else if (type === 'replay-contact-forms') {
+    reply(replayContactForms());
+  } else if (type === 'list-contact-forms') {
+    reply(outboxAll());
+  } else if (type === 'clear-contact-forms') {
+    reply(outboxAll().then((entries) => outboxDelete(entries.map((entry) => entry.idempotencyKey))));
   }
 });
 
@@ -130,24 +281,106 @@ self.addEventListener('notificationclick', (event) => {
   );
 });
 
-// Sync contact forms when back online
+// Sync contact forms when back online. Overlapping triggers (sync event,
+// page message) share one replay instead of sending the outbox twice.
+let replayInProgress = null;
+
+function replayContactForms() {
+  if (!replayInProgress) {
+    replayInProgress = syncContactForms().finally(() => {
+      replayInProgress = null;
+    });
+  }
+  return replayInProgress;
+}
+
+const textEncoder = new TextEncoder();
+
+const replayRow = (entry) => JSON.stringify({ ...entry.form, idempotency_key: entry.idempotencyKey });
+
+// Group queued entries into batches under both backend limits; a body is the
+// rows joined by commas inside brackets. A single oversized row goes alone.
+function replayBatches(queued) {
+  const batches = [];
+  let batch = [];
+  let size = 2;
+  for (const entry of queued) {
+    const rowSize = textEncoder.encode(replayRow(entry)).length;
+    if (batch.length && (batch.length >= REPLAY_BATCH_SIZE || size + 1 + rowSize > REPLAY_BATCH_MAX_BYTES)) {
+      batches.push(batch);
+      batch = [];
+      size = 2;
+    }
+    size += rowSize + (batch.length ? 1 : 0);
+    batch.push(entry);
+  }
+  if (batch.length) {
+    batches.push(batch);
+  }
+  return batches;
+}
+
+// Send one batch and remove it from the outbox; returns the forms the backend
+// has. A 413 splits the batch in two, and a single form the backend refuses
+// as too large is dropped, since resending it would be refused again.
+async function sendBatch(batchUrl, batch) {
+  const response = await fetch(batchUrl, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: `[${batch.map(replayRow).join(',')}]`
+  });
+  if (response.status === 413) {
+    if (batch.length === 1) {
+      console.log('[SW] Dropped offline form too large to send');
+      await outboxDelete([batch[0].idempotencyKey]);
+      return 0;
+    }
+    const half = Math.ceil(batch.length / 2);
+    return await sendBatch(batchUrl, batch.slice(0, half)) + await sendBatch(batchUrl, batch.slice(half));
+  }
+  if (!response.ok) {
+    throw new Error(`Batch replay failed with status ${response.status}`);
+  }
+  const { accepted, replayed, failed, results } = await response.json();
+  // Rejected rows are invalid forms; resending them would fail again
+  results.filter((result) => result.error).forEach((result) => {
+    console.log('[SW] Dropped invalid offline form:', result.error);
+  });
+  await outboxDelete(batch.map((entry) => entry.idempotencyKey));
+  console.log(`[SW] Synced offline forms: ${accepted} new, ${replayed} already received, ${failed} rejected`);
+  return accepted + replayed;
+}
+
+// Send the outbox in batches per backend; the backend deduplicates rows by
+// idempotency key, so resending a batch after a lost response is safe
 async function syncContactForms() {
-  try {
-    const cache = await caches.open('contact-forms-offline');
-    const requests = await cache.keys();
-    
-    for (const request of requests) {
+  const entries = await outboxAll();
+  const queues = new Map();
+  for (const entry of entries) {
+    const batchUrl = `${entry.url}/batch`;
+    queues.set(batchUrl, [...(queues.get(batchUrl) || []), entry]);
+  }
+
+  let synced = 0;
+  let failure = null;
+  for (const [batchUrl, queued] of queues) {
+    for (const batch of replayBatches(queued)) {
       try {
-        const response = await fetch(request);
-        if (response.ok) {
-          await cache.delete(request);
-          console.log('[SW] Synced offline form submission');
-        }
+        synced += await sendBatch(batchUrl, batch);
       } catch (error) {
-        console.log('[SW] Failed to sync form:', error);
+        console.log('[SW] Failed to sync forms:', error);
+        failure = error;
       }
     }
-  } catch (error) {
-    console.log('[SW] Sync error:', error);
   }
-}
\ No newline at end of file
+
+  if (synced) {
+    const windows = await self.clients.matchAll({ type: 'window' });
+    windows.forEach((client) => client.postMessage({ type: 'contact-forms-synced', count: synced }));
+  }
+  // Rejecting makes the browser retry the background sync later
+  if (failure) {
+    throw failure;
+  }
+  return synced;
+}
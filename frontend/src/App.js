@@ -5,15 +5,23 @@ import HeroSection from "./components/HeroSection";
 import ServicesSection from "./components/ServicesSection";
 import ContactSection from "./components/ContactSection";
 import PWAInstaller from "./components/PWAInstaller";
-import { handlePWAShortcuts, registerServiceWorker } from "./utils/pwaUtils";
+import { handlePWAShortcuts, registerServiceWorker, replayOfflineForms } from "./utils/pwaUtils";
 
 const Home = () => {
   useEffect(() => {
     // Handle PWA shortcuts when app loads
     handlePWAShortcuts();
     
-    // Register service worker
-    registerServiceWorker();
+    // Register service worker, then send anything queued while offline
+    registerServiceWorker().then(() => {
+      if (navigator.onLine) {
+        replayOfflineForms();
+      }
+    });
+
+    // Browsers without Background Sync replay when the connection returns
+    window.addEventListener('online', replayOfflineForms);
+    return () => window.removeEventListener('online', replayOfflineForms);
   }, []);
 
   return (
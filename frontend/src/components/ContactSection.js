@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import { motion } from 'framer-motion';
 import { FaWhatsapp, FaPhone, FaEnvelope, FaMapMarkerAlt, FaClock, FaCheckCircle, FaWifi, FaCloudUploadAlt } from 'react-icons/fa';
 import axios from 'axios';
@@ -7,6 +7,12 @@ import { storeFormOffline, getNetworkStatus, showNotification } from '../utils/p
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+const newIdempotencyKey = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
 const ContactSection = () => {
   const [formData, setFormData] = useState({
     name: '',
@@ -17,6 +23,8 @@ const ContactSection = () => {
   });
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [submitStatus, setSubmitStatus] = useState(null);
+  // One key per filled-in form, so retries of the same submission are deduplicated
+  const idempotencyKey = useRef(newIdempotencyKey());
 
   const handleInputChange = (e) => {
     const { name, value } = e.target;
@@ -24,6 +32,27 @@ const ContactSection = () => {
       ...prev,
       [name]: value
     }));
+    idempotencyKey.current = newIdempotencyKey();
+  };
+
+  const resetForm = () => {
+    setFormData({
+      name: '',
+      email: '',
+      phone: '',
+      amount: '',
+      message: ''
+    });
+  };
+
+  const markQueued = () => {
+    setSubmitStatus('offline');
+    resetForm();
+
+    showNotification('Formulario guardado offline', {
+      body: 'Se enviará cuando tengas conexión.',
+      tag: 'form-offline'
+    });
   };
 
   const handleSubmit = async (e) => {
@@ -32,11 +61,18 @@ const ContactSection = () => {
     setSubmitStatus(null);
 
     const networkStatus = getNetworkStatus();
+    const offlineForm = { ...formData, idempotencyKey: idempotencyKey.current };
 
     try {
       if (networkStatus.online) {
-        // Online: Submit normally
-        await axios.post(`${API}/contact`, formData);
+        // Online: Submit normally; the service worker queues it if the request fails
+        const response = await axios.post(`${API}/contact`, formData, {
+          headers: { 'Idempotency-Key': idempotencyKey.current }
+        });
+        if (response.status === 202 && response.data?.queued) {
+          markQueued();
+          return;
+        }
         setSubmitStatus('success');
         
         // Show notification if permitted
@@ -45,35 +81,13 @@ const ContactSection = () => {
           tag: 'form-success'
         });
         
-        setFormData({
-          name: '',
-          email: '',
-          phone: '',
-          amount: '',
-          message: ''
-        });
+        resetForm();
       } else {
         // Offline: Store for later sync
-        const stored = await storeFormOffline({
-          ...formData,
-          timestamp: new Date().toISOString(),
-          offline: true
-        });
+        const stored = await storeFormOffline(offlineForm, `${API}/contact`);
         
         if (stored) {
-          setSubmitStatus('offline');
-          setFormData({
-            name: '',
-            email: '',
-            phone: '',
-            amount: '',
-            message: ''
-          });
-          
-          showNotification('Formulario guardado offline', {
-            body: 'Se enviará cuando tengas conexión.',
-            tag: 'form-offline'
-          });
+          markQueued();
         } else {
           setSubmitStatus('error');
         }
@@ -81,15 +95,16 @@ const ContactSection = () => {
     } catch (error) {
       console.error('Error submitting form:', error);
       
-      // Try to store offline as fallback
-      const stored = await storeFormOffline({
-        ...formData,
-        timestamp: new Date().toISOString(),
-        offline: true,
-        error: error.message
-      });
+      // Try to store offline as fallback; invalid forms would only fail again
+      const status = error.response?.status;
+      const retryable = !status || status >= 500 || status === 429;
+      const stored = retryable && await storeFormOffline(offlineForm, `${API}/contact`);
       
-      setSubmitStatus(stored ? 'offline' : 'error');
+      if (stored) {
+        markQueued();
+      } else {
+        setSubmitStatus('error');
+      }
     } finally {
       setIsSubmitting(false);
     }
@@ -230,6 +245,7 @@ const ContactSection = () => {
                   name="message"
                   value={formData.message}
                   onChange={handleInputChange}
+                  maxLength={5000}
                   rows="4"
                   className="w-full px-4 py-3 border border-slate-300 rounded-lg focus:ring-2 focus:ring-emerald-500 focus:border-emerald-500 transition-all duration-300 resize-none"
                   placeholder="Cuéntanos más detalles sobre tu transferencia..."
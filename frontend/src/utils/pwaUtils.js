@@ -62,79 +62,83 @@ export const showNotification = (title, options = {}) => {
   return null;
 };
 
+/**
+ * Send a message to the active service worker and wait for its reply
+ */
+const messageServiceWorker = async (message, timeout = 5000) => {
+  if (!('serviceWorker' in navigator)) {
+    throw new Error('Service workers are not supported');
+  }
+  const registration = await navigator.serviceWorker.getRegistration();
+  if (!registration || !registration.active) {
+    throw new Error('No active service worker');
+  }
+
+  return new Promise((resolve, reject) => {
+    const channel = new MessageChannel();
+    const timer = setTimeout(() => reject(new Error('Service worker did not reply')), timeout);
+    channel.port1.onmessage = ({ data }) => {
+      clearTimeout(timer);
+      data.ok ? resolve(data.result) : reject(new Error(data.error));
+    };
+    registration.active.postMessage(message, [channel.port2]);
+  });
+};
+
 /**
  * Store form data offline for sync later
+ *
+ * The service worker keeps it in IndexedDB and replays everything queued as
+ * one batch to `${url}/batch` when the connection returns.
  */
-export const storeFormOffline = async (formData) => {
-  if ('caches' in window) {
-    try {
-      const cache = await caches.open('contact-forms-offline');
-      
-      // Create a fake request for storing form data
-      const request = new Request('/api/contact', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'X-Offline-Storage': Date.now().toString()
-        },
-        body: JSON.stringify(formData)
-      });
-      
-      const response = new Response(JSON.stringify(formData), {
-        headers: { 'Content-Type': 'application/json' }
-      });
-      
-      await cache.put(request, response);
-      console.log('Form stored offline');
-      return true;
-    } catch (error) {
-      console.error('Failed to store form offline:', error);
-      return false;
-    }
+export const storeFormOffline = async ({ idempotencyKey, ...form }, url) => {
+  try {
+    await messageServiceWorker({ type: 'queue-contact-form', url, idempotencyKey, form });
+    console.log('Form stored offline');
+    return true;
+  } catch (error) {
+    console.error('Failed to store form offline:', error);
+    return false;
+  }
+};
+
+/**
+ * Ask the service worker to send queued forms now, e.g. when back online
+ */
+export const replayOfflineForms = async () => {
+  try {
+    return await messageServiceWorker({ type: 'replay-contact-forms' }, 30000);
+  } catch (error) {
+    console.log('Offline form replay failed:', error);
+    return 0;
   }
-  return false;
 };
 
 /**
  * Get stored offline forms
  */
 export const getOfflineForms = async () => {
-  if ('caches' in window) {
-    try {
-      const cache = await caches.open('contact-forms-offline');
-      const requests = await cache.keys();
-      
-      const forms = [];
-      for (const request of requests) {
-        const response = await cache.match(request);
-        const data = await response.json();
-        forms.push(data);
-      }
-      
-      return forms;
-    } catch (error) {
-      console.error('Failed to get offline forms:', error);
-      return [];
-    }
+  try {
+    const entries = await messageServiceWorker({ type: 'list-contact-forms' });
+    return entries.map((entry) => entry.form);
+  } catch (error) {
+    console.error('Failed to get offline forms:', error);
+    return [];
   }
-  return [];
 };
 
 /**
  * Clear offline forms after successful sync
  */
 export const clearOfflineForms = async () => {
-  if ('caches' in window) {
-    try {
-      await caches.delete('contact-forms-offline');
-      console.log('Offline forms cleared');
-      return true;
-    } catch (error) {
-      console.error('Failed to clear offline forms:', error);
-      return false;
-    }
+  try {
+    await messageServiceWorker({ type: 'clear-contact-forms' });
+    console.log('Offline forms cleared');
+    return true;
+  } catch (error) {
+    console.error('Failed to clear offline forms:', error);
+    return false;
   }
-  return false;
 };
 
 /**